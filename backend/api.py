@@ -1,31 +1,324 @@
-from flask import Flask, request, jsonify
-from subtitle_extractor import extract_subtitle
+from flask import Flask, Response, request, jsonify
+from concurrent.futures import ThreadPoolExecutor
+import argparse
 import os
+import sys
+import queue
+import threading
+import time
+import uuid
+
+# api.py 位于 backend/ 下，字幕提取模块在项目根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from metrics import StageMetrics, format_prometheus
+from extractor_config import (ConfigError, add_config_arguments, config_from_args, extract_options, get_config,
+                              set_config)
+from thread_budget import plan_thread_budget
 
 app = Flask(__name__)
 
-@app.route('/api/extract', methods=['POST'])
-def extract():
+MAX_CONCURRENT_JOBS = 2  # 同时运行的任务数，其余任务排队等待
+JOB_TTL = 3600  # 已结束的任务保留多少秒，之后不能再查询
+MAX_ENDED_JOBS = 100  # 最多保留多少个已结束的任务，超过时先删除最早结束的
+
+# 任务状态：queued 排队中，running 运行中，finished 完成，failed 失败，cancelled 已取消
+ENDED_STATUSES = ('finished', 'failed', 'cancelled')
+jobs = {}
+jobs_lock = threading.Lock()
+# 已删除任务的各阶段耗时合计，/metrics 的计数不会因为删除任务而减少
+retired_metrics = StageMetrics()
+executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS)
+
+# 预先加载的 OCR 实例，每个运行中的任务借用一个，用完归还
+ocr_pool = {}
+ocr_pool_lock = threading.Lock()
+
+# 字幕提取模块依赖 OpenCV、PaddleOCR 等较重的库，第一次用到时才导入，服务启动后立即可以响应
+_extractor = None
+_extractor_lock = threading.Lock()
+
+# 预热状态：idle 未预热，loading 加载中，ready 已就绪，failed 失败
+warmup = {'status': 'idle', 'error': None}
+
+def get_extractor():
+    """
+    导入并返回字幕提取模块
+    """
+    global _extractor
+    with _extractor_lock:
+        if _extractor is None:
+            import subtitle_extractor
+            _extractor = subtitle_extractor
+    return _extractor
+
+def get_ocr_pool(lang):
+    """
+    取得某种语言的 OCR 实例池，第一次使用时加载 MAX_CONCURRENT_JOBS 个实例
+    """
+    extractor = get_extractor()
+    with ocr_pool_lock:
+        if lang not in ocr_pool:
+            instances = queue.Queue()
+            for _ in range(MAX_CONCURRENT_JOBS):
+                ocr = extractor.create_ocr(lang)
+                if ocr is None:
+                    raise RuntimeError("OCR 初始化失败，请检查模型路径")
+                extractor.warm_up_ocr(ocr)
+                instances.put(ocr)
+            ocr_pool[lang] = instances
+        return ocr_pool[lang]
+
+def warm_up(lang=None):
+    """
+    后台预热：导入字幕提取模块，并为默认语言加载好 OCR 实例池，期间服务照常响应
+    """
+    warmup.update(status='loading', error=None)
+    try:
+        get_ocr_pool(lang or get_config()['lang'])
+        warmup['status'] = 'ready'
+        print("OCR 模型预热完成")
+    except Exception as e:
+        warmup.update(status='failed', error=str(e))
+        print(f"OCR 模型预热失败: {str(e)}")
+
+def set_job_status(job, status):
+    """
+    修改任务状态，任务结束时记录结束时间，调用方需持有 jobs_lock
+    """
+    job['status'] = status
+    if status in ENDED_STATUSES:
+        job['ended_at'] = time.time()
+
+def update_job(job_id, status=None, **fields):
+    with jobs_lock:
+        jobs[job_id].update(fields)
+        if status is not None:
+            set_job_status(jobs[job_id], status)
+
+def prune_jobs():
+    """
+    删除结束超过 JOB_TTL 秒的任务，以及超出 MAX_ENDED_JOBS 个的最早结束的任务，调用方需持有 jobs_lock
+    """
+    ended = sorted((job for job in jobs.values() if job['status'] in ENDED_STATUSES),
+                   key=lambda job: job['ended_at'])
+    expire_before = time.time() - JOB_TTL
+    for i, job in enumerate(ended):
+        if job['ended_at'] < expire_before or i < len(ended) - MAX_ENDED_JOBS:
+            retired_metrics.merge_dict(job['metrics'].to_dict())
+            del jobs[job['job_id']]
+
+def job_snapshot(job):
+    """
+    返回可以序列化的任务信息（去掉内部使用的字段）
+    """
+    info = {key: value for key, value in job.items() if key not in ('cancel_event', 'metrics', 'ended_at')}
+    total = job['total_frames']
+    info['progress'] = round(job['frames_processed'] / total, 4) if total else 0
+    return info
+
+def run_job(job_id):
+    with jobs_lock:
+        job = jobs[job_id]
+        if job['cancel_event'].is_set():
+            set_job_status(job, 'cancelled')
+            return
+        set_job_status(job, 'running')
+
+    def on_progress(frames_processed, total_frames, cues_found):
+        update_job(job_id, frames_processed=frames_processed, total_frames=total_frames,
+                   cues_found=cues_found)
+
+    # 每种语言从实例池借用一个 OCR 实例，多条轨道中语言相同的共用
+    langs = [track['lang'] for track in job['tracks']] if job['tracks'] else [job['lang']]
+    borrowed = {}
     try:
-        video_path = request.json['video_path']
-        output_path = request.json.get('output_path', 'output/subtitles.srt')
-        
-        # 确保输出目录存在
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        # 调用现有的字幕提取函数
-        result = extract_subtitle(video_path, output_path)
-        
+        # 按固定顺序借用，避免两个任务各持有一种语言的实例互相等待
+        for lang in sorted(set(langs)):
+            instances = get_ocr_pool(lang)
+            borrowed[lang] = (instances, instances.get())
+        ocr = {lang: instance for lang, (_, instance) in borrowed.items()}
+        options = dict(progress_callback=on_progress, cancel_event=job['cancel_event'], metrics=job['metrics'],
+                       **extract_options())
+        if job['tracks']:
+            save_paths = get_extractor().extract_subtitle_tracks(
+                job['video_path'],
+                [(track['subtitle_area'], track['lang']) for track in job['tracks']],
+                ocr=ocr,
+                **options,
+            )
+            save_path = next((path for path in save_paths or [] if path), None)
+        else:
+            save_paths = None
+            save_path = get_extractor().extract_subtitles(
+                job['video_path'],
+                job['output_path'],
+                job['lang'],
+                job['subtitle_area'],
+                ocr=ocr[job['lang']],
+                **options,
+            )
+        if job['cancel_event'].is_set():
+            update_job(job_id, status='cancelled')
+        elif save_path:
+            update_job(job_id, status='finished', output_path=save_path, output_paths=save_paths,
+                       message='字幕提取完成')
+        else:
+            update_job(job_id, status='failed', error='未能提取到任何字幕')
+    except Exception as e:
+        update_job(job_id, status='failed', error=str(e))
+    finally:
+        for instances, instance in borrowed.values():
+            instances.put(instance)
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    """
+    健康检查：不依赖模型是否加载完成，同时返回预热状态和已加载的语言
+    """
+    return jsonify({
+        'success': True,
+        'status': 'ok',
+        'warmup': dict(warmup),
+        'loaded_langs': sorted(ocr_pool),
+        'ocr_engine': get_config()['ocr_engine'],
+    })
+
+def parse_job_request(body):
+    """
+    检查创建任务的请求体，返回 (video_path, output_path, tracks)，不合法时抛出 ValueError
+    """
+    if not isinstance(body, dict):
+        raise ValueError('请求体必须是 JSON 对象')
+    video_path = body.get('video_path')
+    if not isinstance(video_path, str) or not video_path:
+        raise ValueError('缺少 video_path')
+    # 不指定时保存到视频所在目录的 output 文件夹，文件名包含第一条字幕的时间；任务完成后返回实际路径
+    output_path = body.get('output_path')
+    if output_path is not None and not isinstance(output_path, str):
+        raise ValueError('output_path 必须是字符串')
+
+    # 多条字幕轨道：[{"subtitle_area": [...], "lang": "ch"}, ...]，视频只解码一次，每条轨道生成一个字幕文件
+    tracks = body.get('tracks') or []
+    if not isinstance(tracks, list) or not all(isinstance(track, dict) and 'subtitle_area' in track
+                                               for track in tracks):
+        raise ValueError('tracks 必须是列表，每条轨道包含 subtitle_area')
+    if tracks and output_path:
+        raise ValueError('多条字幕轨道的文件名自动生成，不能指定 output_path')
+    tracks = [{'subtitle_area': track['subtitle_area'], 'lang': track.get('lang', get_config()['lang'])}
+              for track in tracks]
+    return video_path, output_path, tracks
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    body = request.get_json(silent=True)
+    try:
+        video_path, output_path, tracks = parse_job_request(body)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+    try:
+        job_id = uuid.uuid4().hex
+        with jobs_lock:
+            prune_jobs()
+            jobs[job_id] = {
+                'job_id': job_id,
+                'status': 'queued',
+                'video_path': video_path,
+                'output_path': output_path,
+                'lang': body.get('lang', get_config()['lang']),
+                'subtitle_area': body.get('subtitle_area', [0.8, 0.9]),
+                'tracks': tracks,
+                'output_paths': None,
+                'frames_processed': 0,
+                'total_frames': 0,
+                'cues_found': 0,
+                'error': None,
+                'cancel_event': threading.Event(),
+                'metrics': StageMetrics(),
+            }
+        executor.submit(run_job, job_id)
+
         return jsonify({
             'success': True,
-            'output_path': output_path,
-            'message': '字幕提取完成'
-        })
+            'job_id': job_id
+        }), 202
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': '任务不存在'}), 404
+        return jsonify({'success': True, 'job': job_snapshot(job)})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': '任务不存在'}), 404
+        if job['status'] in ENDED_STATUSES:
+            return jsonify({'success': False, 'error': '任务已结束'}), 409
+        job['cancel_event'].set()
+        if job['status'] == 'queued':
+            set_job_status(job, 'cancelled')
+        return jsonify({'success': True, 'job': job_snapshot(job)})
+
+@app.route('/api/jobs/<job_id>/metrics', methods=['GET'])
+def get_job_metrics(job_id):
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': '任务不存在'}), 404
+        metrics = job['metrics']
+    return jsonify({'success': True, 'metrics': metrics.to_dict()})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Prometheus 文本格式的统计：所有任务合计的各阶段耗时和计数，以及各状态的任务数
+    """
+    total = StageMetrics()
+    status_counts = {}
+    with jobs_lock:
+        total.merge_dict(retired_metrics.to_dict())
+        job_list = list(jobs.values())
+    for job in job_list:
+        total.merge_dict(job['metrics'].to_dict())
+        status_counts[job['status']] = status_counts.get(job['status'], 0) + 1
+    lines = [
+        "# HELP subtitle_extractor_jobs Number of jobs by status",
+        "# TYPE subtitle_extractor_jobs gauge",
+    ]
+    for status in ('queued', 'running', 'finished', 'failed', 'cancelled'):
+        lines.append(f'subtitle_extractor_jobs{{status="{status}"}} {status_counts.get(status, 0)}')
+    body = format_prometheus(total) + "\n".join(lines) + "\n"
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
-    app.run(port=5000) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="字幕提取服务")
+    parser.add_argument('--warm', action='store_true', help="启动后在后台预先加载 OCR 模型")
+    parser.add_argument('--warm-lang', default=None, help="预热的识别语言，默认为配置中的 lang")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    try:
+        config = config_from_args(args)
+    except ConfigError as e:
+        print(f"配置错误: {str(e)}")
+        sys.exit(1)
+    # 同时运行的任务各用一个 OCR 实例，CPU 核在这些实例之间平分
+    budget = plan_thread_budget(MAX_CONCURRENT_JOBS, config['cpu_threads'])
+    budget.apply()
+    if config['cpu_threads'] is None:
+        set_config(dict(config, cpu_threads=budget.threads_per_worker))
+    if args.warm:
+        threading.Thread(target=warm_up, args=(args.warm_lang or config['lang'],), daemon=True).start()
+    app.run(port=5000, threaded=True)
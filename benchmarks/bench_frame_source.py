@@ -0,0 +1,98 @@
+"""
+取帧方式的速度对比：OpenCV（解码整帧后截取字幕区域）与 ffmpeg（子进程只输出采样帧的字幕区域）
+
+只计取帧和截取字幕区域的耗时，不运行 OCR。不指定视频时使用 run_benchmarks 的合成视频
+
+用法: python benchmarks/bench_frame_source.py [视频路径 ...] [--area 0.8 0.97] [--sample-rates 2 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+from frame_source import FfmpegFrameSampler, find_ffmpeg
+from run_benchmarks import CASES, prepare_videos
+from subtitle_extractor import FrameSampler, crop_area, get_sample_step, normalize_subtitle_area
+from synthetic import SUBTITLE_AREA
+
+SCALE_HEIGHT = 96  # ffmpeg 在解码时把字幕区域缩小到的高度，对应配置 roi_target_height
+
+def run_opencv(video_path, subtitle_area, sample_rate):
+    """
+    OpenCV 取帧并截取字幕区域，返回 (采样帧数, 耗时)
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        start = time.perf_counter()
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        sampler = FrameSampler(cap, fps, sample_rate, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        samples = 0
+        for _, frame in sampler:
+            crop_area(frame, subtitle_area).copy()
+            samples += 1
+        return samples, time.perf_counter() - start
+    finally:
+        cap.release()
+
+def run_ffmpeg(video_path, subtitle_area, sample_rate, scale_height=None, ffmpeg_path=None):
+    """
+    ffmpeg 取帧（在解码时截取字幕区域，可选缩小到 scale_height），返回 (采样帧数, 耗时)
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+    start = time.perf_counter()
+    sampler = FfmpegFrameSampler(video_path, fps, get_sample_step(fps, sample_rate), width, height, subtitle_area,
+                                 total_frames, scale_height=scale_height, ffmpeg_path=ffmpeg_path)
+    samples = sum(1 for _ in sampler)
+    return samples, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="取帧方式的速度对比")
+    parser.add_argument('videos', nargs='*', help="视频路径，默认使用合成视频")
+    parser.add_argument('--area', type=float, nargs='+', default=list(SUBTITLE_AREA),
+                        help="字幕区域 bottom_ratio top_ratio 或 x1 y1 x2 y2")
+    parser.add_argument('--sample-rates', type=float, nargs='+', default=[2, 10], help="采样频率(Hz)")
+    parser.add_argument('--work-dir', default=os.path.join(BENCHMARK_DIR, 'work'), help="合成视频的保存目录")
+    parser.add_argument('--ffmpeg', help="ffmpeg 可执行文件路径")
+    args = parser.parse_args()
+
+    subtitle_area = normalize_subtitle_area(args.area)
+    if subtitle_area is None:
+        return
+    if find_ffmpeg(args.ffmpeg) is None:
+        print("找不到 ffmpeg，请安装 ffmpeg 或用 --ffmpeg 指定")
+        return
+    videos = args.videos or list(prepare_videos([case for case in CASES if case['lang'] == 'en'],
+                                                args.work_dir).values())
+
+    methods = [
+        ('opencv', lambda path, rate: run_opencv(path, subtitle_area, rate)),
+        ('ffmpeg', lambda path, rate: run_ffmpeg(path, subtitle_area, rate, ffmpeg_path=args.ffmpeg)),
+        (f'ffmpeg+缩放{SCALE_HEIGHT}', lambda path, rate: run_ffmpeg(path, subtitle_area, rate, SCALE_HEIGHT,
+                                                                  args.ffmpeg)),
+    ]
+    print(f"\n{'视频':<24}{'采样Hz':>8}{'方式':>16}{'采样帧':>8}{'耗时s':>9}{'毫秒/帧':>10}{'加速':>8}")
+    for video_path in videos:
+        name = os.path.basename(video_path)
+        for sample_rate in args.sample_rates:
+            baseline = None
+            for method, run in methods:
+                samples, elapsed = run(video_path, sample_rate)
+                if baseline is None:
+                    baseline = elapsed
+                per_frame = elapsed / samples * 1000 if samples else 0
+                print(f"{name:<24}{sample_rate:>8g}{method:>16}{samples:>8}{elapsed:>9.2f}{per_frame:>10.2f}"
+                      f"{baseline / elapsed:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
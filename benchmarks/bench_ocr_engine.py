@@ -0,0 +1,156 @@
+"""
+OCR 推理后端的速度/准确率对比：PaddleOCR 与 ONNX Runtime（FP32 和 INT8 量化）
+
+从视频中均匀抽取若干帧，截取字幕区域并按默认参数预处理后，用各个后端批量识别，
+报告每个字幕区域的识别耗时、相对第一个后端的加速，以及识别文本与第一个后端的一致程度；
+使用合成视频时还与字幕真值比较，给出各后端相对第一个后端的准确率差值
+
+ONNX 后端需要先运行 convert_onnx_models.py 转换模型，没有转换时跳过
+不指定视频时使用 run_benchmarks 的合成视频
+
+用法: python benchmarks/bench_ocr_engine.py [视频路径 ...] [--area 0.8 0.97] [--frames 60] [--lang ch]
+"""
+import argparse
+import difflib
+import os
+import sys
+import time
+
+import cv2
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+from extractor_config import get_config
+from ocr_engine import create_engine
+from run_benchmarks import CASES, prepare_videos
+from subtitle_extractor import (OCR_BATCH_SIZE, REC_BATCH_NUM, RoiPreprocessor, crop_area, join_text_items,
+                                normalize_subtitle_area, ocr_batch, warm_up_ocr)
+from synthetic import SUBTITLE_AREA, load_ground_truth
+
+# (名称, 覆盖的配置)，第一项作为速度和文本一致性的基准
+ENGINES = [
+    ('paddle', {'ocr_engine': 'paddle'}),
+    ('onnx', {'ocr_engine': 'onnx', 'onnx_quantized': False}),
+    ('onnx-int8', {'ocr_engine': 'onnx', 'onnx_quantized': True}),
+]
+
+def sample_rois(video_path, subtitle_area, frames):
+    """
+    均匀抽取 frames 帧并截取字幕区域，返回 [(时间, 字幕区域), ...]
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"错误：无法打开视频文件: {video_path}")
+        return []
+    samples = []
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        for i in range(frames):
+            position = int(total_frames * (i + 0.5) / frames)
+            cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+            ret, frame = cap.read()
+            if ret:
+                samples.append((position / fps if fps else 0.0, crop_area(frame, subtitle_area).copy()))
+    finally:
+        cap.release()
+    return samples
+
+def truth_texts(video_path, times):
+    """
+    合成视频在各个时间点的字幕真值（没有字幕时为空字符串），不是合成视频时返回 None
+    """
+    if not os.path.exists(os.path.splitext(video_path)[0] + '.json'):
+        return None
+    cues = load_ground_truth(video_path)['cues']
+    return [next((cue['text'] for cue in cues if cue['start'] <= current_time < cue['end']), "")
+            for current_time in times]
+
+def recognize(ocr, rois):
+    """
+    按流水线的方式（默认预处理、OCR_BATCH_SIZE 个一批）识别所有字幕区域，返回 (文本列表, 总耗时)
+    """
+    preprocess = RoiPreprocessor()
+    rois = [preprocess(roi) for roi in rois]
+    start = time.perf_counter()
+    texts = []
+    for i in range(0, len(rois), OCR_BATCH_SIZE):
+        for items in ocr_batch(ocr, rois[i:i + OCR_BATCH_SIZE]):
+            texts.append(join_text_items(items) if items is not None else "")
+    return texts, time.perf_counter() - start
+
+def _normalize_text(text):
+    return ''.join(text.split()).lower()
+
+def compare(texts, references):
+    """
+    (完全一致的比例, 平均字符相似度)
+    """
+    exact = sum(_normalize_text(a) == _normalize_text(b) for a, b in zip(texts, references)) / len(texts)
+    similarity = sum(difflib.SequenceMatcher(None, _normalize_text(a), _normalize_text(b)).ratio()
+                     for a, b in zip(texts, references)) / len(texts)
+    return exact, similarity
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR 推理后端的速度/准确率对比")
+    parser.add_argument('videos', nargs='*', help="视频路径，默认使用合成视频")
+    parser.add_argument('--area', type=float, nargs='+', default=list(SUBTITLE_AREA),
+                        help="字幕区域 bottom_ratio top_ratio 或 x1 y1 x2 y2")
+    parser.add_argument('--frames', type=int, default=60, help="每个视频抽取的帧数")
+    parser.add_argument('--lang', default=None, help="识别语言，默认为合成视频的语言或配置中的 lang")
+    parser.add_argument('--engines', nargs='+', choices=[name for name, _ in ENGINES],
+                        default=[name for name, _ in ENGINES], help="参与对比的后端，第一个作为基准")
+    parser.add_argument('--work-dir', default=os.path.join(BENCHMARK_DIR, 'work'), help="合成视频的保存目录")
+    args = parser.parse_args()
+
+    subtitle_area = normalize_subtitle_area(args.area)
+    if subtitle_area is None:
+        return
+    if args.videos:
+        videos = [(path, args.lang or get_config()['lang']) for path in args.videos]
+    else:
+        cases = [case for case in CASES if case['lang'] == (args.lang or 'en')]
+        paths = prepare_videos(cases, args.work_dir)
+        videos = [(paths[case['name']], case['lang']) for case in cases if case['name'] in paths]
+    engines = [(name, dict(ENGINES)[name]) for name in args.engines]
+
+    print(f"\n{'视频':<24}{'后端':>10}{'毫秒/区域':>10}{'加速':>8}{'与基准一致':>10}{'字符相似度':>10}"
+          f"{'真值一致':>10}{'准确率差':>10}")
+    for video_path, lang in videos:
+        samples = sample_rois(video_path, subtitle_area, args.frames)
+        if not samples:
+            print(f"未能从 {video_path} 读取任何帧")
+            continue
+        rois = [roi for _, roi in samples]
+        truth = truth_texts(video_path, [current_time for current_time, _ in samples])
+        name = os.path.basename(video_path)
+        baseline_texts = baseline_time = baseline_accuracy = None
+        for engine_name, overrides in engines:
+            ocr = create_engine(dict(get_config(), **overrides), lang, rec_batch_num=REC_BATCH_NUM)
+            if ocr is None:
+                print(f"{name:<24}{engine_name:>10}  初始化失败，跳过")
+                continue
+            if overrides.get('onnx_quantized') and not ocr.quantized:
+                print(f"{name:<24}{engine_name:>10}  没有量化模型，跳过（convert_onnx_models.py 不要加 --no-quantize）")
+                continue
+            # 预热，避免第一次推理的初始化耗时计入
+            warm_up_ocr(ocr)
+            recognize(ocr, rois[:2])
+            texts, elapsed = recognize(ocr, rois)
+            if baseline_texts is None:
+                baseline_texts, baseline_time = texts, elapsed
+            exact, similarity = compare(texts, baseline_texts)
+            accuracy_text = delta_text = '-'
+            if truth is not None:
+                accuracy = compare(texts, truth)[0]
+                if baseline_accuracy is None:
+                    baseline_accuracy = accuracy
+                accuracy_text = f"{accuracy:.1%}"
+                delta_text = f"{(accuracy - baseline_accuracy) * 100:+.1f}pt"
+            per_roi = elapsed / len(rois) * 1000
+            print(f"{name:<24}{engine_name:>10}{per_roi:>10.1f}{baseline_time / elapsed:>7.2f}x"
+                  f"{exact:>10.1%}{similarity:>10.1%}{accuracy_text:>10}{delta_text:>10}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+字幕区域预处理的速度/准确率对比
+
+从视频中均匀抽取若干帧，截取字幕区域后按不同的预处理参数识别，
+报告每个字幕区域的平均识别耗时，以及识别文本与不做预处理时的一致程度
+
+用法: python benchmarks/bench_preprocess.py 视频路径 [--area 0.8 0.9] [--frames 60] [--lang ch]
+"""
+import argparse
+import difflib
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from subtitle_extractor import (RoiPreprocessor, create_ocr, crop_area, join_text_items, normalize_subtitle_area,
+                                ocr_batch, OCR_BATCH_SIZE)
+
+# (名称, 预处理)，第一项作为准确率的基准；文字N 为按估计的文字高度缩小，区域N 为整个区域缩小到固定高度
+SETTINGS = [
+    ('原始尺寸', None),
+    ('补齐尺寸', RoiPreprocessor(text_height=None)),
+    ('文字48', RoiPreprocessor(text_height=48)),
+    ('文字40', RoiPreprocessor(text_height=40)),
+    ('文字32', RoiPreprocessor(text_height=32)),
+    ('文字40+灰度', RoiPreprocessor(text_height=40, grayscale=True)),
+    ('文字40+二值化', RoiPreprocessor(text_height=40, binarize=True)),
+    ('区域96', RoiPreprocessor(text_height=None, target_height=96)),
+    ('区域64', RoiPreprocessor(text_height=None, target_height=64)),
+]
+
+def sample_rois(video_path, subtitle_area, frames):
+    """
+    均匀抽取 frames 帧并截取字幕区域
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"错误：无法打开视频文件: {video_path}")
+        return []
+    rois = []
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        for i in range(frames):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(total_frames * (i + 0.5) / frames))
+            ret, frame = cap.read()
+            if ret:
+                rois.append(crop_area(frame, subtitle_area).copy())
+    finally:
+        cap.release()
+    return rois
+
+def recognize(ocr, rois, preprocess):
+    """
+    按预处理参数识别所有字幕区域，返回 (文本列表, 总耗时)
+    """
+    start = time.perf_counter()
+    texts = []
+    for i in range(0, len(rois), OCR_BATCH_SIZE):
+        batch = rois[i:i + OCR_BATCH_SIZE]
+        if preprocess is not None:
+            batch = [preprocess(roi) for roi in batch]
+        for items in ocr_batch(ocr, batch):
+            texts.append(join_text_items(items) if items is not None else "")
+    return texts, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="字幕区域预处理的速度/准确率对比")
+    parser.add_argument('video_path')
+    parser.add_argument('--area', type=float, nargs='+', default=[0.8, 0.9],
+                        help="字幕区域 bottom_ratio top_ratio 或 x1 y1 x2 y2")
+    parser.add_argument('--frames', type=int, default=60, help="抽取的帧数")
+    parser.add_argument('--lang', default='ch')
+    args = parser.parse_args()
+
+    subtitle_area = normalize_subtitle_area(args.area)
+    if subtitle_area is None:
+        return
+    rois = sample_rois(args.video_path, subtitle_area, args.frames)
+    if not rois:
+        print("未能读取任何帧")
+        return
+    ocr = create_ocr(args.lang)
+    if ocr is None:
+        return
+
+    # 预热，避免第一次推理的初始化耗时计入第一项
+    recognize(ocr, rois[:2], None)
+
+    height, width = rois[0].shape[:2]
+    print(f"\n字幕区域 {width}x{height}，共 {len(rois)} 帧")
+    print(f"{'参数':<14}{'尺寸':>12}{'毫秒/帧':>10}{'加速':>8}{'文本一致':>10}{'字符相似度':>12}")
+    baseline_texts = None
+    baseline_time = None
+    for name, preprocess in SETTINGS:
+        texts, elapsed = recognize(ocr, rois, preprocess)
+        if baseline_texts is None:
+            baseline_texts, baseline_time = texts, elapsed
+        sample = preprocess(rois[0]) if preprocess is not None else rois[0]
+        size = f"{sample.shape[1]}x{sample.shape[0]}"
+        exact = sum(a == b for a, b in zip(texts, baseline_texts)) / len(texts)
+        similarity = sum(difflib.SequenceMatcher(None, a, b).ratio()
+                         for a, b in zip(texts, baseline_texts)) / len(texts)
+        print(f"{name:<14}{size:>12}{elapsed / len(rois) * 1000:>10.1f}{baseline_time / elapsed:>7.2f}x"
+              f"{exact:>10.1%}{similarity:>12.1%}")
+
+if __name__ == '__main__':
+    main()
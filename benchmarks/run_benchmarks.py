@@ -0,0 +1,338 @@
+"""
+字幕提取基准测试
+
+生成几种分辨率、帧率和语言的合成视频（已生成的直接复用），分别用 extract_subtitles 和
+批量处理 process_videos_in_groups 提取字幕，报告处理速度、每分钟视频的 OCR 调用次数、
+峰值内存，以及与字幕真值相比的召回率、准确率和时间轴误差
+
+用法: python benchmarks/run_benchmarks.py [--cases 720p_25fps_en ...] [--batch] [--json report.json]
+"""
+import argparse
+import difflib
+import glob
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+from synthetic import SUBTITLE_AREA, load_ground_truth, make_synthetic_video
+
+CASES = [
+    {'name': '480p_24fps_en', 'width': 854, 'height': 480, 'fps': 24, 'duration': 60, 'lang': 'en'},
+    {'name': '720p_25fps_en', 'width': 1280, 'height': 720, 'fps': 25, 'duration': 60, 'lang': 'en'},
+    {'name': '1080p_30fps_ch', 'width': 1920, 'height': 1080, 'fps': 30, 'duration': 60, 'lang': 'ch'},
+    {'name': '1080p_60fps_en', 'width': 1920, 'height': 1080, 'fps': 60, 'duration': 30, 'lang': 'en'},
+    {'name': '720p_24fps_japan', 'width': 1280, 'height': 720, 'fps': 24, 'duration': 60, 'lang': 'japan'},
+    {'name': '2160p_25fps_en', 'width': 3840, 'height': 2160, 'fps': 25, 'duration': 30, 'lang': 'en'},
+]
+
+MATCH_SIMILARITY = 0.8  # 文本相似度达到该值才认为识别出了这条字幕
+MATCH_TIME_TOLERANCE = 1.0  # 匹配时允许的时间偏差(秒)
+
+def peak_rss_mb(include_children=False):
+    """
+    当前进程（可选包括已结束的子进程）的峰值内存(MB)，无法获取时返回 None
+    """
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if include_children:
+            usage = max(usage, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        # Linux 单位为 KB，macOS 为字节
+        return usage / (1024 * 1024) if sys.platform == 'darwin' else usage / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except (ImportError, AttributeError):
+        return None
+
+class CountingOcr:
+    """
+    包装 OCR 引擎，统计检测、识别和整图识别的调用次数
+    """
+    def __init__(self, ocr):
+        self.engine = ocr
+        self.cache_suffix = ocr.cache_suffix
+        self.calls = 0
+
+    def detect(self, image):
+        self.calls += 1
+        return self.engine.detect(image)
+
+    def recognize(self, images):
+        self.calls += 1
+        return self.engine.recognize(images)
+
+    def ocr(self, image):
+        self.calls += 1
+        return self.engine.ocr(image)
+
+def parse_srt(path):
+    """
+    读取字幕文件，返回 [{'start', 'end', 'text'}, ...]
+    """
+    with open(path, encoding='utf-8') as f:
+        blocks = f.read().strip().split('\n\n')
+    cues = []
+    pattern = re.compile(r'(\d+):(\d+):(\d+),(\d+) --> (\d+):(\d+):(\d+),(\d+)')
+    for block in blocks:
+        lines = block.strip().split('\n')
+        for i, line in enumerate(lines):
+            match = pattern.match(line)
+            if match:
+                values = [int(value) for value in match.groups()]
+                start = values[0] * 3600 + values[1] * 60 + values[2] + values[3] / 1000
+                end = values[4] * 3600 + values[5] * 60 + values[6] + values[7] / 1000
+                cues.append({'start': start, 'end': end, 'text': ' '.join(lines[i + 1:])})
+                break
+    return cues
+
+def _normalize_text(text):
+    return re.sub(r'\s+', '', text).lower()
+
+def evaluate_cues(truth, output):
+    """
+    按时间和文本把输出字幕与真值一一匹配，计算召回率、准确率、文本相似度和起止时间误差
+    """
+    used = set()
+    start_errors, end_errors, similarities = [], [], []
+    for cue in truth:
+        best, best_similarity = None, 0.0
+        for i, candidate in enumerate(output):
+            if i in used:
+                continue
+            if candidate['end'] < cue['start'] - MATCH_TIME_TOLERANCE:
+                continue
+            if candidate['start'] > cue['end'] + MATCH_TIME_TOLERANCE:
+                break
+            similarity = difflib.SequenceMatcher(None, _normalize_text(cue['text']),
+                                                 _normalize_text(candidate['text'])).ratio()
+            if similarity > best_similarity:
+                best, best_similarity = i, similarity
+        if best is not None and best_similarity >= MATCH_SIMILARITY:
+            used.add(best)
+            similarities.append(best_similarity)
+            start_errors.append(abs(output[best]['start'] - cue['start']))
+            end_errors.append(abs(output[best]['end'] - cue['end']))
+
+    def mean(values):
+        return sum(values) / len(values) if values else None
+
+    return {
+        'truth_cues': len(truth),
+        'output_cues': len(output),
+        'recall': len(used) / len(truth) if truth else None,
+        'precision': len(used) / len(output) if output else None,
+        'text_similarity': mean(similarities),
+        'start_error_ms': mean(start_errors) * 1000 if start_errors else None,
+        'end_error_ms': mean(end_errors) * 1000 if end_errors else None,
+    }
+
+def find_output_srt(video_path):
+    """
+    找到 SrtWriter 为该视频写出的字幕文件（输出目录下以视频名开头）
+    """
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    paths = glob.glob(os.path.join(os.path.dirname(video_path), 'output', f"{glob.escape(name)}_*.srt"))
+    return max(paths, key=os.path.getmtime) if paths else None
+
+def clear_outputs(video_path):
+    """
+    删除上一次运行留下的字幕和断点文件，保证每次都从头处理
+    """
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    for path in glob.glob(os.path.join(os.path.dirname(video_path), 'output', f"{glob.escape(name)}*")):
+        os.remove(path)
+
+def _run_single(video_path, lang, extract_kwargs, ocr_engine=None):
+    """
+    子进程中运行：加载模型后计时 extract_subtitles，ocr_engine 指定时覆盖配置中的推理后端
+    """
+    from extractor_config import get_config, set_config
+    from metrics import StageMetrics
+    from subtitle_extractor import create_ocr, extract_subtitles
+    if ocr_engine is not None:
+        set_config(dict(get_config(), ocr_engine=ocr_engine))
+    clear_outputs(video_path)
+    load_start = time.perf_counter()
+    ocr = create_ocr(lang)
+    if ocr is None:
+        return None
+    counter = CountingOcr(ocr)
+    metrics = StageMetrics()
+    load_time = time.perf_counter() - load_start
+    start = time.perf_counter()
+    save_path = extract_subtitles(video_path, lang=lang, subtitle_area=SUBTITLE_AREA, ocr=counter,
+                                  resume=False, metrics=metrics, **extract_kwargs)
+    ocr_calls = counter.calls
+    if extract_kwargs.get('ocr_processes'):
+        # 识别进程中的调用次数从各阶段耗时的计数得到
+        stages = metrics.to_dict()['stages']
+        ocr_calls = sum(stages.get(stage, {}).get('count', 0) for stage in ('ocr_det', 'ocr_cls_rec', 'ocr_full'))
+    return {
+        'elapsed': time.perf_counter() - start,
+        'model_load': load_time,
+        'ocr_calls': ocr_calls,
+        'save_path': save_path,
+        'peak_rss_mb': peak_rss_mb(),
+        'metrics': metrics.to_dict(),
+    }
+
+def _run_batch(video_paths, lang, workers, sample_rate):
+    """
+    子进程中运行：计时 process_videos_in_groups（包括各工作进程加载模型的时间）
+    """
+    from subtitle_extractor import DEFAULT_SAMPLE_RATE, process_videos_in_groups
+    if sample_rate is None:
+        sample_rate = DEFAULT_SAMPLE_RATE
+    for video_path in video_paths:
+        clear_outputs(video_path)
+    start = time.perf_counter()
+    process_videos_in_groups(video_paths, {path: SUBTITLE_AREA for path in video_paths}, lang,
+                             workers=workers, sample_rate=sample_rate)
+    return {
+        'elapsed': time.perf_counter() - start,
+        'peak_rss_mb': peak_rss_mb(include_children=True),
+    }
+
+def run_in_child(func, *args):
+    """
+    在独立的子进程中运行，峰值内存互不影响
+    """
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(func, *args).result()
+
+def prepare_videos(cases, work_dir, font_path=None, regenerate=False):
+    """
+    生成（或复用）合成视频，返回 {用例名: 视频路径}
+    """
+    videos = {}
+    for case in cases:
+        path = os.path.join(work_dir, case['name'] + '.mp4')
+        truth_path = os.path.splitext(path)[0] + '.json'
+        if regenerate or not (os.path.exists(path) and os.path.exists(truth_path)):
+            print(f"生成合成视频: {case['name']}")
+            cues = make_synthetic_video(path, case['width'], case['height'], case['fps'], case['duration'],
+                                        case['lang'], font_path=font_path)
+            if cues is None:
+                continue
+        videos[case['name']] = path
+    return videos
+
+def _format(value, pattern):
+    return pattern.format(value) if value is not None else '-'
+
+def print_report(results):
+    print(f"\n{'用例':<20}{'帧/秒':>9}{'OCR次/分钟':>12}{'峰值MB':>9}{'召回':>8}{'准确':>8}"
+          f"{'文本':>8}{'起始误差ms':>12}{'结束误差ms':>12}")
+    for result in results:
+        accuracy = result.get('accuracy') or {}
+        print(f"{result['name']:<20}"
+              f"{_format(result.get('frames_per_second'), '{:.1f}'):>9}"
+              f"{_format(result.get('ocr_calls_per_minute'), '{:.1f}'):>12}"
+              f"{_format(result.get('peak_rss_mb'), '{:.0f}'):>9}"
+              f"{_format(accuracy.get('recall'), '{:.1%}'):>8}"
+              f"{_format(accuracy.get('precision'), '{:.1%}'):>8}"
+              f"{_format(accuracy.get('text_similarity'), '{:.1%}'):>8}"
+              f"{_format(accuracy.get('start_error_ms'), '{:.0f}'):>12}"
+              f"{_format(accuracy.get('end_error_ms'), '{:.0f}'):>12}")
+
+def main():
+    parser = argparse.ArgumentParser(description="字幕提取基准测试")
+    parser.add_argument('--cases', nargs='+', help="只运行这些用例，默认全部")
+    parser.add_argument('--work-dir', default=os.path.join(BENCHMARK_DIR, 'work'), help="合成视频的保存目录")
+    parser.add_argument('--font', help="绘制中文、日文字幕使用的字体文件")
+    parser.add_argument('--regenerate', action='store_true', help="重新生成合成视频")
+    parser.add_argument('--sample-rate', type=float, default=None, help="采样频率(Hz)")
+    parser.add_argument('--adaptive', action='store_true', help="使用自适应采样")
+    parser.add_argument('--frame-source', choices=['opencv', 'ffmpeg'], default=None, help="取帧方式")
+    parser.add_argument('--ocr-engine', choices=['paddle', 'onnx'], default=None,
+                        help="OCR 推理后端，默认使用配置中的 ocr_engine")
+    parser.add_argument('--ocr-processes', type=int, default=0,
+                        help="识别进程数，大于0时一个解码线程经共享内存供给多个识别进程")
+    parser.add_argument('--batch', action='store_true', help="同时测试批量处理 process_videos_in_groups")
+    parser.add_argument('--workers', type=int, default=None, help="批量处理的进程数")
+    parser.add_argument('--json', help="把结果保存为 JSON 文件")
+    args = parser.parse_args()
+
+    cases = [case for case in CASES if not args.cases or case['name'] in args.cases]
+    videos = prepare_videos(cases, args.work_dir, args.font, args.regenerate)
+
+    extract_kwargs = {'adaptive': args.adaptive}
+    if args.frame_source is not None:
+        extract_kwargs['frame_source'] = args.frame_source
+    if args.ocr_processes > 0:
+        extract_kwargs['ocr_processes'] = args.ocr_processes
+    if args.sample_rate is not None:
+        extract_kwargs['sample_rate'] = args.sample_rate
+
+    results = []
+    for case in cases:
+        video_path = videos.get(case['name'])
+        if video_path is None:
+            continue
+        print(f"\n===== {case['name']} =====")
+        run = run_in_child(_run_single, video_path, case['lang'], extract_kwargs, args.ocr_engine)
+        if run is None:
+            print("OCR 初始化失败，跳过")
+            continue
+        truth = load_ground_truth(video_path)
+        frames = int(round(truth['duration'] * truth['fps']))
+        save_path = run['save_path']
+        output = parse_srt(save_path) if save_path else []
+        results.append({
+            'name': case['name'],
+            'mode': 'single',
+            'elapsed': run['elapsed'],
+            'model_load': run['model_load'],
+            'frames_per_second': frames / run['elapsed'] if run['elapsed'] else None,
+            'ocr_calls_per_minute': run['ocr_calls'] / (truth['duration'] / 60),
+            'peak_rss_mb': run['peak_rss_mb'],
+            'accuracy': evaluate_cues(truth['cues'], output),
+            'metrics': run['metrics'],
+        })
+
+    if args.batch:
+        # 批量处理按语言分组，每组一次 process_videos_in_groups
+        sample_rate = extract_kwargs.get('sample_rate')
+        langs = sorted({case['lang'] for case in cases if case['name'] in videos})
+        for lang in langs:
+            paths = [videos[case['name']] for case in cases if case['lang'] == lang and case['name'] in videos]
+            print(f"\n===== 批量处理 {lang}（{len(paths)} 个视频）=====")
+            run = run_in_child(_run_batch, paths, lang, args.workers, sample_rate)
+            frames = 0
+            accuracies = []
+            for path in paths:
+                truth = load_ground_truth(path)
+                frames += int(round(truth['duration'] * truth['fps']))
+                save_path = find_output_srt(path)
+                accuracies.append(evaluate_cues(truth['cues'], parse_srt(save_path) if save_path else []))
+            truth_cues = sum(accuracy['truth_cues'] for accuracy in accuracies)
+            matched = sum(accuracy['recall'] * accuracy['truth_cues'] for accuracy in accuracies
+                          if accuracy['recall'] is not None)
+            results.append({
+                'name': f"batch_{lang}",
+                'mode': 'batch',
+                'elapsed': run['elapsed'],
+                'frames_per_second': frames / run['elapsed'] if run['elapsed'] else None,
+                'ocr_calls_per_minute': None,
+                'peak_rss_mb': run['peak_rss_mb'],
+                'accuracy': {'recall': matched / truth_cues if truth_cues else None},
+                'videos': accuracies,
+            })
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到: {args.json}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+生成带有硬字幕的合成视频，字幕的出现时间和文本已知，用于衡量提取速度和时间轴准确率
+英文字幕用 OpenCV 自带字体绘制；中文、日文需要 Pillow 和一个 CJK 字体文件
+"""
+import json
+import os
+
+import cv2
+import numpy as np
+
+SUBTITLE_AREA = (0.8, 0.97)  # 字幕所在的纵向范围，提取时使用该区域
+TEXT_HEIGHT_RATIO = 0.045  # 字幕文字高度占画面高度的比例
+VIDEO_FOURCC = 'mp4v'
+
+SAMPLE_TEXTS = {
+    'en': [
+        "Where were you last night",
+        "I told you not to wait for me",
+        "The train leaves at seven",
+        "Nobody knows the way back",
+        "We should have left earlier",
+        "Keep your voice down",
+        "It is not what it looks like",
+        "Let me think about it",
+    ],
+    'ch': [
+        "你昨天晚上去哪里了",
+        "我说过不用等我",
+        "火车七点出发",
+        "没有人知道回去的路",
+        "我们应该早点出发",
+        "小声一点",
+        "事情不是你看到的那样",
+        "让我再想一想",
+    ],
+    'japan': [
+        "昨日の夜はどこにいたの",
+        "待たなくていいと言ったはずだ",
+        "電車は七時に出発する",
+        "帰り道は誰も知らない",
+        "もっと早く出るべきだった",
+        "声を小さくして",
+        "見た目とは違うんだ",
+        "少し考えさせて",
+    ],
+}
+
+# 常见系统中的 CJK 字体路径，未指定字体时依次尝试
+CJK_FONT_CANDIDATES = [
+    "C:/Windows/Fonts/msyh.ttc",
+    "C:/Windows/Fonts/simhei.ttf",
+    "/System/Library/Fonts/PingFang.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+]
+
+def find_cjk_font(font_path=None):
+    """
+    返回可用的 CJK 字体路径，找不到时返回 None
+    """
+    for path in ([font_path] if font_path else []) + CJK_FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+def make_cues(duration, lang='en', seed=0):
+    """
+    生成字幕时间表 [{'start', 'end', 'text'}, ...]：每条持续1-4秒，
+    大部分字幕之间有间隔，也有一部分首尾相接，用来检验字幕切换时的时间轴
+    """
+    rng = np.random.default_rng(seed)
+    texts = SAMPLE_TEXTS[lang]
+    cues = []
+    current = rng.uniform(0.5, 2.0)
+    while True:
+        length = rng.uniform(1.0, 4.0)
+        if current + length > duration - 0.5:
+            break
+        cues.append({'start': round(current, 3), 'end': round(current + length, 3),
+                     'text': texts[len(cues) % len(texts)]})
+        current += length
+        if rng.random() < 0.7:
+            current += rng.uniform(0.3, 2.5)
+    return cues
+
+def _render_with_opencv(text, text_height):
+    """
+    用 OpenCV 字体把文字画成带黑色描边的白字，返回 (图像, 掩码)
+    """
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    scale = cv2.getFontScaleFromHeight(font, text_height, 2)
+    thickness = max(2, text_height // 12)
+    outline = thickness + max(2, text_height // 10)
+    (width, height), baseline = cv2.getTextSize(text, font, scale, outline)
+    margin = outline
+    canvas = np.zeros((height + baseline + margin * 2, width + margin * 2), dtype=np.uint8)
+    origin = (margin, margin + height)
+    mask = canvas.copy()
+    cv2.putText(mask, text, origin, font, scale, 255, outline, cv2.LINE_AA)
+    cv2.putText(canvas, text, origin, font, scale, 255, thickness, cv2.LINE_AA)
+    return cv2.cvtColor(canvas, cv2.COLOR_GRAY2BGR), mask
+
+def _render_with_pillow(text, text_height, font_path):
+    """
+    用 Pillow 和 CJK 字体把文字画成带黑色描边的白字，返回 (图像, 掩码)
+    """
+    from PIL import Image, ImageDraw, ImageFont
+    font = ImageFont.truetype(font_path, text_height)
+    stroke = max(2, text_height // 10)
+    left, top, right, bottom = font.getbbox(text, stroke_width=stroke)
+    size = (right - left + stroke * 2, bottom - top + stroke * 2)
+    canvas = Image.new('L', size, 0)
+    mask = Image.new('L', size, 0)
+    origin = (stroke - left, stroke - top)
+    ImageDraw.Draw(mask).text(origin, text, font=font, fill=255, stroke_width=stroke, stroke_fill=255)
+    ImageDraw.Draw(canvas).text(origin, text, font=font, fill=255, stroke_width=stroke, stroke_fill=0)
+    return cv2.cvtColor(np.array(canvas), cv2.COLOR_GRAY2BGR), np.array(mask)
+
+def make_synthetic_video(path, width, height, fps, duration, lang='en', seed=0, font_path=None):
+    """
+    生成合成视频并在同名 .json 文件中保存字幕真值
+    背景是缓慢移动的彩色噪声，字幕居中显示在画面底部
+    :return: 字幕真值列表，无法绘制该语言的文字时返回 None
+    """
+    if lang != 'en':
+        font_path = find_cjk_font(font_path)
+        if font_path is None:
+            print(f"跳过 {os.path.basename(path)}：没有找到 CJK 字体，请用 --font 指定")
+            return None
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            print(f"跳过 {os.path.basename(path)}：绘制 {lang} 字幕需要安装 Pillow")
+            return None
+
+    cues = make_cues(duration, lang, seed)
+    text_height = max(12, int(height * TEXT_HEIGHT_RATIO))
+    rendered = {}
+    for cue in cues:
+        if cue['text'] not in rendered:
+            if lang == 'en':
+                rendered[cue['text']] = _render_with_opencv(cue['text'], text_height)
+            else:
+                rendered[cue['text']] = _render_with_pillow(cue['text'], text_height, font_path)
+
+    # 低分辨率噪声放大后作为背景，亮度压低，避免和白色字幕混淆
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 160, (height // 16 + 1, width // 16 + 1, 3), dtype=np.uint8)
+    background = cv2.resize(noise, (width * 2, height), interpolation=cv2.INTER_LINEAR)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*VIDEO_FOURCC), fps, (width, height))
+    if not writer.isOpened():
+        print(f"错误：无法创建视频文件: {path}")
+        return None
+    try:
+        cue_index = 0
+        for frame_index in range(int(round(duration * fps))):
+            current_time = frame_index / fps
+            offset = int(current_time * 40) % width
+            frame = background[:, offset:offset + width].copy()
+
+            while cue_index < len(cues) and cues[cue_index]['end'] <= current_time:
+                cue_index += 1
+            if cue_index < len(cues) and cues[cue_index]['start'] <= current_time:
+                image, mask = rendered[cues[cue_index]['text']]
+                text_h, text_w = mask.shape
+                x = max(0, (width - text_w) // 2)
+                y = int(height * 0.9) - text_h // 2
+                region = frame[y:y + text_h, x:x + text_w]
+                visible = mask[:region.shape[0], :region.shape[1]] > 0
+                region[visible] = image[:region.shape[0], :region.shape[1]][visible]
+            writer.write(frame)
+    finally:
+        writer.release()
+
+    with open(os.path.splitext(path)[0] + '.json', 'w', encoding='utf-8') as f:
+        json.dump({'width': width, 'height': height, 'fps': fps, 'duration': duration,
+                   'lang': lang, 'cues': cues}, f, ensure_ascii=False, indent=2)
+    return cues
+
+def load_ground_truth(video_path):
+    """
+    读取 make_synthetic_video 保存的字幕真值
+    """
+    with open(os.path.splitext(video_path)[0] + '.json', encoding='utf-8') as f:
+        return json.load(f)
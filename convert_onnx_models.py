@@ -0,0 +1,109 @@
+"""
+把 models/det|rec|cls 中的 PaddleOCR 推理模型转换为 ONNX，供 ocr_engine=onnx 使用
+
+依次完成：
+1. 用 paddle2onnx 把三个模型转换为 det.onnx、rec.onnx、cls.onnx
+2. 用 ONNX Runtime 的动态量化生成 INT8 模型 det.int8.onnx 等（--no-quantize 时跳过）
+3. 复制识别模型的字符表 rec_dict.txt，并记录转换时的语言
+
+需要 pip install paddle2onnx onnxruntime；字符表默认从已安装的 paddleocr 中按语言查找，也可以用 --dict 指定
+
+用法: python convert_onnx_models.py [--lang ch] [--output models/onnx] [--no-quantize]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from extractor_config import ConfigError, add_config_arguments, config_from_args
+from ocr_engine import ONNX_DICT_FILE, ONNX_META_FILE, ONNX_MODEL_FILES, ONNX_QUANTIZED_SUFFIX
+
+ONNX_OPSET = 11
+# paddleocr 包中各语言识别模型的字符表（相对 ppocr/utils），未列出的语言为 dict/{lang}_dict.txt
+DICT_FILES = {'ch': 'ppocr_keys_v1.txt', 'en': 'en_dict.txt', 'japan': 'dict/japan_dict.txt',
+              'korean': 'dict/korean_dict.txt', 'chinese_cht': 'dict/chinese_cht_dict.txt'}
+
+def find_char_dict(lang):
+    """
+    在已安装的 paddleocr 中找到该语言的字符表，不导入 paddleocr（导入需要加载 paddle）
+    """
+    spec = importlib.util.find_spec('paddleocr')
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    utils_dir = os.path.join(list(spec.submodule_search_locations)[0], 'ppocr', 'utils')
+    path = os.path.join(utils_dir, DICT_FILES.get(lang, f"dict/{lang}_dict.txt"))
+    return path if os.path.exists(path) else None
+
+def convert_model(model_dir, output_path):
+    """
+    用 paddle2onnx 转换一个推理模型，成功时返回 True
+    """
+    if importlib.util.find_spec('paddle2onnx') is None:
+        print("错误：未安装 paddle2onnx，请运行 pip install paddle2onnx")
+        return False
+    command = [sys.executable, '-m', 'paddle2onnx.command', '--model_dir', model_dir,
+               '--model_filename', 'inference.pdmodel', '--params_filename', 'inference.pdiparams',
+               '--save_file', output_path, '--opset_version', str(ONNX_OPSET), '--enable_onnx_checker', 'True']
+    try:
+        subprocess.run(command, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"错误：转换 {model_dir} 失败（返回码 {e.returncode}）")
+        return False
+    return True
+
+def quantize_model(input_path, output_path):
+    """
+    动态量化：权重量化为 INT8，激活值在推理时按批量化，不需要校准数据
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(input_path, output_path, weight_type=QuantType.QUInt8)
+
+def main():
+    parser = argparse.ArgumentParser(description="把 PaddleOCR 推理模型转换为 ONNX（可选 INT8 量化）")
+    parser.add_argument('--output', help="ONNX 模型目录，默认为配置中的 onnx_model_dir")
+    parser.add_argument('--dict', help="识别模型的字符表，默认从已安装的 paddleocr 中按语言查找")
+    parser.add_argument('--no-quantize', action='store_true', help="只转换，不生成 INT8 量化模型")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    try:
+        config = config_from_args(args)
+    except ConfigError as e:
+        print(f"配置错误: {str(e)}")
+        exit(1)
+
+    output_dir = args.output or config['onnx_model_dir']
+    lang = config['lang']
+    dict_path = args.dict or find_char_dict(lang)
+    if dict_path is None:
+        print(f"错误：找不到 {lang} 的字符表，请用 --dict 指定")
+        exit(1)
+    os.makedirs(output_dir, exist_ok=True)
+
+    model_dirs = {'det': config['det_model_dir'], 'rec': config['rec_model_dir'], 'cls': config['cls_model_dir']}
+    for kind, model_dir in model_dirs.items():
+        output_path = os.path.join(output_dir, ONNX_MODEL_FILES[kind])
+        if kind == 'cls' and not config['use_angle_cls']:
+            continue
+        print(f"\n转换 {model_dir} -> {output_path}")
+        if not convert_model(model_dir, output_path):
+            exit(1)
+        if not args.no_quantize:
+            quantized_path = os.path.splitext(output_path)[0] + ONNX_QUANTIZED_SUFFIX
+            print(f"量化 -> {quantized_path}")
+            try:
+                quantize_model(output_path, quantized_path)
+            except Exception as e:
+                print(f"错误：量化失败: {str(e)}")
+                exit(1)
+
+    shutil.copyfile(dict_path, os.path.join(output_dir, ONNX_DICT_FILE))
+    with open(os.path.join(output_dir, ONNX_META_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'lang': lang, 'quantized': not args.no_quantize, 'opset': ONNX_OPSET,
+                   'source': model_dirs}, f, ensure_ascii=False, indent=2)
+    print(f"\n转换完成，在配置中设置 ocr_engine=onnx（onnx_model_dir={output_dir}）即可使用")
+
+if __name__ == '__main__':
+    main()
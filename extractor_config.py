@@ -0,0 +1,199 @@
+import os
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(PROJECT_DIR, 'config.txt')
+ENV_PREFIX = 'SUBTITLE_'  # 环境变量前缀，例如 SUBTITLE_DET_MODEL_DIR、SUBTITLE_CPU_THREADS
+
+# 配置项：名称 -> (类型, 默认值, 说明)；默认值为 None 表示使用代码中的默认值
+OPTIONS = {
+    'det_model_dir': (str, 'models/det', "文字检测模型目录，相对路径相对于配置文件所在目录"),
+    'rec_model_dir': (str, 'models/rec', "文字识别模型目录"),
+    'cls_model_dir': (str, 'models/cls', "方向分类模型目录"),
+    'use_angle_cls': (bool, True, "是否使用方向分类"),
+    'lang': (str, 'ch', "默认识别语言"),
+    'use_gpu': (bool, False, "是否使用 GPU"),
+    'enable_mkldnn': (bool, True, "CPU 推理是否启用 MKLDNN"),
+    'cpu_threads': (int, None, "每个 OCR 实例的 CPU 线程数(cpu_math_library_num_threads)，默认按核数和进程数分配"),
+    'rec_batch_num': (int, None, "识别模型一次推理的文本框数"),
+    'max_batch_size': (int, 7, "PaddleOCR 的 max_batch_size 参数"),
+    'show_log': (bool, False, "是否显示 PaddleOCR 的日志（调试时打开）"),
+    'batch_size': (int, None, "攒够多少个字幕区域后批量识别"),
+    'sample_rate': (float, None, "每秒采样的帧数(Hz)"),
+    'change_threshold': (float, None, "字幕区域的变化像素占文字像素的比例超过该值才重新识别，默认0.1"),
+    'workers': (int, None, "批量处理的进程数，默认按 CPU 核数"),
+    'pin_cpus': (bool, False, "是否把每个工作进程绑定到固定的 CPU 核（仅 Linux）"),
+    'ocr_workers': (int, None, "单个视频的识别线程数"),
+    'ocr_processes': (int, None, "单个视频的识别进程数，字幕区域经共享内存传给识别进程"),
+    'cache_path': (str, None, "OCR 磁盘缓存(SQLite)路径"),
+    'text_presence': (bool, True, "先用边缘密度判断字幕区域是否有文字，没有时不运行 OCR"),
+    'save_observations': (bool, False, "同时把每个采样帧的识别结果保存为观测记录(output/视频名.observations.npz)，"
+                                       "之后可以用 --from-log 调整阈值重新生成字幕，不必重新 OCR"),
+    'roi_text_height': (int, None, "送入 OCR 前把字幕文字缩小到的高度(像素)，只缩小不放大，默认40，0 表示不缩小"),
+    'roi_target_height': (int, None, "送入 OCR 前把整个字幕区域缩小到的高度(像素)，不论文字大小，默认不使用"),
+    'roi_grayscale': (bool, False, "送入 OCR 前转为灰度图"),
+    'roi_binarize': (bool, False, "送入 OCR 前二值化，只保留亮色文字"),
+    'frame_source': (str, 'opencv', "取帧方式：opencv，或 ffmpeg（子进程只输出采样帧的字幕区域）"),
+    'ffmpeg_path': (str, None, "ffmpeg 可执行文件路径，默认从 PATH 中查找"),
+    'ocr_engine': (str, 'paddle', "OCR 推理后端：paddle，或 onnx（ONNX Runtime，模型由 convert_onnx_models.py 转换）"),
+    'onnx_model_dir': (str, 'models/onnx', "ONNX 模型目录"),
+    'onnx_quantized': (bool, True, "ONNX 后端是否使用 INT8 量化模型（存在时）"),
+}
+
+PATH_OPTIONS = ('det_model_dir', 'rec_model_dir', 'cls_model_dir', 'cache_path', 'onnx_model_dir')
+POSITIVE_OPTIONS = ('cpu_threads', 'rec_batch_num', 'max_batch_size', 'batch_size', 'sample_rate', 'workers',
+                    'ocr_workers', 'ocr_processes')
+NON_NEGATIVE_OPTIONS = ('change_threshold', 'roi_text_height', 'roi_target_height')
+CHOICE_OPTIONS = {'frame_source': ('opencv', 'ffmpeg'), 'ocr_engine': ('paddle', 'onnx')}
+
+class ConfigError(ValueError):
+    """
+    配置文件、环境变量或命令行参数不合法
+    """
+
+def _parse_value(name, value, source):
+    kind = OPTIONS[name][0]
+    if not isinstance(value, str):
+        return value
+    value = value.strip()
+    if value == '':
+        return None
+    if kind is bool:
+        lowered = value.lower()
+        if lowered in ('1', 'true', 'yes', 'on'):
+            return True
+        if lowered in ('0', 'false', 'no', 'off'):
+            return False
+        raise ConfigError(f"{source}: {name} 必须是 true 或 false，而不是 {value!r}")
+    try:
+        return kind(value)
+    except ValueError:
+        raise ConfigError(f"{source}: {name} 必须是{'整数' if kind is int else '数字'}，而不是 {value!r}")
+
+def read_config_file(path):
+    """
+    读取 key=value 格式的配置文件，# 开头的行为注释
+    """
+    values = {}
+    with open(path, encoding='utf-8-sig') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if '=' not in line:
+                raise ConfigError(f"{path} 第 {line_number} 行格式错误，应为 key=value")
+            name, value = (part.strip() for part in line.split('=', 1))
+            if name not in OPTIONS:
+                raise ConfigError(f"{path} 第 {line_number} 行: 未知的配置项 {name}")
+            values[name] = _parse_value(name, value, f"{path} 第 {line_number} 行")
+    return values
+
+def load_config(path=None, env=None, overrides=None):
+    """
+    读取配置，优先级从低到高：默认值 < 配置文件 < 环境变量 < overrides（命令行参数）
+    :param path: 配置文件路径，默认为项目目录下的 config.txt（不存在时只用默认值）
+    :param env: 环境变量字典，默认为 os.environ
+    :param overrides: 命令行等指定的配置，值为 None 的项忽略
+    :return: 配置字典
+    """
+    config = {name: default for name, (_, default, _) in OPTIONS.items()}
+    config_path = path or CONFIG_FILE
+    if os.path.exists(config_path):
+        config.update(read_config_file(config_path))
+    elif path:
+        raise ConfigError(f"配置文件不存在: {path}")
+
+    env = os.environ if env is None else env
+    for name in OPTIONS:
+        env_name = ENV_PREFIX + name.upper()
+        if env_name in env:
+            config[name] = _parse_value(name, env[env_name], f"环境变量 {env_name}")
+
+    for name, value in (overrides or {}).items():
+        if name not in OPTIONS:
+            raise ConfigError(f"未知的配置项 {name}")
+        if value is not None:
+            config[name] = _parse_value(name, value, f"参数 {name}")
+
+    # 相对路径相对于配置文件所在目录，与从哪个目录启动无关
+    base_dir = os.path.dirname(os.path.abspath(config_path))
+    for name in PATH_OPTIONS:
+        if config[name] and not os.path.isabs(config[name]):
+            config[name] = os.path.normpath(os.path.join(base_dir, config[name]))
+    for name in POSITIVE_OPTIONS:
+        if config[name] is not None and config[name] <= 0:
+            raise ConfigError(f"{name} 必须大于0，而不是 {config[name]}")
+    for name in NON_NEGATIVE_OPTIONS:
+        if config[name] is not None and config[name] < 0:
+            raise ConfigError(f"{name} 不能小于0，而不是 {config[name]}")
+    for name, choices in CHOICE_OPTIONS.items():
+        if config[name] not in choices:
+            raise ConfigError(f"{name} 必须是 {' 或 '.join(choices)}，而不是 {config[name]!r}")
+    return config
+
+_config = None
+
+def get_config():
+    """
+    当前进程使用的配置，第一次调用时从配置文件和环境变量读取
+    """
+    global _config
+    if _config is None:
+        _config = load_config()
+    return _config
+
+def set_config(config):
+    """
+    替换当前进程使用的配置（入口脚本解析命令行之后调用，或进程池子进程接收父进程的配置）
+    """
+    global _config
+    _config = dict(config)
+
+def add_config_arguments(parser):
+    """
+    为 argparse 添加 --config 以及每个配置项对应的命令行参数（如 --cpu-threads）
+    """
+    group = parser.add_argument_group("配置（覆盖 config.txt 和环境变量）")
+    group.add_argument('--config', help="配置文件路径，默认为项目目录下的 config.txt")
+    for name, (_, _, help_text) in OPTIONS.items():
+        group.add_argument('--' + name.replace('_', '-'), dest=name, default=None, help=help_text)
+    return parser
+
+def config_from_args(args):
+    """
+    根据 add_config_arguments 解析出的命令行参数读取配置，并设为当前进程的配置
+    """
+    config = load_config(args.config, overrides={name: getattr(args, name) for name in OPTIONS})
+    set_config(config)
+    return config
+
+def paddle_ocr_options(config=None, lang=None):
+    """
+    由配置生成 PaddleOCR 的初始化参数
+    """
+    config = config or get_config()
+    options = {
+        'use_angle_cls': config['use_angle_cls'],
+        'lang': lang or config['lang'],
+        'det_model_dir': config['det_model_dir'],
+        'rec_model_dir': config['rec_model_dir'],
+        'cls_model_dir': config['cls_model_dir'],
+        'use_gpu': config['use_gpu'],
+        'enable_mkldnn': config['enable_mkldnn'],
+        'max_batch_size': config['max_batch_size'],
+        'show_log': config['show_log'],
+    }
+    if config['cpu_threads'] is not None:
+        options['cpu_threads'] = config['cpu_threads']
+    if config['rec_batch_num'] is not None:
+        options['rec_batch_num'] = config['rec_batch_num']
+    return options
+
+def extract_options(config=None):
+    """
+    由配置生成 extract_subtitles 的参数（采样率、变化阈值、批大小、识别线程数和进程数、缓存路径、文字预判），
+    未设置的项不返回
+    """
+    config = config or get_config()
+    return {name: config[name] for name in ('sample_rate', 'change_threshold', 'batch_size', 'ocr_workers',
+                                            'ocr_processes', 'cache_path', 'text_presence')
+            if config[name] is not None}
@@ -0,0 +1,148 @@
+"""
+取帧器（frame source）：按采样间隔从视频中取帧
+
+所有取帧器都遵循同一个接口（subtitle_extractor.FrameSampler 为 OpenCV 实现）：
+- 迭代得到 (frame_count, frame)，frame_count 从1开始，只取 frame_count % step == 0 的帧
+  （FfmpegFrameSampler 可以用 first_index=0 改为从0开始编号，与 video_subtitle_extractor 的 OpenCV 取帧一致）
+- step 为采样间隔，frames_read 为已经推进过的帧数，use_seek 表示是否按帧号跳转
+- cropped 为 True 时 frame 已经是字幕区域，调用方不再截取
+- close() 释放资源，提前结束迭代时调用
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+FRAME_SOURCES = ('opencv', 'ffmpeg')
+FFMPEG_BUFFER_COUNT = 2  # 轮流使用的帧缓冲个数，迭代得到的帧在之后第二次迭代时被覆盖
+SEEK_LEAD_FRAMES = 0.25  # 从中途开始时，跳转点比目标帧的时间戳提前多少帧
+
+def find_ffmpeg(ffmpeg_path=None):
+    """
+    返回可用的 ffmpeg 可执行文件路径，找不到时返回 None
+    """
+    if ffmpeg_path:
+        return ffmpeg_path if os.path.exists(ffmpeg_path) else shutil.which(ffmpeg_path)
+    return shutil.which('ffmpeg')
+
+def area_to_pixels(width, height, subtitle_area):
+    """
+    把 (x1, y1, x2, y2) 比例换算为像素矩形 (x, y, w, h)，取整方式与 crop_subtitle_region 一致
+    """
+    x1, y1, x2, y2 = subtitle_area
+    left, right = int(width * x1), int(width * x2)
+    top, bottom = int(height * y1), int(height * y2)
+    return left, top, max(1, right - left), max(1, bottom - top)
+
+class FfmpegFrameSampler:
+    """
+    用 ffmpeg 子进程取帧：select 滤镜只保留采样帧，crop 滤镜截出字幕区域，
+    scale_height 小于区域高度时再用 scale 滤镜缩小，只有字幕区域的 BGR 像素经管道传回
+    与 OpenCV 相比省掉了整帧的颜色转换和拷贝；管道数据用 readinto 读入预先分配的缓冲区，每帧不再分配内存
+    迭代得到的帧是缓冲区的视图，调用方需要保留时自行拷贝
+    first_index 为第一帧的序号：默认为1（与 FrameSampler 一致），为0时第一个采样帧是视频的第一帧
+    """
+    cropped = True
+    use_seek = False
+
+    def __init__(self, video_path, fps, step, frame_width, frame_height, subtitle_area,
+                 total_frames=0, start_frame=0, end_frame=None, scale_height=None, ffmpeg_path=None,
+                 first_index=1):
+        self.video_path = video_path
+        self.fps = fps
+        self.step = max(1, step)
+        self.total_frames = total_frames
+        self.start_frame = start_frame
+        self.end_frame = end_frame if end_frame is not None else total_frames  # 0 表示帧数未知
+        self.frames_read = start_frame
+        self.first_index = first_index
+        self.ffmpeg_path = find_ffmpeg(ffmpeg_path)
+        if self.ffmpeg_path is None:
+            raise FileNotFoundError("找不到 ffmpeg，请安装 ffmpeg 或在配置中指定 ffmpeg_path")
+
+        self.crop_rect = area_to_pixels(frame_width, frame_height, subtitle_area)
+        _, _, width, height = self.crop_rect
+        self.scaled = bool(scale_height) and height > scale_height
+        if self.scaled:
+            width, height = max(1, int(round(width * scale_height / height))), scale_height
+        self.shape = (height, width, 3)
+        self.process = None
+
+    def command(self):
+        """
+        ffmpeg 命令行：从 start_frame 开始解码，选出 frame_count % step == 0 的帧
+        """
+        x, y, width, height = self.crop_rect
+        # 跳转之后 select 的 n 从0开始，对应序号为 start_frame + first_index 的帧
+        filters = [f"select='not(mod(n+{self.start_frame + self.first_index}\\,{self.step}))'",
+                   f"crop={width}:{height}:{x}:{y}:exact=1"]
+        if self.scaled:
+            filters.append(f"scale={self.shape[1]}:{self.shape[0]}:flags=area")
+        command = [self.ffmpeg_path, '-nostdin', '-hide_banner', '-loglevel', 'error']
+        if self.start_frame > 0 and self.fps > 0:
+            # 跳转点取目标帧之前四分之一帧：跳转点取整后可能略晚于目标帧的时间戳，目标帧被丢弃后
+            # select 的对齐会整体错开一帧；也不能早半帧，AVI 等容器会把跳转点取整到最近的帧
+            command += ['-ss', f"{(self.start_frame - SEEK_LEAD_FRAMES) / self.fps:.6f}"]
+        command += ['-i', self.video_path, '-an', '-sn', '-dn', '-vf', ','.join(filters),
+                    '-vsync', 'passthrough']
+        if self.end_frame > 0:
+            # 序号在 [start_frame + first_index, end_frame - 1 + first_index] 之间且是 step 倍数的帧数
+            last_index = self.end_frame - 1 + self.first_index
+            command += ['-frames:v', str(max(0, last_index // self.step
+                                                 - (self.start_frame + self.first_index - 1) // self.step))]
+        command += ['-pix_fmt', 'bgr24', '-f', 'rawvideo', 'pipe:1']
+        return command
+
+    def __iter__(self):
+        frame_bytes = self.shape[0] * self.shape[1] * self.shape[2]
+        buffers = [bytearray(frame_bytes) for _ in range(FFMPEG_BUFFER_COUNT)]
+        frames = [np.frombuffer(buffer, dtype=np.uint8).reshape(self.shape) for buffer in buffers]
+        views = [memoryview(buffer) for buffer in buffers]
+
+        # 错误信息写入临时文件，不用管道，避免 ffmpeg 输出大量错误时阻塞
+        with tempfile.TemporaryFile() as stderr:
+            self.process = subprocess.Popen(
+                self.command(), stdout=subprocess.PIPE, stderr=stderr, bufsize=frame_bytes,
+                creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+            try:
+                first = self.start_frame + self.first_index
+                frame_count = (first + self.step - 1) // self.step * self.step
+                last_index = self.end_frame - 1 + self.first_index
+                index = 0
+                while self.end_frame <= 0 or frame_count <= last_index:
+                    view = views[index]
+                    filled = 0
+                    while filled < frame_bytes:
+                        n = self.process.stdout.readinto(view[filled:])
+                        if not n:
+                            break
+                        filled += n
+                    if filled < frame_bytes:
+                        break
+                    self.frames_read = frame_count + 1 - self.first_index
+                    yield frame_count, frames[index]
+                    frame_count += self.step
+                    index = (index + 1) % FFMPEG_BUFFER_COUNT
+                if self.end_frame > 0:
+                    self.frames_read = self.end_frame
+
+                if self.process.wait() != 0:
+                    stderr.seek(0)
+                    message = stderr.read().decode('utf-8', errors='replace').strip()
+                    print(f"\nffmpeg 解码出错: {message.splitlines()[-1] if message else self.process.returncode}")
+            finally:
+                self.close()
+
+    def close(self):
+        """
+        结束 ffmpeg 子进程（提前停止迭代时调用）
+        """
+        process, self.process = self.process, None
+        if process is None:
+            return
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
@@ -1,3 +1,43 @@
+const API_BASE = 'http://localhost:5000/api';
+
+// 正在运行的任务，取消按钮对它发送取消请求
+let currentJobId = null;
+
+function updateProgress(job) {
+    const progressBar = document.getElementById('progressBar');
+    const percent = Math.round(job.progress * 100);
+    progressBar.style.width = `${percent}%`;
+    progressBar.textContent = `${percent}%`;
+}
+
+function waitForJob(jobId) {
+    const status = document.getElementById('status');
+    return new Promise((resolve, reject) => {
+        const timer = setInterval(async () => {
+            try {
+                const response = await fetch(`${API_BASE}/jobs/${jobId}`);
+                const result = await response.json();
+                if (!result.success) {
+                    clearInterval(timer);
+                    reject(new Error(result.error));
+                    return;
+                }
+                const job = result.job;
+                updateProgress(job);
+                if (job.status === 'running') {
+                    status.textContent = `正在提取字幕... 已识别 ${job.cues_found} 条`;
+                } else if (job.status !== 'queued') {
+                    clearInterval(timer);
+                    resolve(job);
+                }
+            } catch (error) {
+                clearInterval(timer);
+                reject(error);
+            }
+        }, 500);
+    });
+}
+
 document.getElementById('extractBtn').addEventListener('click', async () => {
     const videoInput = document.getElementById('videoInput');
     const file = videoInput.files[0];
@@ -7,27 +47,64 @@ document.getElementById('extractBtn').addEventListener('click', async () => {
     }
 
     const status = document.getElementById('status');
+    const extractBtn = document.getElementById('extractBtn');
+    const cancelBtn = document.getElementById('cancelBtn');
     status.textContent = '正在提取字幕...';
+    extractBtn.disabled = true;
 
     try {
-        const response = await fetch('http://localhost:5000/api/extract', {
+        const response = await fetch(`${API_BASE}/jobs`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
-                video_path: file.path,
-                output_path: 'output/subtitles.srt'
+                video_path: file.path
             })
         });
 
         const result = await response.json();
-        if (result.success) {
-            status.textContent = '字幕提取完成！';
-        } else {
+        if (!result.success) {
             status.textContent = `错误：${result.error}`;
+            return;
+        }
+
+        currentJobId = result.job_id;
+        cancelBtn.disabled = false;
+        const job = await waitForJob(result.job_id);
+        if (job.status === 'finished') {
+            status.textContent = `字幕提取完成！已保存到：${job.output_path}`;
+        } else if (job.status === 'cancelled') {
+            status.textContent = '已取消';
+        } else {
+            status.textContent = `错误：${job.error}`;
         }
     } catch (error) {
         status.textContent = `错误：${error.message}`;
+    } finally {
+        currentJobId = null;
+        cancelBtn.disabled = true;
+        extractBtn.disabled = false;
+    }
+});
+
+document.getElementById('cancelBtn').addEventListener('click', async () => {
+    if (!currentJobId) {
+        return;
+    }
+    const status = document.getElementById('status');
+    const cancelBtn = document.getElementById('cancelBtn');
+    cancelBtn.disabled = true;
+    try {
+        const response = await fetch(`${API_BASE}/jobs/${currentJobId}/cancel`, {method: 'POST'});
+        const result = await response.json();
+        if (result.success) {
+            // 任务在处理完当前批次后停止，最终状态由 waitForJob 显示
+            status.textContent = '正在取消...';
+        } else {
+            status.textContent = `取消失败：${result.error}`;
+        }
+    } catch (error) {
+        status.textContent = `取消失败：${error.message}`;
     }
-}); 
\ No newline at end of file
+});
@@ -19,7 +19,8 @@ function createWindow() {
 }
 
 function startPythonBackend() {
-    pythonProcess = spawn('python', ['backend/api.py']);
+    // --warm：服务立即开始响应，OCR 模型在后台预先加载，第一个任务不用等待模型加载
+    pythonProcess = spawn('python', ['backend/api.py', '--warm']);
     
     pythonProcess.stdout.on('data', (data) => {
         console.log(`Python: ${data}`);
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import time
+
+MANIFEST_FILE = 'processed_videos.json'  # 处理记录的文件名，保存在字幕输出目录中
+PARTIAL_HASH_CHUNK = 1024 * 1024  # 部分哈希读取视频开头、中间、结尾各这么多字节
+
+def _plain(value):
+    """
+    转成 JSON 中保存的形式（元组变成列表），便于与读出的记录比较
+    """
+    return json.loads(json.dumps(value))
+
+def video_fingerprint(video_path):
+    """
+    视频文件的指纹：大小、修改时间和部分内容哈希
+    只读开头、中间、结尾三段，大文件也能很快算完；修改时间变了但内容没变（复制、touch）时靠哈希识别
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(video_path, 'rb') as f:
+        for offset in sorted({0, max(0, size // 2 - PARTIAL_HASH_CHUNK // 2), max(0, size - PARTIAL_HASH_CHUNK)}):
+            f.seek(offset)
+            digest.update(f.read(PARTIAL_HASH_CHUNK))
+    return {'size': size, 'mtime': os.path.getmtime(video_path), 'partial_hash': digest.hexdigest()}
+
+class VideoManifest:
+    """
+    已处理视频的记录：每个视频的指纹、处理参数和输出文件
+    重新处理同一个文件夹时跳过没有变化的视频，只处理新增或修改过的视频
+    视频和输出文件的路径相对于记录文件所在目录保存，整个文件夹移动之后记录依然有效
+    """
+    def __init__(self, path):
+        self.path = path
+        self.base_dir = os.path.dirname(os.path.abspath(path))
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self.entries = json.load(f).get('videos', {})
+            except Exception as e:
+                print(f"读取处理记录时出错，将重新处理所有视频: {str(e)}")
+
+    def _key(self, path):
+        return os.path.relpath(os.path.abspath(path), self.base_dir).replace(os.sep, '/')
+
+    def _resolve(self, relative_path):
+        return os.path.normpath(os.path.join(self.base_dir, relative_path))
+
+    def get_output(self, video_path):
+        """
+        上次处理该视频生成的输出文件路径，没有记录时返回 None
+        """
+        entry = self.entries.get(self._key(video_path))
+        return self._resolve(entry['output']) if entry and entry.get('output') else None
+
+    def is_up_to_date(self, video_path, settings, fingerprint=None):
+        """
+        视频已经按相同的参数处理过、文件没有变化且输出文件还在时返回 True
+        只比较 settings 中给出的参数（例如交互框选字幕区域之前只比较语言和采样率）
+        """
+        entry = self.entries.get(self._key(video_path))
+        if entry is None:
+            return False
+        if any(entry['settings'].get(name) != _plain(value) for name, value in settings.items()):
+            return False
+        output = self.get_output(video_path)
+        if output is None or not os.path.exists(output):
+            return False
+        recorded = entry['fingerprint']
+        try:
+            if os.path.getsize(video_path) != recorded['size']:
+                return False
+            if os.path.getmtime(video_path) == recorded['mtime']:
+                return True
+            # 修改时间变了，内容可能没变
+            fingerprint = fingerprint or video_fingerprint(video_path)
+        except OSError:
+            return False
+        if fingerprint['partial_hash'] != recorded['partial_hash']:
+            return False
+        recorded['mtime'] = fingerprint['mtime']
+        return True
+
+    def record(self, video_path, settings, output_path, fingerprint=None):
+        """
+        记录处理完成的视频；fingerprint 应在处理之前计算，处理期间文件被修改时下次会重新处理
+        """
+        self.entries[self._key(video_path)] = {
+            'fingerprint': fingerprint or video_fingerprint(video_path),
+            'settings': _plain(settings),
+            'output': self._key(output_path),
+            'processed_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+    def save(self):
+        """
+        先写临时文件再替换，写到一半被中断也不会损坏已有的记录
+        """
+        os.makedirs(self.base_dir, exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'videos': self.entries}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
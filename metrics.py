@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# 耗时直方图的上界(秒)，最后还有一个 +Inf 桶
+HISTOGRAM_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class StageMetrics:
+    """
+    分阶段的耗时统计：每个阶段记录次数、累计耗时和耗时直方图，另有若干计数器
+    （OCR 调用次数、跳过的帧数、被忽略的异常数等）
+    解码线程和识别线程会同时记录，所有操作都加锁
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+
+    def observe(self, stage, seconds):
+        """
+        记录某个阶段的一次耗时
+        """
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = {'count': 0, 'total': 0.0,
+                                              'buckets': [0] * (len(HISTOGRAM_BUCKETS) + 1)}
+            entry['count'] += 1
+            entry['total'] += seconds
+            for i, bound in enumerate(HISTOGRAM_BUCKETS):
+                if seconds <= bound:
+                    entry['buckets'][i] += 1
+                    break
+            else:
+                entry['buckets'][-1] += 1
+
+    @contextmanager
+    def time(self, stage):
+        """
+        用法: with metrics.time('ocr_det'): ...
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count(self, name, value=1):
+        """
+        累加计数器
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        """
+        转成可以序列化为 JSON 的字典，也用于在进程之间传递
+        """
+        with self.lock:
+            stages = {}
+            for stage, entry in self.stages.items():
+                stages[stage] = {
+                    'count': entry['count'],
+                    'total_seconds': round(entry['total'], 6),
+                    'mean_ms': round(entry['total'] / entry['count'] * 1000, 3) if entry['count'] else 0,
+                    'buckets': list(entry['buckets']),
+                }
+            return {'bucket_bounds': list(HISTOGRAM_BUCKETS), 'stages': stages, 'counters': dict(self.counters)}
+
+    def merge_dict(self, data):
+        """
+        合并 to_dict 得到的另一份统计（分段进程、批量处理的各个视频）
+        """
+        if not data:
+            return
+        with self.lock:
+            for stage, other in data.get('stages', {}).items():
+                entry = self.stages.get(stage)
+                if entry is None:
+                    entry = self.stages[stage] = {'count': 0, 'total': 0.0,
+                                                  'buckets': [0] * (len(HISTOGRAM_BUCKETS) + 1)}
+                entry['count'] += other['count']
+                entry['total'] += other['total_seconds']
+                for i, value in enumerate(other['buckets']):
+                    entry['buckets'][i] += value
+            for name, value in data.get('counters', {}).items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def save(self, path, **meta):
+        """
+        保存为 JSON 文件，meta 中的信息（视频路径、帧数、总耗时等）一并写入
+        """
+        data = self.to_dict()
+        data['meta'] = meta
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def summary(self):
+        """
+        按累计耗时从多到少排列的各阶段耗时，便于打印
+        """
+        data = self.to_dict()
+        stages = sorted(data['stages'].items(), key=lambda item: item[1]['total_seconds'], reverse=True)
+        return ", ".join(f"{stage} {entry['total_seconds']:.2f}s" for stage, entry in stages)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+def format_prometheus(metrics, prefix='subtitle_extractor', labels=None):
+    """
+    输出 Prometheus 文本格式：各阶段耗时为 histogram，计数器为 counter
+    :param metrics: StageMetrics 实例或 to_dict 得到的字典
+    """
+    data = metrics.to_dict() if isinstance(metrics, StageMetrics) else metrics
+    labels = labels or {}
+    lines = [
+        f"# HELP {prefix}_stage_seconds Time spent in each extraction stage",
+        f"# TYPE {prefix}_stage_seconds histogram",
+    ]
+    for stage, entry in sorted(data['stages'].items()):
+        stage_labels = dict(labels, stage=stage)
+        cumulative = 0
+        for bound, value in zip(data['bucket_bounds'] + ['+Inf'], entry['buckets']):
+            cumulative += value
+            lines.append(f"{prefix}_stage_seconds_bucket{_format_labels(dict(stage_labels, le=bound))} {cumulative}")
+        lines.append(f"{prefix}_stage_seconds_sum{_format_labels(stage_labels)} {entry['total_seconds']}")
+        lines.append(f"{prefix}_stage_seconds_count{_format_labels(stage_labels)} {entry['count']}")
+    lines.append(f"# HELP {prefix}_events_total Frames, OCR calls and swallowed errors")
+    lines.append(f"# TYPE {prefix}_events_total counter")
+    for name, value in sorted(data['counters'].items()):
+        lines.append(f"{prefix}_events_total{_format_labels(dict(labels, event=name))} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,78 @@
+import json
+
+import numpy as np
+
+_NAN_BOX = [[float('nan'), float('nan')]] * 4
+
+class ObservationLog:
+    """
+    第一阶段（OCR）的采样观测记录：每个采样帧的时间，以及识别出的文本框、文本和置信度
+    按列保存为 npz 文件，第二阶段可以反复读取它生成字幕，调整时间轴阈值时不需要重新 OCR
+    """
+    def __init__(self):
+        self.times = []
+        self.item_counts = []
+        self.texts = []
+        self.confidences = []
+        self.boxes = []
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self, current_time, items):
+        """
+        记录一个采样帧，items 为 [(文本, 置信度, 文本框), ...]
+        """
+        self.times.append(current_time)
+        self.item_counts.append(len(items))
+        for text, confidence, *rest in items:
+            box = rest[0] if rest else None  # 旧版缓存中的文本项没有文本框
+            self.texts.append(text)
+            self.confidences.append(confidence)
+            self.boxes.append(box if box is not None else _NAN_BOX)
+
+    def save(self, path, **meta):
+        """
+        保存为压缩的 npz 文件，文本按 UTF-8 拼接成一列并记录偏移，不依赖 pickle
+        meta 中的元信息（帧率、帧数等）以 JSON 保存
+        """
+        encoded = [text.encode('utf-8') for text in self.texts]
+        text_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=text_offsets[1:])
+        with open(path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                times=np.asarray(self.times, dtype=np.float64),
+                item_counts=np.asarray(self.item_counts, dtype=np.int32),
+                text_data=np.frombuffer(b''.join(encoded), dtype=np.uint8),
+                text_offsets=text_offsets,
+                confidences=np.asarray(self.confidences, dtype=np.float32),
+                boxes=np.asarray(self.boxes, dtype=np.float32).reshape(-1, 4, 2),
+                meta=np.frombuffer(json.dumps(meta, ensure_ascii=False).encode('utf-8'), dtype=np.uint8),
+            )
+
+def load_observation_log(path):
+    """
+    读取观测记录
+    :return: (元信息字典, [(采样时间, [(文本, 置信度, 文本框), ...]), ...])
+    """
+    with np.load(path) as data:
+        meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+        times = data['times']
+        item_counts = data['item_counts']
+        text_data = data['text_data'].tobytes()
+        text_offsets = data['text_offsets']
+        confidences = data['confidences']
+        boxes = data['boxes']
+
+    observations = []
+    index = 0
+    for current_time, count in zip(times.tolist(), item_counts.tolist()):
+        items = []
+        for i in range(index, index + count):
+            text = text_data[text_offsets[i]:text_offsets[i + 1]].decode('utf-8')
+            box = None if np.isnan(boxes[i]).any() else boxes[i].tolist()
+            items.append((text, float(confidences[i]), box))
+        observations.append((current_time, items))
+        index += count
+    return meta, observations
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+CACHE_KEY_HEIGHT = 48  # 计算缓存键时把字幕区域缩放到的高度
+CACHE_KEY_VERSION = 2  # 缓存键的计算方式改变时加1，磁盘缓存中旧格式的条目不再命中
+MEMORY_CACHE_SIZE = 4096  # 内存缓存最多保存的条目数
+
+def cache_namespace(lang, settings=None):
+    """
+    缓存键的前缀：键的版本、语言（带引擎的 cache_suffix）以及影响识别结果的参数（如预处理参数）
+    磁盘缓存跨运行、跨进程共用，参数不同的识别结果不能混用
+    """
+    namespace = f"v{CACHE_KEY_VERSION}:{lang}"
+    if settings:
+        digest = hashlib.blake2b(json.dumps(settings, sort_keys=True).encode(), digest_size=6)
+        namespace += f":{digest.hexdigest()}"
+    return namespace
+
+def roi_cache_key(roi, namespace):
+    """
+    计算字幕区域的内容哈希：灰度 -> Otsu 自适应二值化 -> 按固定高度缩放 -> 哈希
+    阈值由图像本身决定，白色、彩色、灰色或半透明的文字都能与背景分开，不同字幕不会得到相同的键
+    同样的字幕图像即使来自不同视频、不同时间，也会得到相同的键
+    namespace 为 cache_namespace 生成的前缀
+    """
+    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    height, width = binary.shape[:2]
+    key_width = max(1, int(width * CACHE_KEY_HEIGHT / max(height, 1)))
+    small = cv2.resize(binary, (key_width, CACHE_KEY_HEIGHT), interpolation=cv2.INTER_AREA)
+    bits = np.packbits(small > 127)
+    digest = hashlib.blake2b(bits.tobytes(), digest_size=16)
+    digest.update(f"{key_width}x{CACHE_KEY_HEIGHT}".encode())
+    return f"{namespace}:{digest.hexdigest()}"
+
+class OcrCache:
+    """
+    OCR 结果缓存：内存 LRU + 可选的 SQLite 磁盘缓存
+    值为识别出的文本项列表 [(文本, 置信度), ...]
+    磁盘缓存可以被多个进程同时使用，重新处理同一批视频时几乎不需要再做 OCR
+    """
+    def __init__(self, db_path=None, memory_size=MEMORY_CACHE_SIZE):
+        self.memory_size = memory_size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        if db_path:
+            db_dir = os.path.dirname(db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            self.db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS ocr_cache (key TEXT PRIMARY KEY, items TEXT NOT NULL)")
+            self.db.commit()
+
+    def _remember(self, key, items):
+        self.memory[key] = items
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        查询缓存，未命中时返回 None
+        """
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key]
+            if self.db is not None:
+                try:
+                    row = self.db.execute("SELECT items FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+                except sqlite3.Error as e:
+                    print(f"读取 OCR 缓存失败: {str(e)}")
+                    row = None
+                if row is not None:
+                    items = [tuple(item) for item in json.loads(row[0])]
+                    self._remember(key, items)
+                    self.hits += 1
+                    return items
+            self.misses += 1
+            return None
+
+    def put_many(self, entries):
+        """
+        批量写入缓存 [(键, 文本项列表), ...]
+        """
+        if not entries:
+            return
+        with self.lock:
+            for key, items in entries:
+                self._remember(key, items)
+            if self.db is not None:
+                try:
+                    self.db.executemany(
+                        "INSERT OR REPLACE INTO ocr_cache (key, items) VALUES (?, ?)",
+                        [(key, json.dumps(items, ensure_ascii=False)) for key, items in entries])
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    print(f"写入 OCR 缓存失败: {str(e)}")
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
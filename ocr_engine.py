@@ -0,0 +1,467 @@
+"""
+OCR 引擎：统一的识别接口和结果格式，识别代码不再依赖具体的推理后端
+
+所有引擎都实现：
+- detect(image) -> 文本框列表，每个文本框为四个顶点 [[x, y], ...]（左上、右上、右下、左下）
+- recognize(images) -> 与 images 一一对应的 (文本, 置信度)，需要时先做方向分类
+- ocr(image) -> 单张图像的文本项列表 [TextItem, ...]，按从上到下、从左到右排列
+识别结果统一为 TextItem(text, confidence, box)，它是普通元组，可以直接存入 OCR 缓存
+
+目前有两个后端：
+- paddle: PaddleOCR（默认）
+- onnx: ONNX Runtime CPU 推理，模型由 convert_onnx_models.py 从 models/det|rec|cls 转换，可选 INT8 量化
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import threading
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from extractor_config import get_config, paddle_ocr_options
+
+OCR_ENGINES = ('paddle', 'onnx')
+
+TextItem = namedtuple('TextItem', ['text', 'confidence', 'box'])
+
+# convert_onnx_models.py 生成的模型目录中的文件
+ONNX_MODEL_FILES = {'det': 'det.onnx', 'rec': 'rec.onnx', 'cls': 'cls.onnx'}
+ONNX_QUANTIZED_SUFFIX = '.int8.onnx'  # 量化模型的文件名为 det.int8.onnx 等
+ONNX_DICT_FILE = 'rec_dict.txt'  # 识别模型的字符表
+ONNX_META_FILE = 'meta.json'  # 转换时的语言等信息
+
+# 以下参数与 PaddleOCR 的默认值一致，两个后端的结果才有可比性
+DET_LIMIT_SIDE_LEN = 960  # 检测输入的最长边
+DET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+DET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+DET_THRESH = 0.3  # 概率图二值化阈值
+DET_BOX_THRESH = 0.6  # 文本框内平均概率低于该值的丢弃
+DET_UNCLIP_RATIO = 1.5  # 文本框向外扩展的比例
+DET_MIN_SIZE = 3  # 短边小于该值的文本框丢弃
+DET_MAX_CANDIDATES = 1000
+CLS_IMAGE_SHAPE = (48, 192)  # 方向分类的输入高、宽
+CLS_THRESH = 0.9  # 判断为倒置的置信度阈值
+CLS_BATCH_NUM = 6
+REC_IMAGE_SHAPE = (48, 320)  # 识别的输入高度和最小宽度，模型输入高度固定时以模型为准
+REC_BATCH_NUM = 6
+# ocr([图像列表], det=False) 把嵌套的列表作为一批文本图像识别的 PaddleOCR 版本范围 [起, 止)
+PADDLE_BATCH_RECOGNIZE_VERSIONS = ((2, 6), (3, 0))
+
+def sort_text_boxes(boxes):
+    """
+    按从上到下、从左到右的顺序排列文本框，同一行（纵坐标相差10像素以内）按横坐标排序
+    """
+    boxes = sorted(boxes, key=lambda box: (box[0][1], box[0][0]))
+    for i in range(len(boxes) - 1):
+        for j in range(i, -1, -1):
+            if abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10 and boxes[j + 1][0][0] < boxes[j][0][0]:
+                boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+            else:
+                break
+    return boxes
+
+def crop_text_box(image, box):
+    """
+    按检测框的四个顶点透视变换截取文本图像，竖排文本旋转为横排
+    """
+    points = np.array(box, dtype=np.float32)
+    crop_width = int(max(np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])))
+    crop_height = int(max(np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])))
+    crop_width, crop_height = max(crop_width, 1), max(crop_height, 1)
+    target = np.float32([[0, 0], [crop_width, 0], [crop_width, crop_height], [0, crop_height]])
+    matrix = cv2.getPerspectiveTransform(points, target)
+    crop = cv2.warpPerspective(image, matrix, (crop_width, crop_height),
+                               borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+    if crop_height / crop_width >= 1.5:
+        crop = np.rot90(crop)
+    return crop
+
+def make_text_item(text, confidence, box):
+    return TextItem(str(text), float(confidence),
+                    [[float(x), float(y)] for x, y in box] if box is not None else None)
+
+def extract_text_items(result):
+    """
+    从 PaddleOCR 的 ocr() 结果中取出所有文本项 [TextItem, ...]
+    """
+    items = []
+    for line in result or []:
+        if not line:  # 没有检测到文字时 PaddleOCR 返回 [None]
+            continue
+        for item in line:
+            items.append(make_text_item(item[1][0], item[1][1], item[0]))
+    return items
+
+class OcrEngine:
+    """
+    OCR 引擎的基类，子类实现 detect 和 recognize
+    cache_suffix 附加在 OCR 缓存键的语言之后，由后端和模型指纹组成，不同后端、不同模型的识别结果不会混用
+    """
+    name = None
+    cache_suffix = ''
+
+    def detect(self, image):
+        raise NotImplementedError
+
+    def recognize(self, images):
+        raise NotImplementedError
+
+    def ocr(self, image):
+        boxes = sort_text_boxes(self.detect(image))
+        if not boxes:
+            return []
+        recognized = self.recognize([crop_text_box(image, box) for box in boxes])
+        return [make_text_item(text, confidence, box) for box, (text, confidence) in zip(boxes, recognized)]
+
+_paddleocr_class = None
+_paddleocr_lock = threading.Lock()
+
+def load_paddleocr():
+    """
+    第一次用到 OCR 时才导入 paddleocr，框选字幕区域、处理观测记录等不需要 OCR 的功能不必等待
+    """
+    global _paddleocr_class
+    with _paddleocr_lock:
+        if _paddleocr_class is None:
+            from paddleocr import PaddleOCR
+            _paddleocr_class = PaddleOCR
+    return _paddleocr_class
+
+def paddleocr_version(paddle_class):
+    """
+    PaddleOCR 的版本号 (主, 次)，取不到时返回 None
+    """
+    module = sys.modules.get(paddle_class.__module__.split('.')[0])
+    numbers = re.findall(r'\d+', str(getattr(module, '__version__', '')))
+    return tuple(int(number) for number in numbers[:2]) if len(numbers) >= 2 else None
+
+def _recognized_text(result):
+    """
+    从 ocr(单张文本图像, det=False) 的结果中取出 (文本, 置信度)：
+    2.6 起为 [[(文本, 置信度)]]，更早的版本为 [(文本, 置信度)]，没有结果时为空字符串
+    """
+    while isinstance(result, (list, tuple)) and result and not isinstance(result[0], str):
+        result = result[0]
+    if isinstance(result, (list, tuple)) and len(result) == 2 and isinstance(result[0], str):
+        return result[0], float(result[1])
+    return '', 0.0
+
+class PaddleEngine(OcrEngine):
+    """
+    PaddleOCR 后端，options 为 PaddleOCR 的初始化参数
+    recognize 在 PADDLE_BATCH_RECOGNIZE_VERSIONS 范围内的版本中一次识别所有文本图像；版本之外逐张识别，
+    版本号未知时先尝试一次批量识别，结果数量不对或出错就改为逐张识别（PaddleOCR 3.x 的接口不同，不支持）
+    """
+    name = 'paddle'
+
+    def __init__(self, **options):
+        self.use_angle_cls = options.get('use_angle_cls', True)
+        paddle_class = load_paddleocr()
+        self.paddle = paddle_class(**options)
+        version = paddleocr_version(paddle_class)
+        if version is None:
+            self.batch_recognize = None
+        else:
+            first, last = PADDLE_BATCH_RECOGNIZE_VERSIONS
+            self.batch_recognize = first <= version < last
+            if version >= last:
+                print(f"警告：PaddleOCR {'.'.join(map(str, version))} 的接口与 2.x 不同，可能无法识别")
+
+    def detect(self, image):
+        result = self.paddle.ocr(image, rec=False)
+        return result[0] if result and result[0] is not None else []
+
+    def recognize(self, images):
+        images = list(images)
+        if not images:
+            return []
+        if self.batch_recognize is not False:
+            # PaddleOCR 2.6 起列表中的每个元素是一张单独的图像，各自返回一个结果；
+            # 嵌套一层列表才作为一批文本图像一起识别，结果与 images 一一对应
+            try:
+                result = self.paddle.ocr([images], det=False, cls=self.use_angle_cls)
+            except Exception:
+                if self.batch_recognize:
+                    raise
+                result = None  # 版本未知时说明不支持批量识别
+            recognized = result[0] if result else None
+            if isinstance(recognized, list) and len(recognized) == len(images):
+                self.batch_recognize = True
+                return [_recognized_text(item) for item in recognized]
+            print(f"\n警告：PaddleOCR 批量识别返回了 {len(recognized) if isinstance(recognized, list) else 0} 个结果"
+                  f"（应为 {len(images)} 个），改为逐张识别")
+            self.batch_recognize = False
+        return [_recognized_text(self.paddle.ocr(image, det=False, cls=self.use_angle_cls)) for image in images]
+
+    def ocr(self, image):
+        return extract_text_items(self.paddle.ocr(image, cls=self.use_angle_cls))
+
+def onnx_model_files(model_dir, quantized=True):
+    """
+    ONNX 模型目录中实际使用的模型文件 {'det': 路径, 'rec': 路径, 'cls': 路径}，要求量化但没有量化模型时使用原模型
+    """
+    files = {}
+    for kind, file_name in ONNX_MODEL_FILES.items():
+        path = os.path.join(model_dir, file_name)
+        quantized_path = os.path.splitext(path)[0] + ONNX_QUANTIZED_SUFFIX
+        files[kind] = quantized_path if quantized and os.path.exists(quantized_path) else path
+    return files
+
+def model_fingerprint(paths, *settings):
+    """
+    模型文件的指纹：各模型目录（或文件）中文件的名称、大小和修改时间，以及影响识别结果的设置
+    替换模型文件后 OCR 缓存中旧模型的识别结果不会再命中
+    """
+    digest = hashlib.blake2b(digest_size=6)
+    for path in paths:
+        if os.path.isdir(path):
+            files = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+        else:
+            files = [path]
+        for file_path in files:
+            if os.path.isfile(file_path):
+                stat = os.stat(file_path)
+                digest.update(f"{os.path.basename(file_path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    digest.update(repr(settings).encode())
+    return digest.hexdigest()
+
+def _paddle_cache_suffix(options):
+    model_dirs = [options[name] for name in ('det_model_dir', 'rec_model_dir', 'cls_model_dir') if name in options]
+    return '@paddle#' + model_fingerprint(model_dirs, options['lang'], options['use_angle_cls'])
+
+def _onnx_cache_suffix(files, use_angle_cls):
+    quantized = files['rec'].endswith(ONNX_QUANTIZED_SUFFIX)
+    model_dir = os.path.dirname(files['rec'])
+    fingerprint = model_fingerprint([files['det'], files['rec'], files['cls'], os.path.join(model_dir, ONNX_DICT_FILE)],
+                                    use_angle_cls and os.path.exists(files['cls']))
+    return ('@onnx-int8#' if quantized else '@onnx#') + fingerprint
+
+def engine_cache_suffix(config=None, lang=None):
+    """
+    按配置创建的引擎的 cache_suffix，不创建引擎（识别进程的代理用它计算缓存键）
+    """
+    config = config or get_config()
+    if config['ocr_engine'] == 'onnx':
+        return _onnx_cache_suffix(onnx_model_files(config['onnx_model_dir'], config['onnx_quantized']),
+                                  config['use_angle_cls'])
+    return _paddle_cache_suffix(paddle_ocr_options(config, lang))
+
+def _onnx_session(path, threads):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    # 线程数由 ThreadBudget 分配，与 Paddle 的 cpu_threads 含义相同；0 表示按核数
+    options.intra_op_num_threads = threads or 0
+    options.inter_op_num_threads = 1
+    return ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+
+def _order_box(rect):
+    """
+    最小外接矩形的四个顶点，按左上、右上、右下、左下排列
+    """
+    points = sorted(cv2.boxPoints(rect).tolist(), key=lambda point: point[0])
+    left = points[:2] if points[0][1] <= points[1][1] else points[1::-1]
+    right = points[2:] if points[2][1] <= points[3][1] else points[3:1:-1]
+    return np.array([left[0], right[0], right[1], left[1]], dtype=np.float32)
+
+def _box_score(probability, box):
+    """
+    文本框内概率图的平均值
+    """
+    height, width = probability.shape
+    x_min = int(np.clip(np.floor(box[:, 0].min()), 0, width - 1))
+    x_max = int(np.clip(np.ceil(box[:, 0].max()), 0, width - 1))
+    y_min = int(np.clip(np.floor(box[:, 1].min()), 0, height - 1))
+    y_max = int(np.clip(np.ceil(box[:, 1].max()), 0, height - 1))
+    mask = np.zeros((y_max - y_min + 1, x_max - x_min + 1), dtype=np.uint8)
+    cv2.fillPoly(mask, [(box - (x_min, y_min)).astype(np.int32)], 1)
+    return cv2.mean(probability[y_min:y_max + 1, x_min:x_max + 1], mask)[0]
+
+def _normalize_line(image, height, width, max_width):
+    """
+    识别和方向分类的输入：保持宽高比缩放到指定高度，归一化到 [-1, 1]，右侧补零到 max_width
+    """
+    resized_width = min(width, max(1, int(math.ceil(height * image.shape[1] / max(image.shape[0], 1)))))
+    resized = cv2.resize(image, (resized_width, height)).astype(np.float32)
+    if resized.ndim == 2:
+        resized = cv2.cvtColor(resized, cv2.COLOR_GRAY2BGR)
+    padded = np.zeros((3, height, max_width), dtype=np.float32)
+    padded[:, :, :resized_width] = (resized.transpose(2, 0, 1) / 255 - 0.5) / 0.5
+    return padded
+
+class OnnxEngine(OcrEngine):
+    """
+    ONNX Runtime CPU 后端：运行从 PaddleOCR 模型转换的检测(DB)、方向分类和识别(CTC)模型
+    前后处理与 PaddleOCR 的默认参数一致；INT8 量化模型的权重为8位整数，矩阵运算更快、内存占用更小
+    """
+    name = 'onnx'
+
+    def __init__(self, model_dir, quantized=True, use_angle_cls=True, threads=None, rec_batch_num=None,
+                 lang=None):
+        files = onnx_model_files(model_dir, quantized)
+        self.quantized = files['rec'].endswith(ONNX_QUANTIZED_SUFFIX)
+        self.cache_suffix = _onnx_cache_suffix(files, use_angle_cls)
+
+        meta_path = os.path.join(model_dir, ONNX_META_FILE)
+        if lang and os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                converted_lang = json.load(f).get('lang')
+            if converted_lang and converted_lang != lang:
+                print(f"警告：ONNX 识别模型转换自 {converted_lang}，与识别语言 {lang} 不一致")
+        with open(os.path.join(model_dir, ONNX_DICT_FILE), encoding='utf-8') as f:
+            # 0 为 CTC 空白，字符表之后还有空格
+            self.characters = ['blank'] + [line.rstrip('\r\n') for line in f] + [' ']
+
+        self.det = _onnx_session(files['det'], threads)
+        self.rec = _onnx_session(files['rec'], threads)
+        self.cls = _onnx_session(files['cls'], threads) if use_angle_cls and os.path.exists(files['cls']) else None
+        rec_height = self.rec.get_inputs()[0].shape[2]
+        self.rec_height = rec_height if isinstance(rec_height, int) else REC_IMAGE_SHAPE[0]
+        self.rec_batch_num = rec_batch_num or REC_BATCH_NUM
+
+    def detect(self, image):
+        height, width = image.shape[:2]
+        scale = min(1.0, DET_LIMIT_SIDE_LEN / max(height, width))
+        resized_height = max(32, int(round(height * scale / 32)) * 32)
+        resized_width = max(32, int(round(width * scale / 32)) * 32)
+        resized = cv2.resize(image, (resized_width, resized_height)).astype(np.float32)
+        if resized.ndim == 2:
+            resized = cv2.cvtColor(resized, cv2.COLOR_GRAY2BGR)
+        blob = ((resized / 255 - DET_MEAN) / DET_STD).transpose(2, 0, 1)[np.newaxis]
+        probability = self.det.run(None, {self.det.get_inputs()[0].name: blob})[0][0, 0]
+
+        bitmap = (probability > DET_THRESH).astype(np.uint8)
+        contours, _ = cv2.findContours(bitmap * 255, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        scale_x, scale_y = width / resized_width, height / resized_height
+        boxes = []
+        for contour in contours[:DET_MAX_CANDIDATES]:
+            rect = cv2.minAreaRect(contour)
+            if min(rect[1]) < DET_MIN_SIZE:
+                continue
+            box = _order_box(rect)
+            if _box_score(probability, box) < DET_BOX_THRESH:
+                continue
+            # DB 的文本区域比文字略小，按 面积 * 比例 / 周长 向外扩展；对矩形来说与多边形偏移的结果相同
+            box_width, box_height = rect[1]
+            distance = box_width * box_height * DET_UNCLIP_RATIO / (2 * (box_width + box_height))
+            rect = (rect[0], (box_width + 2 * distance, box_height + 2 * distance), rect[2])
+            if min(rect[1]) < DET_MIN_SIZE + 2:
+                continue
+            box = _order_box(rect)
+            box[:, 0] = np.clip(np.round(box[:, 0] * scale_x), 0, width)
+            box[:, 1] = np.clip(np.round(box[:, 1] * scale_y), 0, height)
+            if np.linalg.norm(box[0] - box[1]) <= 3 or np.linalg.norm(box[0] - box[3]) <= 3:
+                continue
+            boxes.append(box.tolist())
+        return boxes
+
+    def _classify(self, images):
+        """
+        方向分类：判断为倒置的文本图像旋转180度
+        """
+        images = list(images)
+        order = np.argsort([image.shape[1] / max(image.shape[0], 1) for image in images])
+        height, width = CLS_IMAGE_SHAPE
+        input_name = self.cls.get_inputs()[0].name
+        for start in range(0, len(images), CLS_BATCH_NUM):
+            indexes = order[start:start + CLS_BATCH_NUM]
+            blob = np.stack([_normalize_line(images[i], height, width, width) for i in indexes])
+            probabilities = self.cls.run(None, {input_name: blob})[0]
+            for i, probability in zip(indexes, probabilities):
+                if int(np.argmax(probability)) == 1 and probability[1] > CLS_THRESH:
+                    images[i] = cv2.rotate(np.ascontiguousarray(images[i]), cv2.ROTATE_180)
+        return images
+
+    def _decode(self, probabilities):
+        """
+        CTC 贪心解码：去掉重复和空白，置信度为保留字符概率的平均值
+        """
+        indexes = probabilities.argmax(axis=1)
+        scores = probabilities.max(axis=1)
+        keep = indexes != 0
+        keep[1:] &= indexes[1:] != indexes[:-1]
+        text = ''.join(self.characters[i] for i in indexes[keep] if i < len(self.characters))
+        return text, float(scores[keep].mean()) if keep.any() else 0.0
+
+    def recognize(self, images):
+        if not images:
+            return []
+        if self.cls is not None:
+            images = self._classify(images)
+        # 宽高比相近的放在同一批，补零更少
+        order = np.argsort([image.shape[1] / max(image.shape[0], 1) for image in images])
+        results = [None] * len(images)
+        input_name = self.rec.get_inputs()[0].name
+        height = self.rec_height
+        min_ratio = REC_IMAGE_SHAPE[1] / REC_IMAGE_SHAPE[0]
+        for start in range(0, len(images), self.rec_batch_num):
+            indexes = order[start:start + self.rec_batch_num]
+            max_ratio = max([min_ratio] + [images[i].shape[1] / max(images[i].shape[0], 1) for i in indexes])
+            max_width = int(math.ceil(height * max_ratio))
+            blob = np.stack([_normalize_line(images[i], height, max_width, max_width) for i in indexes])
+            for i, probabilities in zip(indexes, self.rec.run(None, {input_name: blob})[0]):
+                results[i] = self._decode(probabilities)
+        return results
+
+def create_paddle_engine(config, lang=None, rec_batch_num=None, allow_default_models=False):
+    """
+    PaddleOCR 后端，模型路径不存在时返回 None（allow_default_models 为 True 时改用 PaddleOCR 的默认模型）
+    """
+    options = paddle_ocr_options(config, lang)
+    if rec_batch_num is not None:
+        options.setdefault('rec_batch_num', rec_batch_num)
+
+    print(f"检测模型路径: {options['det_model_dir']}")
+    print(f"识别模型路径: {options['rec_model_dir']}")
+    print(f"分类模型路径: {options['cls_model_dir']}")
+
+    for name in ('det_model_dir', 'rec_model_dir', 'cls_model_dir'):
+        if not os.path.exists(options[name]):
+            if not allow_default_models:
+                print(f"错误：模型路径不存在: {options[name]}")
+                return None
+            # 去掉不存在的模型目录，由 PaddleOCR 使用默认模型
+            del options[name]
+
+    engine = PaddleEngine(download_font=False, **options)
+    engine.cache_suffix = _paddle_cache_suffix(options)
+    return engine
+
+def create_onnx_engine(config, lang=None, rec_batch_num=None):
+    """
+    ONNX Runtime 后端，模型目录或 onnxruntime 不可用时返回 None
+    """
+    model_dir = config['onnx_model_dir']
+    print(f"ONNX 模型目录: {model_dir}{'（INT8 量化）' if config['onnx_quantized'] else ''}")
+    missing = [name for name in (ONNX_MODEL_FILES['det'], ONNX_MODEL_FILES['rec'], ONNX_DICT_FILE)
+               if not os.path.exists(os.path.join(model_dir, name))]
+    if missing:
+        print(f"错误：ONNX 模型目录中缺少 {', '.join(missing)}，请先运行 convert_onnx_models.py")
+        return None
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        print("错误：未安装 onnxruntime，请运行 pip install onnxruntime")
+        return None
+    return OnnxEngine(model_dir, config['onnx_quantized'], config['use_angle_cls'], config['cpu_threads'],
+                      config['rec_batch_num'] or rec_batch_num, lang or config['lang'])
+
+def create_engine(config=None, lang=None, rec_batch_num=None, allow_default_models=False):
+    """
+    按配置中的 ocr_engine 创建 OCR 引擎，初始化失败时返回 None
+    :param rec_batch_num: 配置中没有指定 rec_batch_num 时使用的识别批大小
+    :param allow_default_models: Paddle 后端的模型目录不存在时使用 PaddleOCR 的默认模型，而不是失败
+    """
+    config = config or get_config()
+    try:
+        if config['ocr_engine'] == 'onnx':
+            return create_onnx_engine(config, lang, rec_batch_num)
+        return create_paddle_engine(config, lang, rec_batch_num, allow_default_models)
+    except Exception as e:
+        print(f"初始化 OCR 失败: {str(e)}")
+        return None
@@ -0,0 +1,92 @@
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+
+RING_ACQUIRE_TIMEOUT = 60  # 等待空闲槽位的最长时间(秒)，超时说明识别进程已经卡住
+RING_POLL_INTERVAL = 0.1  # 等待空闲槽位时检查是否已经停止的间隔(秒)
+
+class RoiRing:
+    """
+    共享内存环形缓冲区：固定数量、固定大小的槽位，用于把字幕区域交给识别进程
+    写入方（解码所在的进程）取得空闲槽位后直接把字幕区域写入其中，队列中只传递 (槽位, 形状, 类型)，
+    识别进程直接在共享内存上构造 numpy 视图，不再经过 pickle 序列化和管道拷贝
+    空闲槽位只由创建方管理，识别进程只读
+    """
+    def __init__(self, slots, slot_bytes, name=None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=max(1, slots * slot_bytes))
+            self.free_slots = queue.Queue()
+            for slot in range(slots):
+                self.free_slots.put(slot)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.free_slots = None
+
+    def info(self):
+        """
+        识别进程用 RoiRing.attach(*info) 打开同一块共享内存
+        """
+        return self.shm.name, self.slots, self.slot_bytes
+
+    @classmethod
+    def attach(cls, name, slots, slot_bytes):
+        return cls(slots, slot_bytes, name=name)
+
+    def acquire(self, shape, dtype=np.uint8, stop_event=None):
+        """
+        取得一个空闲槽位，返回句柄 (槽位, 形状, 类型)，调用方用 view(句柄) 直接写入数据，不经过中间数组
+        数据超过槽位大小时返回一个普通数组作为句柄，由队列序列化传递
+        没有空闲槽位时等待；stop_event 被设置时放弃等待并返回 None，等待超时抛出 RuntimeError
+        """
+        dtype = np.dtype(dtype)
+        shape = tuple(shape)
+        if int(np.prod(shape)) * dtype.itemsize > self.slot_bytes:
+            return np.empty(shape, dtype=dtype)
+        waited = 0
+        while True:
+            try:
+                slot = self.free_slots.get(timeout=RING_POLL_INTERVAL)
+                return slot, shape, dtype.str
+            except queue.Empty:
+                if stop_event is not None and stop_event.is_set():
+                    return None
+                waited += RING_POLL_INTERVAL
+                if waited >= RING_ACQUIRE_TIMEOUT:
+                    raise RuntimeError("等待共享内存槽位超时")
+
+    def write(self, roi):
+        """
+        把字幕区域拷贝进一个空闲槽位，返回句柄 (槽位, 形状, 类型)
+        """
+        handle = self.acquire(roi.shape, roi.dtype)
+        self.view(handle)[...] = roi
+        return handle
+
+    def view(self, handle):
+        """
+        句柄对应的 numpy 视图，不拷贝数据；不是句柄时（超过槽位大小的数组）原样返回
+        """
+        if isinstance(handle, np.ndarray):
+            return handle
+        slot, shape, dtype = handle
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def release(self, handles):
+        """
+        识别完成后归还槽位，忽略 None（没有字幕、不占用槽位的区域）
+        """
+        for handle in handles:
+            if handle is not None and not isinstance(handle, np.ndarray):
+                self.free_slots.put(handle[0])
+
+    def close(self):
+        """
+        关闭共享内存，创建方同时删除它
+        """
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
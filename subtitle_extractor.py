@@ -2,18 +2,32 @@ import sys
 import subprocess
 
 # 在导入部分添加自动安装依赖的代码
+# paddleocr 导入很慢（需要加载 paddle），在第一次创建 OCR 实例时才导入，见 ocr_engine.load_paddleocr
 try:
     import cv2
     import numpy as np
-    from paddleocr import PaddleOCR
     import time
     import os
+    import queue
+    import threading
+    import json
+    from ocr_cache import OcrCache, cache_namespace, roi_cache_key
+    from observation_log import ObservationLog, load_observation_log
+    from metrics import StageMetrics
+    from extractor_config import (ConfigError, add_config_arguments, config_from_args, extract_options, get_config,
+                                  set_config)
+    from ocr_engine import TextItem, create_engine, crop_text_box, engine_cache_suffix, sort_text_boxes
+    from thread_budget import next_worker_index, plan_thread_budget
+    from frame_source import FRAME_SOURCES, FfmpegFrameSampler, area_to_pixels, find_ffmpeg
+    from shm_transport import RoiRing
+    from manifest import MANIFEST_FILE, VideoManifest, video_fingerprint
     from tqdm import tqdm
-    from multiprocessing import Pool, cpu_count
+    from multiprocessing import Pool
     import multiprocessing
 except Exception as e:
+    # 作为模块被导入时不能直接退出进程，交给调用方处理
     print(f"导入库时出错: {str(e)}")
-    exit(1)
+    raise
 
 print("所有库导入成功")
 
@@ -97,6 +111,7 @@ def draw_rectangle(event, x, y, flags, param):
 def select_subtitle_area(video_path):
     """
     使用OpenCV实现的框选功能，可以播放视频并在暂停时框选
+    返回字幕区域 (x1, y1, x2, y2)，均为相对画面宽高的比例
     """
     global selection  # 添加这行，声明使用全局变量
     selection = None  # 重置选择
@@ -169,12 +184,10 @@ def select_subtitle_area(video_path):
                 cap.set(cv2.CAP_PROP_POS_FRAMES, max(0, current_frame - int(fps * 5)))
             elif key == 13 and selection and paused:  # Enter
                 x1, y1, x2, y2 = selection
-                height = frame.shape[0]
-                bottom_ratio = y1 / height
-                top_ratio = y2 / height
+                height, width = frame.shape[:2]
                 cap.release()
                 cv2.destroyAllWindows()
-                return (bottom_ratio, top_ratio)
+                return (x1 / width, y1 / height, x2 / width, y2 / height)
             elif key == ord('q'):  # Q
                 break
             
@@ -189,60 +202,1399 @@ def select_subtitle_area(video_path):
         cv2.destroyAllWindows()
         return None
 
-def extract_subtitles(video_path, output_file='subtitles.srt', lang='ch', subtitle_area=(0.8, 0.9)):
+DEFAULT_SAMPLE_RATE = 10  # 默认每秒采样10帧
+SEEK_THRESHOLD_FRAMES = 250  # 采样间隔达到该帧数时改为按帧号跳转，不再逐帧 grab
+
+def get_sample_step(fps, sample_rate):
     """
-    从视频中提取字幕并保存到文本文件
-    :param video_path: 视频文件路径
-    :param output_file: 输出文本文件路径
-    :param lang: 识别语言，支持 ch(中文)、en(英文)、japan(日语)
-    :param subtitle_area: 字幕区域位置元组 (bottom_ratio, top_ratio)，范围0-1
+    根据视频帧率和采样频率(Hz)计算采样间隔（帧数），至少为1
+    """
+    if fps <= 0 or sample_rate <= 0:
+        return 1
+    return max(1, int(fps / sample_rate))
+
+class FrameSampler:
+    """
+    按固定频率从视频中取帧
+    跳过的帧只调用 cap.grab()，不做解码后的颜色转换和内存拷贝；
+    采样间隔很大时直接按帧号跳转，连 grab 也省掉
+    迭代得到 (frame_count, frame)，frame_count 从1开始，与逐帧 cap.read() 的计数一致
+    指定 start_frame/end_frame 时只处理 (start_frame, end_frame] 范围内的帧，采样点与从头处理时相同
+    取帧器的接口见 frame_source，ffmpeg 实现为 FfmpegFrameSampler
+    """
+    cropped = False  # 得到的是整帧，由调用方截取字幕区域
+    
+    def __init__(self, cap, fps, sample_rate=DEFAULT_SAMPLE_RATE, total_frames=0,
+                 seek_threshold=SEEK_THRESHOLD_FRAMES, start_frame=0, end_frame=None):
+        self.cap = cap
+        self.step = get_sample_step(fps, sample_rate)
+        self.total_frames = total_frames
+        self.start_frame = start_frame
+        self.end_frame = end_frame if end_frame is not None else total_frames  # 0 表示帧数未知
+        # 帧数未知时无法判断结尾，只能逐帧 grab
+        self.use_seek = self.end_frame > 0 and self.step >= seek_threshold
+        self.frames_read = start_frame  # 已经推进过的帧数（包括跳过的帧）
+
+    def __iter__(self):
+        if self.use_seek:
+            return self._iter_seek()
+        return self._iter_grab()
+
+    def _iter_grab(self):
+        if self.start_frame > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+        while (self.end_frame <= 0 or self.frames_read < self.end_frame) and self.cap.grab():
+            self.frames_read += 1
+            if self.frames_read % self.step != 0:
+                continue
+            ret, frame = self.cap.retrieve()
+            if not ret:
+                break
+            yield self.frames_read, frame
+
+    def _iter_seek(self):
+        frame_count = (self.start_frame // self.step + 1) * self.step
+        while frame_count <= self.end_frame:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count - 1)
+            ret, frame = self.cap.read()
+            if not ret:
+                return
+            self.frames_read = frame_count
+            yield frame_count, frame
+            frame_count += self.step
+        self.frames_read = self.end_frame
+
+    def close(self):
+        """
+        VideoCapture 由调用方释放，这里不需要做什么
+        """
+
+ADAPTIVE_SAMPLE_RATE = 2  # 自适应采样时建议的粗扫频率(Hz)
+
+class AdaptiveSampler(FrameSampler):
+    """
+    自适应采样：按 sample_rate 粗扫，相邻两个粗采样点的字幕区域签名不同时，
+    在两点之间二分查找第一个发生变化的帧，并把该帧插入采样序列
+    字幕不变时只需要很少的采样，字幕变化的时间又能精确到帧
+    crop 为从整帧截取字幕区域的函数
+    """
+    def __init__(self, cap, fps, sample_rate, total_frames, crop, change_threshold=None,
+                 start_frame=0, end_frame=None):
+        super().__init__(cap, fps, sample_rate, total_frames, start_frame=start_frame, end_frame=end_frame)
+        self.crop = crop
+        self.change_threshold = change_threshold
+        self.refined_frames = 0  # 二分查找插入的采样帧数
+
+    def _changed(self, prev_signature, frame):
+        signature = roi_signature(self.crop(frame))
+        if self.change_threshold is None:
+            return roi_changed(prev_signature, signature), signature
+        return roi_changed(prev_signature, signature, self.change_threshold), signature
+
+    def _read_frame(self, frame_count):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count - 1)
+        ret, frame = self.cap.read()
+        return frame if ret else None
+
+    def __iter__(self):
+        prev_count = None
+        prev_signature = None
+        for frame_count, frame in super().__iter__():
+            changed, signature = self._changed(prev_signature, frame)
+            if changed and prev_count is not None and frame_count - prev_count > 1:
+                # 二分查找：lo 处与上一个粗采样点相同，hi 处已经变化
+                lo, hi = prev_count, frame_count
+                hi_frame = frame
+                while hi - lo > 1:
+                    mid = (lo + hi) // 2
+                    mid_frame = self._read_frame(mid)
+                    if mid_frame is None:
+                        break
+                    if self._changed(prev_signature, mid_frame)[0]:
+                        hi, hi_frame = mid, mid_frame
+                    else:
+                        lo = mid
+                # 跳转之后回到粗采样点，继续往后扫描
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count)
+                if hi != frame_count:
+                    self.refined_frames += 1
+                    yield hi, hi_frame
+            prev_count, prev_signature = frame_count, signature
+            yield frame_count, frame
+
+CHANGE_THRESHOLD = 0.1  # 变化像素占文字像素的比例超过该值才认为字幕区域发生了变化
+CHANGE_MIN_PIXELS = 8  # 变化像素少于该数量时视为压缩噪声
+SIGNATURE_WIDTH = 320  # 签名缩略图的宽度
+SIGNATURE_EDGE_THRESHOLD = 64  # 梯度超过该值的像素记为文字笔画的边缘
+
+def text_edges(roi):
+    """
+    字幕区域中文字笔画的边缘（布尔图，与 roi 同尺寸）：梯度超过 SIGNATURE_EDGE_THRESHOLD 的像素
+    边缘只取决于文字与周围的对比度，白色、彩色、灰色的文字都能检测到；平滑的背景几乎没有边缘
+    """
+    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+    grad_x = cv2.Sobel(gray, cv2.CV_16S, 1, 0)
+    grad_y = cv2.Sobel(gray, cv2.CV_16S, 0, 1)
+    gradient = cv2.addWeighted(cv2.convertScaleAbs(grad_x), 0.5, cv2.convertScaleAbs(grad_y), 0.5, 0)
+    _, edges = cv2.threshold(gradient, SIGNATURE_EDGE_THRESHOLD, 255, cv2.THRESH_BINARY)
+    return edges
+
+def roi_signature(roi):
+    """
+    计算字幕区域的缩略签名：灰度 -> 边缘 -> 缩小，用于廉价地判断字幕是否变化
+    先在原尺寸上求边缘再缩小，细笔画在缩略图中也不会被平均掉
+    """
+    edges = text_edges(roi)
+    height, width = edges.shape[:2]
+    sig_height = max(1, int(height * SIGNATURE_WIDTH / max(width, 1)))
+    small = cv2.resize(edges, (SIGNATURE_WIDTH, sig_height), interpolation=cv2.INTER_AREA)
+    # 缩略图中一个像素只要有少量边缘覆盖就记为文字像素
+    return small > 32
+
+def roi_changed(prev_signature, signature, threshold=CHANGE_THRESHOLD):
+    """
+    比较两个字幕区域签名，判断字幕是否发生了变化
+    以两帧中较多的文字像素数为基准，避免小字幕的变化被大面积背景稀释
+    """
+    if prev_signature is None or prev_signature.shape != signature.shape:
+        return True
+    diff = np.count_nonzero(prev_signature != signature)
+    ink = max(np.count_nonzero(prev_signature), np.count_nonzero(signature))
+    return diff > max(ink * threshold, CHANGE_MIN_PIXELS)
+
+PRESENCE_MIN_EDGES = 24  # 签名中边缘像素少于该数量时认为没有字幕
+
+def roi_has_text(signature):
+    """
+    廉价地判断字幕区域中是否可能有字幕，没有时不必运行 OCR
+    签名记录的是笔画的边缘，与文字的颜色和亮度无关：深色背景上的灰色、彩色文字同样有边缘；
+    边缘太少说明是平滑的背景，包括天空、灯光之类的大块亮色区域
+    判断偏保守，拿不准时返回 True 交给 OCR
+    """
+    return np.count_nonzero(signature) >= PRESENCE_MIN_EDGES
+
+MIN_CONFIDENCE = 0.9  # 文本项的最低置信度
+MIN_TEXT_LENGTH = 2  # 只保留长度大于等于2的文本项
+MAX_TEXT_LENGTH = 50  # 整行字幕的最大长度，超过时视为误识别
+
+def join_text_items(items, min_confidence=MIN_CONFIDENCE, min_text_length=MIN_TEXT_LENGTH):
+    """
+    过滤低置信度和过短的文本项，多段文字用空格连接
+    """
+    text_items = []
+    for text, confidence, *_ in items:
+        if confidence > min_confidence:  # 提高置信度阈值
+            text = text.strip()
+            if len(text) >= min_text_length:  # 只保留足够长的文本
+                text_items.append(text)
+    return " ".join(text_items)
+
+OCR_BATCH_SIZE = 8  # 攒够多少个需要识别的字幕区域后一起识别
+REC_BATCH_NUM = 32  # 识别模型单次推理的文本框数量
+
+def ocr_batch(ocr, rois, metrics=None):
+    """
+    批量识别多个字幕区域：每个区域单独做文字检测，所有区域的文本框合在一起做方向分类和识别
+    ocr 为 OcrEngine（见 create_ocr），返回与 rois 一一对应的文本项列表 [TextItem, ...]，识别失败的区域为 None
+    metrics 为 StageMetrics 时记录检测、识别的耗时和失败次数
+    """
+    if not rois:
+        return []
+    if metrics is None:
+        metrics = StageMetrics()
+    try:
+        frame_boxes = []
+        crops = []
+        for roi in rois:
+            with metrics.time('ocr_det'):
+                boxes = sort_text_boxes(ocr.detect(roi))
+            frame_boxes.append(boxes)
+            crops.extend(crop_text_box(roi, box) for box in boxes)
+        
+        if crops:
+            with metrics.time('ocr_cls_rec'):
+                recognized = ocr.recognize(crops)
+        else:
+            recognized = []
+        if len(recognized) != len(crops):
+            # 识别结果与文本框对不上时不能按顺序分配，交给下面的逐个识别
+            raise RuntimeError(f"识别结果数量({len(recognized)})与文本框数量({len(crops)})不一致")
+        
+        results = []
+        offset = 0
+        for boxes in frame_boxes:
+            results.append([TextItem(str(text), float(confidence), [[float(x), float(y)] for x, y in box])
+                            for box, (text, confidence) in zip(boxes, recognized[offset:offset + len(boxes)])])
+            offset += len(boxes)
+        return results
+    except Exception as e:
+        # 批量识别失败时退回逐个识别，单个区域出错不影响其他区域
+        print(f"批量识别失败，改为逐帧识别: {str(e)}")
+        metrics.count('ocr_batch_errors')
+        results = []
+        for roi in rois:
+            try:
+                with metrics.time('ocr_full'):
+                    results.append(ocr.ocr(roi))
+            except Exception:
+                metrics.count('ocr_errors')
+                results.append(None)
+        return results
+
+# 字幕持续时间的阈值
+MIN_DURATION = 0.5  # 最小持续0.5秒
+MAX_DURATION = 3.0  # 最大持续3秒
+EMPTY_FRAMES_THRESHOLD = 6  # 连续6个采样帧无字幕才认为字幕消失
+
+def format_srt_time(seconds):
+    """
+    将秒数格式化为 SRT 时间戳 HH:MM:SS,mmm
+    """
+    return time.strftime('%H:%M:%S,', time.gmtime(seconds)) + f'{int((seconds % 1) * 1000):03d}'
+
+class SubtitleSegmenter:
+    """
+    字幕时间轴状态机：按时间顺序输入每个采样帧识别出的文本，生成 SRT 条目
+    指定 on_cue 时每生成一条就回调 on_cue(条目文本, 开始时间)，不在内存中保留；否则保存在 subtitles 中
+    end_at_first_empty 为 True 时，字幕的结束时间取第一个无字幕采样帧的时间，
+    而不是连续无字幕帧数达到阈值时的时间（自适应采样能精确定位字幕消失的帧）
+    """
+    def __init__(self, min_duration=MIN_DURATION, max_duration=MAX_DURATION,
+                 empty_frames_threshold=EMPTY_FRAMES_THRESHOLD, on_cue=None,
+                 max_text_length=MAX_TEXT_LENGTH, end_at_first_empty=False):
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.empty_frames_threshold = empty_frames_threshold
+        self.max_text_length = max_text_length
+        self.end_at_first_empty = end_at_first_empty
+        self.on_cue = on_cue
+        self.subtitles = []
+        self.last_text = ""
+        self.start_time = None
+        self.empty_frames = 0
+        self.first_empty_time = None
+        self.subtitle_index = 1
+
+    @property
+    def cue_count(self):
+        return self.subtitle_index - 1
+
+    def get_state(self):
+        """
+        导出状态机的当前状态，用于写入断点文件
+        """
+        return {
+            'last_text': self.last_text,
+            'start_time': self.start_time,
+            'empty_frames': self.empty_frames,
+            'first_empty_time': self.first_empty_time,
+            'subtitle_index': self.subtitle_index,
+        }
+
+    def restore_state(self, state):
+        """
+        从断点文件恢复状态机
+        """
+        self.last_text = state['last_text']
+        self.start_time = state['start_time']
+        self.empty_frames = state['empty_frames']
+        self.first_empty_time = state.get('first_empty_time')
+        self.subtitle_index = state['subtitle_index']
+
+    def _append(self, start_time, end_time, text):
+        subtitle_entry = f"{self.subtitle_index}\n{format_srt_time(start_time)} --> {format_srt_time(end_time)}\n{text}\n"
+        if self.on_cue is not None:
+            self.on_cue(subtitle_entry, start_time)
+        else:
+            self.subtitles.append(subtitle_entry)
+        self.subtitle_index += 1
+
+    def feed(self, current_time, text):
+        """
+        输入一个采样帧的时间和识别文本
+        """
+        # 简单的文本验证
+        if text.strip() and len(text) <= self.max_text_length:  # 限制最大长度，避免误识别
+            self.empty_frames = 0
+            
+            if text != self.last_text:
+                if self.start_time is not None:
+                    duration = current_time - self.start_time
+                    
+                    # 确保字幕持续时间在合理范围内
+                    if duration >= self.min_duration:
+                        end_time = min(current_time, self.start_time + self.max_duration)
+                        self._append(self.start_time, end_time, self.last_text)
+                
+                self.start_time = current_time
+                self.last_text = text
+        else:
+            self.empty_frames += 1
+            if self.empty_frames == 1:
+                self.first_empty_time = current_time
+            # 如果连续多帧没有检测到字幕，结束当前字幕
+            if self.empty_frames >= self.empty_frames_threshold and self.start_time is not None:
+                end_time = self.first_empty_time if self.end_at_first_empty else current_time
+                duration = end_time - self.start_time
+                
+                if duration >= self.min_duration:
+                    self._append(self.start_time, end_time, self.last_text)
+                    
+                self.start_time = None
+                self.last_text = ""
+
+    def finish(self, end_time):
+        """
+        视频结束时关闭最后一条字幕
+        """
+        if self.start_time is not None and self.last_text:
+            self._append(self.start_time, end_time, self.last_text)
+            self.start_time = None
+            self.last_text = ""
+        return self.subtitles
+
+def get_output_dir(video_path):
+    """
+    字幕文件保存在视频所在目录下的 output 文件夹中
+    """
+    # 获取视频所在的目录
+    video_dir = os.path.dirname(video_path)
+    if not video_dir:
+        video_dir = os.getcwd()
+    return os.path.join(video_dir, 'output')
+
+def get_unique_path(directory, base_name, ext='.srt'):
+    """
+    在目录中生成不覆盖已有文件的路径：base_name.srt、base_name_1.srt ...
+    """
+    counter = 1
+    save_path = os.path.join(directory, f"{base_name}{ext}")
+    while os.path.exists(save_path):
+        save_path = os.path.join(directory, f"{base_name}_{counter}{ext}")
+        counter += 1
+    return save_path
+
+class SrtWriter:
+    """
+    边识别边写入 SRT 文件，每条字幕写入后立即 flush，进程被杀也不会丢失已经写出的字幕
+    文件名包含第一条字幕的时间，所以第一条字幕生成时才创建文件；指定 save_path 时直接写入该文件
+    name_suffix 附加在生成的文件名之后，用于区分同一视频的多条字幕轨道
+    """
+    def __init__(self, video_path, save_path=None, name_suffix=''):
+        self.video_path = video_path
+        self.target_path = save_path
+        self.name_suffix = name_suffix
+        self.save_path = None
+        self.file = None
+        self.cue_count = 0
+        self.first_start_str = None
+
+    def _open(self, start_time):
+        self.first_start_str = format_srt_time(start_time)
+        if self.target_path:
+            target_dir = os.path.dirname(self.target_path)
+            if target_dir:
+                os.makedirs(target_dir, exist_ok=True)
+            self.save_path = self.target_path
+            self.file = open(self.save_path, 'wb')
+            return
+        # 从第一条字幕的时间生成文件名，如 00:00:01,040 -> 01040
+        time_str = self.first_start_str.split(':')[2].replace(',', '')
+        file_name = os.path.splitext(os.path.basename(self.video_path))[0]
+        base_name = f"{file_name}_{time_str}{self.name_suffix}"
+        try:
+            # 在视频所在目录创建output文件夹
+            output_dir = get_output_dir(self.video_path)
+            os.makedirs(output_dir, exist_ok=True)
+            self.save_path = get_unique_path(output_dir, base_name)
+            self.file = open(self.save_path, 'wb')
+        except Exception as e:
+            print(f"\n创建字幕文件时出错: {str(e)}")
+            # 如果失败，改为保存到当前目录
+            self.save_path = get_unique_path(os.getcwd(), base_name)
+            self.file = open(self.save_path, 'wb')
+            print(f"改为保存到当前目录: {self.save_path}")
+
+    def resume(self, save_path, offset, cue_count, first_start_str):
+        """
+        从断点继续写入：截掉断点之后写入的内容，避免重复
+        """
+        self.file = open(save_path, 'r+b')
+        self.file.truncate(offset)
+        self.file.seek(offset)
+        self.save_path = save_path
+        self.cue_count = cue_count
+        self.first_start_str = first_start_str
+
+    def write(self, subtitle_entry, start_time):
+        if self.file is None:
+            self._open(start_time)
+        # 条目之间空一行，与 '\n'.join(subtitles) 的格式相同
+        data = subtitle_entry if self.cue_count == 0 else '\n' + subtitle_entry
+        self.file.write(data.encode('utf-8'))
+        self.file.flush()
+        self.cue_count += 1
+
+    def tell(self):
+        return self.file.tell() if self.file is not None else 0
+
+    def sync(self):
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+CHECKPOINT_INTERVAL = 30  # 每隔多少秒写一次断点文件
+
+def get_checkpoint_path(video_path):
+    """
+    断点文件路径：output/视频名.checkpoint.json
+    """
+    file_name = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(get_output_dir(video_path), f"{file_name}.checkpoint.json")
+
+def get_observation_log_path(video_path):
+    """
+    观测记录路径：output/视频名.observations.npz
+    """
+    file_name = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(get_output_dir(video_path), f"{file_name}.observations.npz")
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    """
+    写入断点文件，先写临时文件再替换，避免写到一半被中断
+    """
+    os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, checkpoint_path)
+
+def load_checkpoint(checkpoint_path, settings):
+    """
+    读取断点文件，处理参数与当前不一致或字幕文件已丢失时返回 None
+    """
+    if not os.path.exists(checkpoint_path):
+        return None
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('settings') != settings:
+            print("断点文件的处理参数与本次不同，重新开始处理")
+            return None
+        if checkpoint.get('save_path') and not os.path.exists(checkpoint['save_path']):
+            print("断点对应的字幕文件不存在，重新开始处理")
+            return None
+        return checkpoint
+    except Exception as e:
+        print(f"读取断点文件失败，重新开始处理: {str(e)}")
+        return None
+
+def remove_checkpoint(checkpoint_path):
+    try:
+        os.remove(checkpoint_path)
+    except OSError:
+        pass
+
+def create_ocr(lang=None):
+    """
+    按配置创建 OCR 引擎（ocr_engine 为 paddle 或 onnx），模型不存在或初始化失败时返回 None
+    模型路径、线程数、MKLDNN 等参数来自配置（config.txt、环境变量或命令行），lang 不指定时使用配置中的语言
+    """
+    return create_engine(get_config(), lang, rec_batch_num=REC_BATCH_NUM)
+
+def warm_up_ocr(ocr):
+    """
+    预热：第一次推理会触发 MKLDNN 的初始化，提前做一次，不让第一个视频承担这部分耗时
+    """
+    try:
+        ocr.ocr(np.zeros((48, 320, 3), dtype=np.uint8))
+    except Exception as e:
+        print(f"OCR 预热失败: {str(e)}")
+
+def crop_subtitle_region(frame, bottom_ratio, top_ratio, left_ratio=0.0, right_ratio=1.0):
     """
-    bottom_ratio, top_ratio = subtitle_area
+    按比例截取字幕区域
+    """
+    height, width = frame.shape[:2]
+    
+    # 只截取底部的一条区域，比例可以根据实际视频调整
+    bottom_margin = int(height * bottom_ratio)  # 从底部 80% 处开始
+    top_margin = int(height * top_ratio)     # 到底部 90% 结束
     
-    # Validate subtitle area ratios
-    if not (0 <= bottom_ratio <= 1 and 0 <= top_ratio <= 1):
+    # 只取字幕所在的宽度，避免边缘干扰，也减少文字检测的输入大小
+    left_margin = int(width * left_ratio)
+    right_margin = int(width * right_ratio)
+    return frame[bottom_margin:top_margin, left_margin:right_margin]
+
+def crop_area(frame, subtitle_area):
+    """
+    按 normalize_subtitle_area 得到的 (x1, y1, x2, y2) 比例截取字幕区域
+    """
+    x1, y1, x2, y2 = subtitle_area
+    return crop_subtitle_region(frame, y1, y2, x1, x2)
+
+OCR_TEXT_HEIGHT = 40  # 送入 OCR 前把文字行缩小到的高度(像素)，只缩小不放大；文字检测的耗时与像素数成正比
+OCR_PAD_MULTIPLE = 32  # 把字幕区域的宽高补齐到该值的倍数，尺寸稳定时推理后端不必为每种尺寸重新规划
+OCR_BINARIZE_THRESHOLD = 180  # binarize 预处理的二值化阈值，只保留亮色文字
+TEXT_ROW_MIN_EDGES = 4  # 一行中的边缘像素至少有这么多才可能是文字行
+TEXT_ROW_RATIO = 0.1  # 边缘像素数不低于最多的一行的该比例才算文字行
+TEXT_LINE_MIN_HEIGHT = 8  # 连续的文字行矮于该高度时视为噪声（横线、压缩块），不是一行文字
+TEXT_LINE_MAX_GAP = 3  # 文字行之间只隔这么几行时仍算同一行（字母上部的边缘较少，会在阈值附近断开）
+
+def estimate_text_height(roi):
+    """
+    由边缘的逐行统计估计字幕区域中文字行的高度(像素)：边缘像素多的连续若干行为一行文字，多行字幕取最矮的一行
+    接触区域上下边界的文字行不计：可能被截断，也可能是与边缘密集的背景连成了一片；估计不出时返回 None
+    """
+    rows = np.count_nonzero(text_edges(roi), axis=1)
+    if rows.max() < TEXT_ROW_MIN_EDGES:
+        return None
+    text_rows = np.concatenate(([False], rows >= max(TEXT_ROW_MIN_EDGES, rows.max() * TEXT_ROW_RATIO), [False]))
+    bounds = np.flatnonzero(text_rows[1:] != text_rows[:-1])
+    lines = []
+    for start, end in zip(bounds[::2], bounds[1::2]):
+        if lines and start - lines[-1][1] <= TEXT_LINE_MAX_GAP:
+            lines[-1][1] = end
+        else:
+            lines.append([start, end])
+    heights = [end - start for start, end in lines
+               if start > 0 and end < len(rows) and end - start >= TEXT_LINE_MIN_HEIGHT]
+    return int(min(heights)) if heights else None
+
+class RoiPreprocessor:
+    """
+    截取字幕区域之后、OCR 之前的预处理：按估计的文字高度缩小（只缩小不放大），
+    可选转灰度或二值化，最后补齐到固定倍数的尺寸
+    4K 视频的字幕缩小后依然清晰，检测和识别的耗时却大幅下降；区域再高，文字也不会被缩到 text_height 以下
+    target_height 为整个区域的高度上限，指定时不论文字大小都缩小到该高度（ffmpeg 取帧时在解码阶段完成），
+    多行字幕或较高的区域中文字可能因此变得过小，默认不使用
+    识别结果中的文本框坐标对应预处理之后的图像
+    """
+    def __init__(self, text_height=OCR_TEXT_HEIGHT, target_height=None, grayscale=False, binarize=False,
+                 pad_multiple=OCR_PAD_MULTIPLE):
+        self.text_height = text_height
+        self.target_height = target_height
+        self.grayscale = grayscale
+        self.binarize = binarize
+        self.pad_multiple = pad_multiple
+
+    def settings(self):
+        """
+        预处理参数，记录在断点中，参数不同时不能从断点继续
+        """
+        return {
+            'text_height': self.text_height,
+            'target_height': self.target_height,
+            'grayscale': self.grayscale,
+            'binarize': self.binarize,
+            'pad_multiple': self.pad_multiple,
+        }
+
+    def output_size(self, width, height):
+        """
+        宽高为 (width, height) 的字幕区域预处理之后最大的 (宽, 高)，用于预先分配共享内存槽位
+        按文字高度缩小的比例要看内容，这里只计入 target_height
+        """
+        if self.target_height and height > self.target_height:
+            width, height = max(1, int(round(width * self.target_height / height))), self.target_height
+        if self.pad_multiple and self.pad_multiple > 1:
+            width += -width % self.pad_multiple
+            height += -height % self.pad_multiple
+        return width, height
+
+    def scale_for(self, roi):
+        """
+        roi 的缩放比例，不大于1：文字行高于 text_height 时缩小到 text_height，区域高于 target_height 时缩小到该高度
+        """
+        height = roi.shape[0]
+        scale = 1.0
+        if self.text_height:
+            text_height = estimate_text_height(roi)
+            if text_height is not None and text_height > self.text_height:
+                scale = self.text_height / text_height
+        if self.target_height and height * scale > self.target_height:
+            scale = self.target_height / height
+        return scale
+
+    def __call__(self, roi, allocate=None):
+        """
+        返回预处理之后的新数组（截取的区域是原始帧的视图，不能直接交给识别线程）
+        allocate 为 allocate(形状) -> 数组 时，结果直接写入它返回的数组（例如共享内存槽位），不再另外分配；
+        allocate 返回 None 时放弃处理，也返回 None
+        """
+        height, width = roi.shape[:2]
+        scale = self.scale_for(roi)
+        if scale < 1.0:
+            width, height = max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+        out_height, out_width = height, width
+        if self.pad_multiple and self.pad_multiple > 1:
+            out_height += -height % self.pad_multiple
+            out_width += -width % self.pad_multiple
+        # 转灰度或二值化之后仍是三通道，PaddleOCR 需要三通道图像
+        channels = (3,) if self.grayscale or self.binarize else roi.shape[2:]
+        shape = (out_height, out_width) + channels
+        out = allocate(shape) if allocate is not None else np.empty(shape, dtype=roi.dtype)
+        if out is None:
+            return None
+        
+        # 各步骤都直接写入 out 左上角的视图，补齐的部分最后填0
+        image = out[:height, :width]
+        if scale < 1.0:
+            cv2.resize(roi, (width, height), dst=image, interpolation=cv2.INTER_AREA)
+        else:
+            image[...] = roi
+        
+        if self.grayscale or self.binarize:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            if self.binarize:
+                cv2.threshold(gray, OCR_BINARIZE_THRESHOLD, 255, cv2.THRESH_BINARY, dst=gray)
+            cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR, dst=image)
+        
+        out[height:] = 0
+        out[:height, width:] = 0
+        return out
+
+def create_preprocessor(config=None):
+    """
+    按配置（roi_text_height、roi_target_height、roi_grayscale、roi_binarize）创建预处理
+    """
+    config = config or get_config()
+    text_height = OCR_TEXT_HEIGHT if config['roi_text_height'] is None else config['roi_text_height']
+    return RoiPreprocessor(text_height=text_height, target_height=config['roi_target_height'],
+                           grayscale=config['roi_grayscale'], binarize=config['roi_binarize'])
+
+AUTO_SUBTITLE_AREA = 'auto'  # subtitle_area 取该值时自动检测字幕区域
+
+def normalize_subtitle_area(subtitle_area):
+    """
+    把字幕区域统一为 (x1, y1, x2, y2) 比例，兼容只给纵向范围的 (bottom_ratio, top_ratio)
+    参数不合法时打印原因并返回 None
+    """
+    try:
+        area = tuple(float(value) for value in subtitle_area)
+    except (TypeError, ValueError):
+        area = ()
+    if len(area) == 2:
+        area = (0.0, area[0], 1.0, area[1])
+    elif len(area) != 4:
+        print("错误：字幕区域必须是 (bottom_ratio, top_ratio) 或 (x1, y1, x2, y2)")
+        return None
+    x1, y1, x2, y2 = area
+    if not all(0 <= value <= 1 for value in area):
         print("错误：字幕区域比例必须在0-1之间")
-        return
-    if bottom_ratio >= top_ratio:
+        return None
+    if y1 >= y2:
         print("错误：底部比例必须小于顶部比例")
-        return
+        return None
+    if x1 >= x2:
+        print("错误：左边比例必须小于右边比例")
+        return None
+    return area
+
+AUTO_AREA_SAMPLES = 40  # 自动检测字幕区域时抽取的帧数
+AUTO_AREA_DET_WIDTH = 960  # 检测前把帧缩小到的最大宽度
+AUTO_AREA_BINS = 100  # 纵向统计文本框的分箱数
+AUTO_AREA_MIN_FRAMES = 3  # 至少在这么多帧中出现文本才认为找到了字幕
+AUTO_AREA_BAND_RATIO = 0.3  # 出现次数不低于峰值的该比例的相邻行都算作字幕带
+AUTO_AREA_CENTER_TOLERANCE = 0.2  # 字幕一般水平居中，文本框中心偏离画面中心超过该比例的忽略（台标、水印）
+AUTO_AREA_PADDING = 0.3  # 字幕带上下各留出带高的该比例
+AUTO_AREA_X_PADDING = 0.1  # 左右各留出画面宽度的该比例，容纳没有被抽到的更长字幕
+
+def detect_subtitle_area(video_path, ocr, samples=AUTO_AREA_SAMPLES):
+    """
+    自动检测字幕区域：均匀抽取若干帧只做文字检测，统计水平居中的文本框在纵向上的分布，
+    取出现最频繁的一条文字带作为字幕区域
+    :return: 字幕区域 (x1, y1, x2, y2) 比例，没有找到字幕时返回 None
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"错误：无法打开视频文件: {video_path}")
+        return None
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total_frames <= 0:
+            print("错误：无法读取视频帧数，不能自动检测字幕区域")
+            return None
+        
+        # 避开片头片尾
+        positions = np.linspace(total_frames * 0.05, total_frames * 0.95, samples).astype(int)
+        occupancy = np.zeros(AUTO_AREA_BINS, dtype=np.int32)
+        text_boxes = []
+        for position in positions:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(position))
+            ret, frame = cap.read()
+            if not ret:
+                continue
+            scale = min(1.0, AUTO_AREA_DET_WIDTH / frame.shape[1])
+            if scale < 1.0:
+                frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            height, width = frame.shape[:2]
+            
+            boxes = ocr.detect(frame)
+            covered = np.zeros(AUTO_AREA_BINS, dtype=bool)
+            for box in boxes:
+                points = np.array(box, dtype=np.float32)
+                x1, y1 = points.min(axis=0) / (width, height)
+                x2, y2 = points.max(axis=0) / (width, height)
+                # 只统计横排、水平居中的文本
+                if (x2 - x1) * width <= (y2 - y1) * height:
+                    continue
+                if abs((x1 + x2) / 2 - 0.5) > AUTO_AREA_CENTER_TOLERANCE:
+                    continue
+                text_boxes.append((x1, y1, x2, y2))
+                first_bin = int(y1 * AUTO_AREA_BINS)
+                covered[first_bin:max(first_bin + 1, int(np.ceil(y2 * AUTO_AREA_BINS)))] = True
+            # 每帧每行只计一次
+            occupancy += covered
+    finally:
+        cap.release()
+    
+    if occupancy.max() < AUTO_AREA_MIN_FRAMES:
+        return None
+    
+    # 多行字幕的行间距不应把字幕带截断，先在纵向上做一次最大值滤波
+    padded = np.pad(occupancy, 1)
+    smoothed = np.maximum(np.maximum(padded[:-2], padded[1:-1]), padded[2:])
+    # 出现次数相同时取最靠下的一行
+    peak = AUTO_AREA_BINS - 1 - int(np.argmax(smoothed[::-1]))
+    limit = smoothed[peak] * AUTO_AREA_BAND_RATIO
+    low, high = peak, peak
+    while low > 0 and smoothed[low - 1] >= limit:
+        low -= 1
+    while high < AUTO_AREA_BINS - 1 and smoothed[high + 1] >= limit:
+        high += 1
+    band_top = low / AUTO_AREA_BINS
+    band_bottom = (high + 1) / AUTO_AREA_BINS
     
+    band_boxes = [box for box in text_boxes if band_top <= (box[1] + box[3]) / 2 <= band_bottom]
+    if not band_boxes:
+        return None
+    # 字幕水平居中，左右对称地留出余量
+    half_width = float(max(max(0.5 - box[0], box[2] - 0.5) for box in band_boxes)) + AUTO_AREA_X_PADDING
+    padding = (band_bottom - band_top) * AUTO_AREA_PADDING
+    return (round(max(0.0, 0.5 - half_width), 4), round(max(0.0, band_top - padding), 4),
+            round(min(1.0, 0.5 + half_width), 4), round(min(1.0, band_bottom + padding), 4))
+
+PIPELINE_QUEUE_SIZE = 4  # 解码线程最多领先识别线程的批次数
+PENDING_FLUSH_SIZE = 256  # 长时间没有需要识别的帧时，攒够这么多采样帧也提交一次
+_PIPELINE_END = None  # 队列结束标记
+
+def _queue_put(q, item, stop_event):
+    """
+    向有界队列放入数据，下游已经停止时放弃，避免线程卡死
+    """
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _write_roi(ring, region, preprocess, stop_event):
+    """
+    把需要识别的字幕区域直接写入共享内存槽位（有预处理时预处理的结果直接写入槽位），中间不再拷贝
+    返回 (句柄, 等待空闲槽位的耗时)，已经停止时句柄为 None
+    """
+    handles = []
+    waited = 0.0
+    
+    def allocate(shape):
+        nonlocal waited
+        wait_start = time.perf_counter()
+        handle = ring.acquire(shape, region.dtype, stop_event)
+        waited = time.perf_counter() - wait_start
+        if handle is None:
+            return None
+        handles.append(handle)
+        return ring.view(handle)
+    
+    if preprocess is not None:
+        preprocess(region, allocate)
+    else:
+        out = allocate(region.shape)
+        if out is not None:
+            out[...] = region
+    return (handles[0] if handles else None), waited
+
+def _decode_stage(sampler, fps, subtitle_area, change_threshold, batch_size,
+                  work_queue, stop_event, stats, pbar, ocr_workers, cancel_event=None, text_presence=True,
+                  preprocess=None, metrics=None, ring=None):
+    """
+    解码线程：采样、截取字幕区域、做变化检测，按批次放入识别队列
+    每个批次为 (序号, pending, rois)，pending 按顺序记录 (采样时间, 对应结果在 rois 中的位置)，
+    位置为 -1 表示沿用上一批最后一次识别的文本
+    text_presence 为 True 时，判断为没有字幕的区域在 rois 中记为 None，识别线程直接给出空结果
+    preprocess 为 RoiPreprocessor 时，需要识别的区域先经过预处理再放入批次
+    ring 为 RoiRing 时（识别进程模式），需要识别的区域直接写入共享内存槽位，rois 中是槽位句柄；
+    槽位用完时等待识别线程归还，因此解码最多领先到环形缓冲区用完为止
+    metrics 记录取帧(decode)、截取和变化检测(crop)、预处理(preprocess)、等待识别线程(queue_wait)、
+    等待空闲槽位(ring_wait)的耗时
+    """
+    last_signature = None
+    pending = []
+    rois = []
+    seq = 0
     try:
-        # 使用绝对路径
-        det_model_dir = "C:/subtitle/models/det"  # 改为你的实际路径
-        rec_model_dir = "C:/subtitle/models/rec"
-        cls_model_dir = "C:/subtitle/models/cls"
-        
-        print(f"检测模型路径: {det_model_dir}")
-        print(f"识别模型路径: {rec_model_dir}")
-        print(f"分类模型路径: {cls_model_dir}")
-        
-        # Check if model directories exist
-        model_paths = [det_model_dir, rec_model_dir, cls_model_dir]
-        for path in model_paths:
-            if not os.path.exists(path):
-                print(f"错误：模型路径不存在: {path}")
-                return
-                
-        # 初始化 OCR
-        ocr = PaddleOCR(
-            use_angle_cls=True,
-            lang=lang,
-            det_model_dir=det_model_dir,
-            rec_model_dir=rec_model_dir,
-            cls_model_dir=cls_model_dir,
-            show_log=True,  # 显示日志以便调试
-            download_font=False,
-            max_batch_size=7  # 添加这个参数
-        )
+        decode_start = time.perf_counter()
+        for frame_count, frame in sampler:
+            crop_start = time.perf_counter()
+            metrics.observe('decode', crop_start - decode_start)
+            if stop_event.is_set() or (cancel_event is not None and cancel_event.is_set()):
+                break
+            pbar.update(frame_count - pbar.n)
+            
+            subtitle_region = frame if sampler.cropped else crop_area(frame, subtitle_area)
+            stats['sampled_frames'] += 1
+            signature = roi_signature(subtitle_region)
+            
+            if change_threshold is not None and not roi_changed(last_signature, signature, change_threshold):
+                stats['skipped_unchanged'] += 1
+                metrics.observe('crop', time.perf_counter() - crop_start)
+            else:
+                last_signature = signature
+                if text_presence and not roi_has_text(signature):
+                    stats['no_text'] += 1
+                    rois.append(None)
+                    metrics.observe('crop', time.perf_counter() - crop_start)
+                elif ring is not None:
+                    preprocess_start = time.perf_counter()
+                    metrics.observe('crop', preprocess_start - crop_start)
+                    handle, waited = _write_roi(ring, subtitle_region, preprocess, stop_event)
+                    metrics.observe('ring_wait', waited)
+                    if handle is None:  # 等待槽位时流水线已经停止
+                        break
+                    rois.append(handle)
+                    if preprocess is not None:
+                        metrics.observe('preprocess', time.perf_counter() - preprocess_start - waited)
+                elif preprocess is not None:
+                    preprocess_start = time.perf_counter()
+                    metrics.observe('crop', preprocess_start - crop_start)
+                    rois.append(preprocess(subtitle_region))
+                    metrics.observe('preprocess', time.perf_counter() - preprocess_start)
+                else:
+                    metrics.observe('crop', time.perf_counter() - crop_start)
+                    # 截取的区域是原始帧的视图，拷贝一份交给识别线程
+                    rois.append(subtitle_region.copy())
+            pending.append((frame_count/fps, len(rois) - 1))
+            
+            if len(rois) >= max(1, batch_size) or len(pending) >= PENDING_FLUSH_SIZE:
+                with metrics.time('queue_wait'):
+                    put_ok = _queue_put(work_queue, (seq, pending, rois), stop_event)
+                if not put_ok:
+                    break
+                seq += 1
+                pending, rois = [], []
+            decode_start = time.perf_counter()
+        
+        if pending:
+            _queue_put(work_queue, (seq, pending, rois), stop_event)
     except Exception as e:
-        print(f"始化 OCR 失败: {str(e)}")
+        print(f"\n解码视频时出错: {str(e)}")
+        metrics.count('decode_errors')
+    finally:
+        # 识别线程总会把队列取空，结束标记可以阻塞放入
+        for _ in range(ocr_workers):
+            work_queue.put(_PIPELINE_END)
+
+def _lookup_cache(rois, ocr_cache, namespace, metrics):
+    """
+    查 OCR 缓存，返回 (缓存键列表, 文本项列表, 命中数)；未命中的位置文本项为 None，没有字幕的位置为空结果
+    """
+    if ocr_cache is not None:
+        with metrics.time('cache_lookup'):
+            keys = [roi_cache_key(roi, namespace) if roi is not None else None for roi in rois]
+            item_lists = [ocr_cache.get(key) if key is not None else [] for key in keys]
+    else:
+        keys = [None] * len(rois)
+        item_lists = [None if roi is not None else [] for roi in rois]
+    cache_hits = sum(1 for key, items in zip(keys, item_lists) if key is not None and items is not None)
+    return keys, item_lists, cache_hits
+
+def _store_results(item_lists, keys, missing, results, ocr_cache, metrics):
+    """
+    把未命中位置的识别结果填回 item_lists 并写入缓存，识别失败的位置保持 None
+    """
+    new_entries = []
+    for i, items in zip(missing, results):
+        if items is None:  # 识别失败，不写入缓存
+            metrics.count('ocr_failed_regions')
+            continue
+        item_lists[i] = items
+        new_entries.append((keys[i], items))
+    if ocr_cache is not None:
+        ocr_cache.put_many(new_entries)
+
+def _ocr_stage(ocr, work_queue, result_queue, stop_event, ocr_cache, lang, metrics, preprocess=None):
+    """
+    识别线程：先查 OCR 缓存，未命中的字幕区域批量识别，把识别文本连同批次信息放入结果队列
+    rois 中为 None 的位置（没有字幕）直接得到空结果
+    缓存键中的语言带上引擎的 cache_suffix，并包含预处理参数，不同后端、模型和预处理的识别结果分开缓存
+    """
+    namespace = cache_namespace(lang + ocr.cache_suffix, preprocess.settings() if preprocess is not None else None)
+    while True:
+        item = work_queue.get()
+        if item is _PIPELINE_END:
+            result_queue.put(_PIPELINE_END)
+            return
+        if stop_event.is_set():  # 已经停止，只把队列取空
+            continue
+        seq, pending, rois = item
+        keys, item_lists, cache_hits = _lookup_cache(rois, ocr_cache, namespace, metrics)
+        missing = [i for i, items in enumerate(item_lists) if items is None]
+        if missing:
+            results = recognize_rois(ocr, [rois[i] for i in missing], metrics)
+            _store_results(item_lists, keys, missing, results, ocr_cache, metrics)
+        
+        result_queue.put((seq, pending, item_lists, len(missing), cache_hits))
+
+OCR_PROCESS_IN_FLIGHT = 2  # 每个识别进程同时提交的批次数：一批在识别，下一批已经在任务队列中等待
+
+def _ocr_process_stage(client, work_queue, result_queue, stop_event, ocr_cache, lang, metrics, preprocess=None):
+    """
+    识别进程对应的识别线程：批次中的字幕区域已经由解码线程写入共享内存，rois 中是槽位句柄
+    查过缓存后只把未命中的句柄提交给识别进程，不等结果就继续取下一批，识别进程处理完一批马上开始下一批；
+    命中缓存的槽位立即归还，识别结果由收集线程按提交顺序取回、写入缓存、归还槽位后放入结果队列
+    同时提交的批次不超过 OCR_PROCESS_IN_FLIGHT
+    """
+    ring = client.ring
+    namespace = cache_namespace(lang + client.cache_suffix,
+                                preprocess.settings() if preprocess is not None else None)
+    # 收集线程正在等待的一批也算在提交数之内
+    submitted = queue.Queue(maxsize=max(1, OCR_PROCESS_IN_FLIGHT - 1))
+    collector = threading.Thread(target=_collect_process_results,
+                                 args=(client, submitted, result_queue, ocr_cache, metrics), daemon=True)
+    collector.start()
+    try:
+        while True:
+            item = work_queue.get()
+            if item is _PIPELINE_END:
+                return
+            seq, pending, handles = item
+            if stop_event.is_set():  # 已经停止，只把队列取空并归还槽位
+                ring.release(handles)
+                continue
+            rois = [ring.view(handle) if handle is not None else None for handle in handles]
+            keys, item_lists, cache_hits = _lookup_cache(rois, ocr_cache, namespace, metrics)
+            del rois
+            missing = [i for i, items in enumerate(item_lists) if items is None]
+            ring.release([handles[i] for i, items in enumerate(item_lists) if items is not None])
+            missing_handles = [handles[i] for i in missing]
+            # 先登记再提交：登记队列满时在这里等待，提交给识别进程的批次数不会超过上限
+            with metrics.time('ocr_submit_wait'):
+                submitted.put((seq, pending, keys, item_lists, missing, missing_handles, cache_hits))
+            if missing_handles:
+                client.submit(missing_handles)
+    finally:
+        submitted.put(None)
+        collector.join()
+        result_queue.put(_PIPELINE_END)
+
+def _collect_process_results(client, submitted, result_queue, ocr_cache, metrics):
+    """
+    识别进程的收集线程：按提交顺序取回识别结果，归还槽位、写入缓存后把批次放入结果队列
+    """
+    while True:
+        entry = submitted.get()
+        if entry is None:
+            return
+        seq, pending, keys, item_lists, missing, handles, cache_hits = entry
+        if missing:
+            results = client.receive(len(missing))
+            client.ring.release(handles)
+            _store_results(item_lists, keys, missing, results, ocr_cache, metrics)
+        result_queue.put((seq, pending, item_lists, len(missing), cache_hits))
+
+def recognize_rois(ocr, rois, metrics):
+    """
+    识别多个字幕区域，返回与 rois 一一对应的文本项列表，识别失败的区域为 None
+    ocr 为 SharedOcr 时等其他轨道识别完再调用（识别进程由 _ocr_process_stage 异步提交，不经过这里）
+    """
+    if isinstance(ocr, SharedOcr):
+        return ocr.recognize_rois(rois, metrics)
+    return ocr_batch(ocr, rois, metrics)
+
+class SharedOcr:
+    """
+    多条字幕轨道共用的 OCR 实例：各轨道的识别线程轮流调用，同一时间只有一个线程在推理
+    CPU 推理本身已经用满所有推理线程，轮流调用几乎不损失速度，却省下了每条轨道单独加载模型的内存
+    """
+    def __init__(self, ocr):
+        self.ocr = ocr
+        self.cache_suffix = ocr.cache_suffix
+        self.lock = threading.Lock()
+
+    def recognize_rois(self, rois, metrics):
+        with self.lock:
+            return ocr_batch(self.ocr, rois, metrics)
+
+OCR_PROCESS_START_TIMEOUT = 600  # 等待识别进程加载模型的最长时间(秒)
+OCR_PROCESS_POLL_INTERVAL = 1  # 等待识别进程时检查其是否存活的间隔(秒)
+
+def _ocr_process_main(lang, config, budget, worker_counter, ring_info, task_queue, result_queue):
+    """
+    识别进程：加载 OCR 模型后循环处理任务
+    任务为共享内存句柄列表，直接在共享内存上识别，只把文本项放回结果队列；收到 None 时退出并送回各阶段耗时
+    """
+    init_ocr_worker(lang, None, config, budget, worker_counter)
+    if _worker_ocr is None:
+        result_queue.put(('error', "OCR 初始化失败"))
         return
+    ring = RoiRing.attach(*ring_info)
+    metrics = StageMetrics()
+    result_queue.put(('ready', None))
+    try:
+        while True:
+            handles = task_queue.get()
+            if handles is None:
+                break
+            rois = [ring.view(handle) for handle in handles]
+            results = ocr_batch(_worker_ocr, rois, metrics)
+            del rois  # 共享内存的视图要在关闭之前释放
+            result_queue.put(('result', results))
+    finally:
+        result_queue.put(('metrics', metrics.to_dict()))
+        ring.close()
+
+class OcrProcessClient:
+    """
+    独立识别进程的代理：解码线程把字幕区域直接写入共享内存环形缓冲区，submit 只传递槽位句柄，
+    不等待结果；receive 按提交顺序取回结果，调用方随后归还槽位
+    Paddle 推理占满 CPU 时，一个解码线程可以同时供给多个识别进程，且不受 GIL 限制
+    """
+    def __init__(self, ring, lang, config, budget, worker_counter):
+        self.ring = ring
+        self.cache_suffix = engine_cache_suffix(config, lang)
+        self.task_queue = multiprocessing.Queue()
+        self.result_queue = multiprocessing.Queue()
+        self.metrics_data = None
+        self.failed = False
+        self.process = multiprocessing.Process(
+            target=_ocr_process_main,
+            args=(lang, config, budget, worker_counter, ring.info(), self.task_queue, self.result_queue),
+            daemon=True)
+        self.process.start()
+
+    def _get(self, timeout=None):
+        waited = 0
+        while True:
+            try:
+                return self.result_queue.get(timeout=OCR_PROCESS_POLL_INTERVAL)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    raise RuntimeError("识别进程意外退出")
+                waited += OCR_PROCESS_POLL_INTERVAL
+                if timeout is not None and waited >= timeout:
+                    raise RuntimeError("等待识别进程超时")
+
+    def wait_ready(self):
+        """
+        等待识别进程加载好模型，加载失败时抛出 RuntimeError
+        """
+        kind, payload = self._get(OCR_PROCESS_START_TIMEOUT)
+        if kind != 'ready':
+            raise RuntimeError(payload)
+
+    def submit(self, handles):
+        """
+        把一批共享内存句柄交给识别进程，不等待结果
+        """
+        self.task_queue.put(handles)
+
+    def receive(self, count):
+        """
+        取回最早提交、还没有取回的一批的识别结果；识别进程出错后每批都返回 count 个 None
+        """
+        if self.failed:
+            return [None] * count
+        try:
+            kind, item_lists = self._get()
+            return item_lists
+        except RuntimeError as e:
+            print(f"\n识别进程出错: {str(e)}")
+            self.failed = True
+            return [None] * count
+
+    def close(self):
+        """
+        通知识别进程退出，并取回它记录的各阶段耗时
+        """
+        if self.process.is_alive():
+            self.task_queue.put(None)
+            try:
+                kind, payload = self._get(OCR_PROCESS_POLL_INTERVAL * 10)
+                if kind == 'metrics':
+                    self.metrics_data = payload
+            except RuntimeError:
+                pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+def start_ocr_processes(processes, lang, slot_bytes, batch_size):
+    """
+    启动 processes 个识别进程，返回 (OcrProcessClient 列表, RoiRing)
+    CPU 核在识别进程之间平分
+    每批最多占用 batch_size 个槽位：每个识别进程有 OCR_PROCESS_IN_FLIGHT 批在识别、一批在识别线程中，
+    另有识别队列中的 PIPELINE_QUEUE_SIZE 批和解码线程正在攒的一批，槽位按这些批次的总数分配，
+    识别跟得上时解码线程不必等待空闲槽位
+    """
+    config = get_config()
+    budget = plan_thread_budget(processes, config['cpu_threads'], config['pin_cpus'])
+    batches = processes * (OCR_PROCESS_IN_FLIGHT + 1) + PIPELINE_QUEUE_SIZE + 1
+    ring = RoiRing(batches * max(1, batch_size), slot_bytes)
+    worker_counter = multiprocessing.Value('i', 0)
+    clients = [OcrProcessClient(ring, lang, config, budget, worker_counter) for _ in range(processes)]
+    try:
+        for client in clients:
+            client.wait_ready()
+    except RuntimeError:
+        for client in clients:
+            client.close()
+        ring.close()
+        raise
+    return clients, ring
+
+def new_pipeline_stats():
+    """
+    流水线的统计计数
+    """
+    return {'sampled_frames': 0, 'ocr_calls': 0, 'skipped_unchanged': 0, 'cache_hits': 0, 'no_text': 0}
+
+def run_ocr_pipeline(sampler, fps, ocr_instances, subtitle_area, change_threshold, batch_size,
+                     on_items, stats, pbar, cancel_event=None, ocr_cache=None, lang='ch',
+                     text_presence=True, preprocess=None, metrics=None):
+    """
+    运行 解码线程 -> 识别线程 -> 当前线程 的流水线
+    每个采样帧按时间顺序调用一次 on_items(采样时间, [(文本, 置信度, 文本框), ...])，识别失败的帧不会回调
+    cancel_event 被设置后解码线程停止取帧，已经提交的批次仍会处理完
+    ocr_cache 为 OcrCache 实例时，内容相同的字幕区域直接使用缓存的识别结果
+    text_presence 为 True 时先用 roi_has_text 排除没有字幕的区域，不对它们运行 OCR
+    preprocess 为送入 OCR 之前的预处理（RoiPreprocessor），None 表示不做预处理
+    metrics 为 StageMetrics 时记录各阶段的耗时（on_items 的耗时记为 segment）
+    ocr_instances 为 OcrProcessClient 时，解码线程把字幕区域直接写入它们共用的环形缓冲区，识别线程异步提交
+    """
+    if metrics is None:
+        metrics = StageMetrics()
+    ring = ocr_instances[0].ring if isinstance(ocr_instances[0], OcrProcessClient) else None
+    work_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    result_queue = queue.Queue()
+    stop_event = threading.Event()
+    
+    decoder = threading.Thread(
+        target=_decode_stage,
+        args=(sampler, fps, subtitle_area, change_threshold, batch_size,
+              work_queue, stop_event, stats, pbar, len(ocr_instances), cancel_event, text_presence,
+              preprocess, metrics, ring),
+        daemon=True)
+    workers = [threading.Thread(target=_ocr_process_stage if ring is not None else _ocr_stage,
+                                args=(worker_ocr, work_queue, result_queue, stop_event, ocr_cache, lang, metrics,
+                                      preprocess),
+                                daemon=True)
+               for worker_ocr in ocr_instances]
+    decoder.start()
+    for worker in workers:
+        worker.start()
+    
+    try:
+        # 多个识别线程可能乱序完成，按批次序号重组
+        finished_workers = 0
+        next_seq = 0
+        ready = {}
+        last_items = []
+        while finished_workers < len(workers):
+            item = result_queue.get()
+            if item is _PIPELINE_END:
+                finished_workers += 1
+                continue
+            ready[item[0]] = item
+            while next_seq in ready:
+                _, pending, item_lists, ocr_calls, cache_hits = ready.pop(next_seq)
+                stats['ocr_calls'] += ocr_calls
+                stats['cache_hits'] += cache_hits
+                for current_time, slot in pending:
+                    items = item_lists[slot] if slot >= 0 else last_items
+                    if items is None:  # 识别失败的帧直接跳过
+                        metrics.count('skipped_failed_frames')
+                        continue
+                    with metrics.time('segment'):
+                        on_items(current_time, items)
+                if item_lists:
+                    last_items = item_lists[-1]
+                next_seq += 1
+    finally:
+        stop_event.set()
+        decoder.join()
+        if ring is not None:
+            # 识别线程归还所有槽位、收集线程取回已提交的结果之后，调用方才能关闭识别进程和共享内存
+            for worker in workers:
+                worker.join()
+
+def resolve_frame_source(frame_source, adaptive=False):
+    """
+    确定实际使用的取帧方式：不指定时使用配置中的 frame_source；
+    ffmpeg 不可用或使用自适应采样（需要随机跳转）时改用 OpenCV
+    """
+    frame_source = frame_source or get_config()['frame_source']
+    if frame_source not in FRAME_SOURCES:
+        print(f"警告：未知的取帧方式 {frame_source}，改用 opencv")
+        return 'opencv'
+    if frame_source == 'ffmpeg':
+        if adaptive:
+            print("自适应采样需要随机跳转，改用 OpenCV 取帧")
+            return 'opencv'
+        if find_ffmpeg(get_config()['ffmpeg_path']) is None:
+            print("警告：找不到 ffmpeg，改用 OpenCV 取帧")
+            return 'opencv'
+    return frame_source
+
+def create_sampler(cap, fps, sample_rate, total_frames, subtitle_area, adaptive=False,
+                   start_frame=0, end_frame=None, frame_source='opencv', video_path=None, scale_height=None):
+    """
+    创建取帧器：adaptive 为 True 时使用自适应采样，否则按固定频率采样
+    frame_source 为 'ffmpeg' 时由 ffmpeg 子进程取帧并截取字幕区域（需要 video_path），
+    字幕区域高于 scale_height 时在解码时缩小到该高度
+    """
+    if frame_source == 'ffmpeg':
+        return FfmpegFrameSampler(video_path, fps, get_sample_step(fps, sample_rate),
+                                  int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                                  subtitle_area, total_frames, start_frame=start_frame, end_frame=end_frame,
+                                  scale_height=scale_height, ffmpeg_path=get_config()['ffmpeg_path'])
+    if not adaptive:
+        return FrameSampler(cap, fps, sample_rate, total_frames, start_frame=start_frame, end_frame=end_frame)
+    return AdaptiveSampler(cap, fps, sample_rate, total_frames,
+                           lambda frame: crop_area(frame, subtitle_area),
+                           start_frame=start_frame, end_frame=end_frame)
+
+def get_empty_frames_setting(sample_rate, adaptive=False):
+    """
+    字幕消失判定：连续多少个采样帧没有字幕才结束当前字幕，以及结束时间是否取第一个无字幕帧
+    自适应采样的频率较低，按时间换算阈值，并且字幕消失的帧已经被精确定位，结束时间取该帧
+    """
+    if not adaptive:
+        return EMPTY_FRAMES_THRESHOLD, False
+    return max(1, round(EMPTY_FRAMES_THRESHOLD * sample_rate / DEFAULT_SAMPLE_RATE)), True
+
+def get_shard_ranges(total_frames, shards, step):
+    """
+    把 [0, total_frames) 按时间切成若干段，分段边界对齐到采样间隔，保证采样点与不分段时一致
+    返回 [(start_frame, end_frame), ...]
+    """
+    bounds = [0]
+    for i in range(1, shards):
+        bound = int(round(total_frames * i / shards / step)) * step
+        if bounds[-1] < bound < total_frames:
+            bounds.append(bound)
+    bounds.append(total_frames)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _extract_shard(args):
+    """
+    分段识别的进程池任务：识别视频 (start_frame, end_frame] 范围内的采样帧
+    返回 (采样观测列表 [(采样时间, 文本项列表)], 实际读到的帧数, 统计信息, 各阶段耗时)，出错时返回 None
+    """
+    (video_path, lang, subtitle_area, sample_rate, change_threshold, batch_size, adaptive, text_presence,
+     preprocess, frame_source, shard_index, start_frame, end_frame) = args
+    ocr = _worker_ocr if lang == _worker_lang else create_ocr(lang)
+    if ocr is None:
+        return None
+    ocr_cache = _worker_cache if _worker_cache is not None else OcrCache()
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"错误：无法打开视频文件: {video_path}")
+        return None
+    sampler = None
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        sampler = create_sampler(cap, fps, sample_rate, total_frames, subtitle_area, adaptive,
+                                 start_frame=start_frame, end_frame=end_frame, frame_source=frame_source,
+                                 video_path=video_path, scale_height=preprocess.target_height)
+        observations = []
+        stats = new_pipeline_stats()
+        metrics = StageMetrics()
+        with tqdm(total=end_frame, initial=start_frame, desc=f"分段 {shard_index + 1}", position=shard_index) as pbar:
+            run_ocr_pipeline(sampler, fps, [ocr], subtitle_area, change_threshold, batch_size,
+                             lambda current_time, items: observations.append((current_time, items)),
+                             stats, pbar, ocr_cache=ocr_cache, lang=lang, text_presence=text_presence,
+                             preprocess=preprocess, metrics=metrics)
+        return observations, sampler.frames_read, stats, metrics.to_dict()
+    except Exception as e:
+        print(f"\n处理第 {shard_index + 1} 段时出错: {str(e)}")
+        return None
+    finally:
+        if sampler is not None:
+            sampler.close()
+        cap.release()
+
+def extract_subtitles(video_path, output_file=None, lang='ch', subtitle_area=(0.8, 0.9),
+                      sample_rate=DEFAULT_SAMPLE_RATE, change_threshold=CHANGE_THRESHOLD,
+                      batch_size=OCR_BATCH_SIZE, ocr_workers=1, ocr=None, shards=1,
+                      progress_callback=None, cancel_event=None, resume=True, ocr_cache=None,
+                      cache_path=None, observation_log_path=None, adaptive=False, text_presence=True,
+                      preprocess=None, metrics=None, metrics_path=None, frame_source=None, ocr_processes=0):
+    """
+    从视频中提取字幕并保存到文本文件
+    :param video_path: 视频文件路径
+    :param output_file: 字幕文件路径，不指定时保存到视频所在目录的 output 文件夹，文件名包含第一条字幕的时间
+    :param lang: 识别语言，支持 ch(中文)、en(英文)、japan(日语)
+    :param subtitle_area: 字幕区域 (x1, y1, x2, y2) 或只给纵向范围的 (bottom_ratio, top_ratio)，范围0-1；
+                          取 'auto' 时先抽取若干帧自动检测字幕区域
+    :param sample_rate: 每秒采样的帧数(Hz)，默认10
+    :param change_threshold: 字幕区域变化阈值，未超过时直接复用上一次的识别结果，设为 None 则每帧都识别
+    :param batch_size: 攒够多少个需要识别的字幕区域后批量识别，设为1则逐帧识别
+    :param ocr_workers: 识别线程数，每个线程使用独立的 OCR 实例
+    :param ocr_processes: 识别进程数，大于0时由独立进程识别（不再使用 ocr_workers），
+                          解码线程把字幕区域直接写入共享内存，识别线程异步提交给识别进程
+    :param ocr: 已经初始化好的 OCR 实例，传入时不再重新加载模型
+    :param shards: 把视频按时间分成几段，由多个进程并行识别，默认1即不分段
+    :param progress_callback: 进度回调 progress_callback(已处理帧数, 总帧数, 已生成字幕条数)
+    :param cancel_event: threading.Event，设置后停止处理，保留断点以便之后继续
+    :param resume: 存在断点文件时从断点继续处理（分段模式不支持断点）
+    :param ocr_cache: OcrCache 实例，不传时只在本视频内缓存识别结果
+    :param cache_path: OCR 磁盘缓存(SQLite)路径，分段模式下各个子进程共用
+    :param observation_log_path: 同时把每个采样帧的识别结果保存为观测记录(.npz)，
+                                 之后可以用 segment_observation_log 调整阈值重新生成字幕；指定时不从断点继续
+    :param adaptive: 自适应采样，sample_rate 作为粗扫频率（建议 ADAPTIVE_SAMPLE_RATE），
+                     字幕变化时二分查找精确到帧的切换时间
+    :param text_presence: 先用廉价的启发式判断字幕区域是否有文字，没有时不运行 OCR
+    :param preprocess: 送入 OCR 之前的预处理 RoiPreprocessor，不传时按配置创建（见 create_preprocessor），
+                       默认只把高于 OCR_TEXT_HEIGHT 的文字缩小到该高度并补齐尺寸
+    :param metrics: StageMetrics 实例，记录各阶段耗时、OCR 调用次数和被忽略的错误，调用方可以在处理中途读取
+    :param metrics_path: 处理结束后把各阶段耗时保存为 JSON 文件
+    :param frame_source: 取帧方式 'opencv' 或 'ffmpeg'（ffmpeg 子进程只输出采样帧的字幕区域），
+                         不指定时使用配置中的 frame_source
+    :return: 保存的字幕文件路径，失败、取消或没有字幕时返回 None
+    """
+    auto_area = subtitle_area == AUTO_SUBTITLE_AREA
+    if not auto_area:
+        subtitle_area = normalize_subtitle_area(subtitle_area)
+        if subtitle_area is None:
+            return
+    
+    # 分段模式、多进程识别时由各个子进程加载模型，自动检测字幕区域时当前进程也需要模型
+    if ocr is None and ((shards <= 1 and ocr_processes <= 0) or auto_area):
+        ocr = create_ocr(lang)
+        if ocr is None:
+            return
     
     if not os.path.exists(video_path):
         print(f"错误：视频文件不存在: {video_path}")
         return
     
+    if auto_area:
+        subtitle_area = detect_subtitle_area(video_path, ocr)
+        if subtitle_area is None:
+            print("错误：未能自动检测到字幕区域，请手动指定")
+            return
+        print(f"自动检测到字幕区域: {subtitle_area}")
+    
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print("错误：无法打开视频文件")
@@ -251,189 +1603,507 @@ def extract_subtitles(video_path, output_file='subtitles.srt', lang='ch', subtit
     fps = cap.get(cv2.CAP_PROP_FPS)
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     
-    # 修改字幕持续时的阈
-    MIN_DURATION = 0.5  # 最小持续0.5秒
-    MAX_DURATION = 3.0  # 最大持续3秒
-    EMPTY_FRAMES_THRESHOLD = 6  # 修改为6帧，连续6帧无字幕才认为字幕消失
+    if preprocess is None:
+        preprocess = create_preprocessor()
+    if metrics is None:
+        metrics = StageMetrics()
+    frame_source = resolve_frame_source(frame_source, adaptive)
+    run_start = time.perf_counter()
+    
+    # 字幕边生成边写入文件
+    writer = SrtWriter(video_path, output_file)
+    
+    def write_cue(entry, start_time):
+        with metrics.time('write'):
+            writer.write(entry, start_time)
+    
+    empty_frames_threshold, end_at_first_empty = get_empty_frames_setting(sample_rate, adaptive)
+    segmenter = SubtitleSegmenter(empty_frames_threshold=empty_frames_threshold, on_cue=write_cue,
+                                  end_at_first_empty=end_at_first_empty)
+    stats = new_pipeline_stats()
     
-    subtitles = []
-    last_text = ""
-    frame_count = 0
-    start_time = None
-    empty_frames = 0
-    subtitle_index = 1
+    # 断点续传：处理参数相同时从上次中断的位置继续
+    checkpoint_path = get_checkpoint_path(video_path)
+    settings = {
+        'video_size': os.path.getsize(video_path),
+        'total_frames': total_frames,
+        'lang': lang,
+        'subtitle_area': list(subtitle_area),
+        'sample_rate': sample_rate,
+        'adaptive': adaptive,
+        'preprocess': preprocess.settings(),
+        'frame_source': frame_source,
+        'output_file': output_file,
+    }
+    start_frame = 0
+    # 观测记录需要覆盖整个视频，不能从断点继续
+    observations_log = ObservationLog() if observation_log_path else None
+    can_resume = resume and shards <= 1 and observations_log is None
+    checkpoint = load_checkpoint(checkpoint_path, settings) if can_resume else None
+    if checkpoint is not None:
+        start_frame = checkpoint['frame']
+        segmenter.restore_state(checkpoint['segmenter'])
+        if checkpoint['save_path']:
+            writer.resume(checkpoint['save_path'], checkpoint['offset'],
+                          checkpoint['cue_count'], checkpoint['first_start_str'])
+        print(f"从断点继续处理：第 {start_frame} 帧，已有 {segmenter.cue_count} 条字幕")
     
-    print(f"开始处理视频 - FPS: {fps:.2f}")
+    sampler = create_sampler(cap, fps, sample_rate, total_frames, subtitle_area, adaptive,
+                             start_frame=start_frame, frame_source=frame_source, video_path=video_path,
+                             scale_height=preprocess.target_height)
+    completed = False
     
-    with tqdm(total=total_frames, desc="处理进度") as pbar:
+    if shards > 1 and total_frames > 0:
+        # 分段模式：各段并行识别，再把所有采样观测按时间顺序送入同一个状态机，
+        # 跨越分段边界的字幕自然会被接上
+        cap.release()
+        shard_ranges = get_shard_ranges(total_frames, shards, sampler.step)
+        print(f"开始处理视频 - FPS: {fps:.2f}，采样间隔: {sampler.step} 帧，分 {len(shard_ranges)} 段并行识别")
+        shard_args = [(video_path, lang, subtitle_area, sample_rate, change_threshold, batch_size, adaptive,
+                       text_presence, preprocess, frame_source, i, start_frame, end_frame)
+                      for i, (start_frame, end_frame) in enumerate(shard_ranges)]
+        frame_count = 0
+        config = get_config()
+        budget = plan_thread_budget(len(shard_args), config['cpu_threads'], config['pin_cpus'])
         try:
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
+            with Pool(processes=len(shard_args), initializer=init_ocr_worker,
+                      initargs=(lang, cache_path, config, budget, multiprocessing.Value('i', 0))) as pool:
+                for i, shard_result in enumerate(pool.map(_extract_shard, shard_args)):
+                    if shard_result is None:
+                        print(f"第 {i + 1} 段识别失败，该段字幕将缺失")
+                        continue
+                    observations, frame_count, shard_stats, shard_metrics = shard_result
+                    for key in stats:
+                        stats[key] += shard_stats[key]
+                    metrics.merge_dict(shard_metrics)
+                    with metrics.time('segment'):
+                        for current_time, items in observations:
+                            segmenter.feed(current_time, join_text_items(items))
+                            if observations_log is not None:
+                                observations_log.append(current_time, items)
+            segmenter.finish(frame_count/fps)
+            completed = True
+        except Exception as e:
+            print(f"\n处理视频时出错: {str(e)}")
+        finally:
+            writer.close()
+    else:
+        # 流水线：解码线程 -> 识别线程 -> 当前线程按顺序重组并生成时间轴
+        ring = None
+        if ocr_processes > 0:
+            # 每个识别线程对应一个识别进程，字幕区域经共享内存传递
+            roi_width, roi_height = preprocess.output_size(*area_to_pixels(
+                int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), subtitle_area)[2:])
+            try:
+                ocr_instances, ring = start_ocr_processes(ocr_processes, lang, roi_width * roi_height * 3,
+                                                          batch_size)
+            except RuntimeError as e:
+                print(f"错误：启动识别进程失败: {str(e)}")
+                writer.close()
+                sampler.close()
+                cap.release()
+                return None
+        else:
+            ocr_workers = max(1, ocr_workers)
+            ocr_instances = [ocr]
+            while len(ocr_instances) < ocr_workers:
+                extra_ocr = create_ocr(lang)
+                if extra_ocr is None:
                     break
-                    
-                frame_count += 1
-                pbar.update(1)
-                
-                # 修改为每秒处理10帧
-                if frame_count % int(fps/10) != 0:  # 将5改为10
-                    continue
-                    
-                # 获取视频底部区域
-                height = frame.shape[0]
-                width = frame.shape[1]
-
-                # 修改字幕区域的截取方式
-                # 只截取底部 20% 的区域，个比例可以根实际视频调整
-                bottom_margin = int(height * bottom_ratio)  # 从底部 80% 处开始
-                top_margin = int(height * top_ratio)     # 到底部 90% 结束
-
-                # 获取更精确的字幕区域
-                subtitle_region = frame[bottom_margin:top_margin, :]
-
-                # 可以选择性地只取中间部分的宽度，避免边缘干扰
-                # left_margin = int(width * 0.1)    # 左边留出 10%
-                # right_margin = int(width * 0.9)   # 右边留出 10%
-                # subtitle_region = frame[bottom_margin:top_margin, left_margin:right_margin]
-                
-                try:
-                    # OCR识别
-                    result = ocr.ocr(subtitle_region, cls=True)
-                    
-                    if result:
-                        # 提高置信度要求，并添加文本长度限制
-                        text_items = []
-                        for line in result:
-                            for item in line:
-                                if item[1][1] > 0.9:  # 提高置信度阈值
-                                    text = item[1][0].strip()
-                                    if len(text) >= 2:  # 只保留长度大于等于2的文本
-                                        text_items.append(text)
-                        
-                        text = " ".join(text_items)
-                        
-                        # 简单的文本验证
-                        if text.strip() and len(text) <= 50:  # 限制最大长度，避免误识别
-                            empty_frames = 0
-                            current_time = frame_count/fps
-                            
-                            if text != last_text:
-                                if start_time is not None:
-                                    duration = current_time - start_time
-                                    
-                                    # 确保字幕持续时间在合理范围内
-                                    if duration >= MIN_DURATION:
-                                        if duration > MAX_DURATION:
-                                            end_time = start_time + MAX_DURATION
-                                        else:
-                                            end_time = current_time
-                                            
-                                        start_str = time.strftime('%H:%M:%S,', time.gmtime(start_time)) + f'{int((start_time % 1) * 1000):03d}'
-                                        end_str = time.strftime('%H:%M:%S,', time.gmtime(end_time)) + f'{int((end_time % 1) * 1000):03d}'
-                                        
-                                        # 直接使用原文本，不添加拼音
-                                        subtitle_entry = f"{subtitle_index}\n{start_str} --> {end_str}\n{last_text}\n"
-                                        subtitles.append(subtitle_entry)
-                                        subtitle_index += 1
-                                
-                                start_time = current_time
-                                last_text = text
-                        else:
-                            empty_frames += 1
-                            # 果连续多帧没有检测到字幕，结束当前字幕
-                            if empty_frames >= EMPTY_FRAMES_THRESHOLD and start_time is not None:
-                                current_time = frame_count/fps
-                                duration = current_time - start_time
-                                
-                                if duration >= MIN_DURATION:
-                                    start_str = time.strftime('%H:%M:%S,', time.gmtime(start_time)) + f'{int((start_time % 1) * 1000):03d}'
-                                    end_str = time.strftime('%H:%M:%S,', time.gmtime(current_time)) + f'{int((current_time % 1) * 1000):03d}'
-                                    subtitle_entry = f"{subtitle_index}\n{start_str} --> {end_str}\n{last_text}\n"
-                                    subtitles.append(subtitle_entry)
-                                    subtitle_index += 1
-                                    
-                                start_time = None
-                                last_text = ""
+                ocr_instances.append(extra_ocr)
+        
+        if frame_source == 'ffmpeg':
+            decode_mode = 'ffmpeg 截取字幕区域'
+        else:
+            decode_mode = '跳转定位' if sampler.use_seek else '逐帧grab'
+        print(f"开始处理视频 - FPS: {fps:.2f}，采样间隔: {sampler.step} 帧"
+              f"（{decode_mode}），{'识别进程' if ring is not None else '识别线程'}: {len(ocr_instances)}")
+        
+        own_cache = ocr_cache is None
+        if own_cache:
+            ocr_cache = OcrCache(cache_path)
+        
+        last_fed_frame = start_frame
+        last_checkpoint_time = time.time()
+        
+        def write_checkpoint():
+            with metrics.time('checkpoint'):
+                writer.sync()
+                save_checkpoint(checkpoint_path, {
+                    'settings': settings,
+                    'frame': last_fed_frame,
+                    'segmenter': segmenter.get_state(),
+                    'save_path': writer.save_path,
+                    'offset': writer.tell(),
+                    'cue_count': writer.cue_count,
+                    'first_start_str': writer.first_start_str,
+                })
+        
+        def on_items(current_time, items):
+            nonlocal last_fed_frame, last_checkpoint_time
+            segmenter.feed(current_time, join_text_items(items))
+            if observations_log is not None:
+                observations_log.append(current_time, items)
+            last_fed_frame = int(round(current_time * fps))
+            if progress_callback is not None:
+                progress_callback(last_fed_frame, total_frames, segmenter.cue_count)
+            if time.time() - last_checkpoint_time >= CHECKPOINT_INTERVAL:
+                write_checkpoint()
+                last_checkpoint_time = time.time()
+        
+        with tqdm(total=total_frames, initial=start_frame, desc="处理进度") as pbar:
+            try:
+                run_ocr_pipeline(sampler, fps, ocr_instances, subtitle_area, change_threshold, batch_size,
+                                 on_items, stats, pbar, cancel_event, ocr_cache, lang, text_presence, preprocess,
+                                 metrics)
                 
-                except Exception as e:
-                    continue
+                if cancel_event is not None and cancel_event.is_set():
+                    # 取消时保留断点，之后可以继续处理
+                    write_checkpoint()
+                else:
+                    # 处理最后一帧字幕
+                    frame_count = sampler.frames_read
+                    pbar.update(frame_count - pbar.n)
+                    segmenter.finish(frame_count/fps)
+                    completed = True
         
-            # 处理最后一帧字幕
-            if start_time is not None and last_text:
-                end_time = frame_count/fps
-                start_str = time.strftime('%H:%M:%S,', time.gmtime(start_time)) + f'{int((start_time % 1) * 1000):03d}'
-                end_str = time.strftime('%H:%M:%S,', time.gmtime(end_time)) + f'{int((end_time % 1) * 1000):03d}'
-                subtitle_entry = f"{subtitle_index}\n{start_str} --> {end_str}\n{last_text}\n"
-                subtitles.append(subtitle_entry)
+            except Exception as e:
+                print(f"\n处理视频时出错: {str(e)}")
+            finally:
+                writer.close()
+                sampler.close()
+                cap.release()
+                if own_cache:
+                    ocr_cache.close()
+                if ring is not None:
+                    for client in ocr_instances:
+                        client.close()
+                        metrics.merge_dict(client.metrics_data)
+                    ring.close()
     
+    if adaptive and shards <= 1:
+        print(f"\n自适应采样：二分查找插入 {sampler.refined_frames} 个字幕切换帧")
+    print(f"\n采样 {stats['sampled_frames']} 帧，OCR 识别 {stats['ocr_calls']} 次，"
+          f"字幕区域未变化跳过 {stats['skipped_unchanged']} 帧，命中缓存 {stats['cache_hits']} 帧，"
+          f"无字幕跳过 {stats['no_text']} 帧")
+    for key, value in stats.items():
+        metrics.count(key, value)
+    print(f"各阶段耗时: {metrics.summary()}")
+    if metrics_path:
+        try:
+            metrics.save(metrics_path, video_path=video_path, fps=fps, total_frames=total_frames,
+                         elapsed=round(time.perf_counter() - run_start, 3), completed=completed)
         except Exception as e:
-            print(f"\n处理视频时出错: {str(e)}")
-        finally:
-            cap.release()
+            print(f"保存耗时统计时出错: {str(e)}")
     
-    if subtitles:
+    if not completed:
+        if cancel_event is not None and cancel_event.is_set():
+            print("\n已取消，下次处理同一视频时会从断点继续")
+        elif writer.save_path:
+            print(f"\n处理未完成，已写出的字幕保存在: {writer.save_path}")
+        return None
+    
+    remove_checkpoint(checkpoint_path)
+    if observations_log is not None:
         try:
-            # 从第一条字幕中提取时间信息
-            first_subtitle = subtitles[0]
-            time_line = first_subtitle.split('\n')[1]
-            start_time = time_line.split('-->')[0].strip()
-            seconds = start_time.split(':')[2]
-            time_str = seconds.replace(',', '')
-            
-            # 获取视频所在的目录
-            video_dir = os.path.dirname(video_path)
-            if not video_dir:
-                video_dir = os.getcwd()
-                
-            # 在视频所在目录创建output文件夹
-            output_dir = os.path.join(video_dir, 'output')
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # 构建基本文件名
-            file_name, file_ext = os.path.splitext(os.path.basename(video_path))
-            base_name = f"{file_name}_{time_str}"
-            
-            # 检查文件是否存在并生成唯一文件名
-            counter = 1
-            output_file = f"{base_name}.srt"
-            save_path = os.path.join(output_dir, output_file)
-            
-            while os.path.exists(save_path):
-                output_file = f"{base_name}_{counter}.srt"
-                save_path = os.path.join(output_dir, output_file)
-                counter += 1
-            
-            # 保存文件
-            with open(save_path, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(subtitles))
-            print(f"\n字幕提取完成，共提取 {len(subtitles)} 条字幕")
-            print(f"第一条字幕时间点: {start_time}")
-            print(f"已保存到: {save_path}")
-            
+            observations_log.save(observation_log_path, video_path=video_path, fps=fps,
+                                  total_frames=total_frames, frames_read=frame_count,
+                                  empty_frames_threshold=empty_frames_threshold,
+                                  end_at_first_empty=end_at_first_empty)
+            print(f"观测记录已保存到: {observation_log_path}（{len(observations_log)} 个采样帧）")
         except Exception as e:
-            print(f"\n保存字幕文件时出错: {str(e)}")
-            # 如果保存失败，尝试保存到当前目录
-            try:
-                # 在当前目录也要避免覆盖
-                base_name = f"{os.path.splitext(output_file)[0]}_{time_str}"
-                counter = 1
-                save_file = f"{base_name}.srt"
-                save_path = os.path.join(os.getcwd(), save_file)
-                
-                while os.path.exists(save_path):
-                    save_file = f"{base_name}_{counter}.srt"
-                    save_path = os.path.join(os.getcwd(), save_file)
-                    counter += 1
-                
-                with open(save_path, 'w', encoding='utf-8') as f:
-                    f.write('\n'.join(subtitles))
-                print(f"已保存到当前目录: {save_path}")
-            except Exception as e2:
-                print(f"保存到当前目录也失败: {str(e2)}")
-    else:
+            print(f"保存观测记录时出错: {str(e)}")
+    if progress_callback is not None:
+        progress_callback(frame_count, total_frames, segmenter.cue_count)
+    
+    if writer.cue_count == 0:
         print("\n未能提取到任何字幕")
+        return None
+    
+    print(f"\n字幕提取完成，共提取 {writer.cue_count} 条字幕")
+    print(f"第一条字幕时间点: {writer.first_start_str}")
+    print(f"已保存到: {writer.save_path}")
+    return writer.save_path
+
+TRACK_QUEUE_SIZE = 64  # 多轨道提取时，分发循环最多领先每条轨道的采样帧数
 
-def preview_subtitle_area(video_path, bottom_ratio, top_ratio):
+class TrackFrameFeed:
+    """
+    多轨道提取时单条轨道的取帧器：视频只解码一次，由分发循环把这条轨道的字幕区域逐帧放入队列
+    接口与 FrameSampler 相同，得到的帧已经是字幕区域（cropped 为 True），
+    之后的变化检测、识别和时间轴生成沿用单轨道的流水线
+    """
+    cropped = True
+    use_seek = False
+
+    def __init__(self, step):
+        self.step = step
+        self.frames_read = 0
+        self.queue = queue.Queue(maxsize=TRACK_QUEUE_SIZE)
+        self.closed = threading.Event()
+
+    def put(self, frame_count, roi):
+        """
+        放入一帧字幕区域，轨道已经停止时返回 False
+        """
+        return _queue_put(self.queue, (frame_count, roi), self.closed)
+
+    def finish(self, frames_read):
+        """
+        视频读完，frames_read 为实际读到的帧数
+        """
+        _queue_put(self.queue, (frames_read, None), self.closed)
+
+    def __iter__(self):
+        while True:
+            frame_count, roi = self.queue.get()
+            self.frames_read = frame_count
+            if roi is None:
+                return
+            yield frame_count, roi
+
+    def close(self):
+        """
+        轨道停止后调用，分发循环不再向它放入数据
+        """
+        self.closed.set()
+
+def extract_subtitle_tracks(video_path, tracks, sample_rate=DEFAULT_SAMPLE_RATE, change_threshold=CHANGE_THRESHOLD,
+                            batch_size=OCR_BATCH_SIZE, ocr_workers=1, ocr=None, progress_callback=None,
+                            cancel_event=None, ocr_cache=None, cache_path=None, text_presence=True,
+                            preprocess=None, metrics=None, metrics_path=None, frame_source=None, ocr_processes=0):
+    """
+    只解码一次视频，同时提取多条字幕轨道（例如底部的中文和其上方的英文、画面顶部的说明文字），每条轨道生成一个字幕文件
+    每条轨道有独立的变化检测、识别线程和时间轴，解码和读文件的开销与轨道数无关；语言相同的轨道共用 OCR 实例
+    :param tracks: [(字幕区域, 语言), ...]，字幕区域的格式与 extract_subtitles 相同，但不支持 'auto'
+    :param ocr: {语言: OCR 实例}，已经加载好的实例，缺少的语言在这里加载
+    :param ocr_processes: 多轨道提取不支持识别进程，大于0时改用识别线程
+    其余参数与 extract_subtitles 相同；不支持分段、自适应采样、断点续传和观测记录
+    :return: 与 tracks 一一对应的字幕文件路径列表（没有字幕的轨道为 None），失败或取消时返回 None
+    """
+    if not tracks:
+        print("错误：没有指定字幕轨道")
+        return None
+    areas = []
+    for subtitle_area, _ in tracks:
+        if subtitle_area == AUTO_SUBTITLE_AREA:
+            print("错误：多轨道提取需要为每条轨道指定字幕区域")
+            return None
+        subtitle_area = normalize_subtitle_area(subtitle_area)
+        if subtitle_area is None:
+            return None
+        areas.append(subtitle_area)
+    langs = [lang for _, lang in tracks]
+    if ocr_processes > 0:
+        print("多轨道提取不支持识别进程，改用识别线程")
+    
+    if not os.path.exists(video_path):
+        print(f"错误：视频文件不存在: {video_path}")
+        return None
+    
+    # 每种语言准备 ocr_workers 个实例，由该语言的所有轨道共用
+    ocr = ocr or {}
+    ocr_instances = {}
+    for lang in dict.fromkeys(langs):
+        instances = [ocr[lang]] if ocr.get(lang) is not None else []
+        while len(instances) < max(1, ocr_workers):
+            extra_ocr = create_ocr(lang)
+            if extra_ocr is None:
+                break
+            instances.append(extra_ocr)
+        if not instances:
+            return None
+        ocr_instances[lang] = [SharedOcr(instance) for instance in instances]
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print("错误：无法打开视频文件")
+        return None
+    
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if preprocess is None:
+        preprocess = create_preprocessor()
+    if metrics is None:
+        metrics = StageMetrics()
+    frame_source = resolve_frame_source(frame_source)
+    run_start = time.perf_counter()
+    
+    # 取帧器只截取所有轨道的外接区域（ffmpeg 只输出这一块），各轨道再从中截取自己的区域
+    union_area = (min(area[0] for area in areas), min(area[1] for area in areas),
+                  max(area[2] for area in areas), max(area[3] for area in areas))
+    sampler = create_sampler(cap, fps, sample_rate, total_frames, union_area, frame_source=frame_source,
+                             video_path=video_path)
+    origin_x, origin_y = area_to_pixels(width, height, union_area)[:2] if sampler.cropped else (0, 0)
+    
+    empty_frames_threshold, end_at_first_empty = get_empty_frames_setting(sample_rate)
+    own_cache = ocr_cache is None
+    if own_cache:
+        ocr_cache = OcrCache(cache_path)
+    
+    track_states = []
+    for i, (area, lang) in enumerate(zip(areas, langs)):
+        x, y, w, h = area_to_pixels(width, height, area)
+        # 语言相同的轨道在文件名中再加上轨道序号
+        writer = SrtWriter(video_path, name_suffix=f"_{lang}" if langs.count(lang) == 1 else f"_{i + 1}_{lang}")
+        
+        def write_cue(entry, start_time, writer=writer):
+            with metrics.time('write'):
+                writer.write(entry, start_time)
+        
+        track_states.append({
+            'index': i,
+            'area': area,
+            'lang': lang,
+            'rect': (x - origin_x, y - origin_y, w, h),
+            'feed': TrackFrameFeed(sampler.step),
+            'writer': writer,
+            'segmenter': SubtitleSegmenter(empty_frames_threshold=empty_frames_threshold, on_cue=write_cue,
+                                           end_at_first_empty=end_at_first_empty),
+            'stats': new_pipeline_stats(),
+            'metrics': StageMetrics(),
+            'completed': False,
+        })
+    
+    def run_track(track):
+        segmenter = track['segmenter']
+        try:
+            # 轨道自己的进度条和取消由分发循环负责
+            with tqdm(disable=True) as track_pbar:
+                run_ocr_pipeline(track['feed'], fps, ocr_instances[track['lang']], track['area'], change_threshold,
+                                 batch_size, lambda current_time, items: segmenter.feed(current_time,
+                                                                                        join_text_items(items)),
+                                 track['stats'], track_pbar, ocr_cache=ocr_cache, lang=track['lang'],
+                                 text_presence=text_presence, preprocess=preprocess, metrics=track['metrics'])
+            if cancel_event is None or not cancel_event.is_set():
+                segmenter.finish(track['feed'].frames_read/fps)
+                track['completed'] = True
+        except Exception as e:
+            print(f"\n处理第 {track['index'] + 1} 条字幕轨道时出错: {str(e)}")
+        finally:
+            track['feed'].close()
+            track['writer'].close()
+    
+    threads = [threading.Thread(target=run_track, args=(track,), daemon=True) for track in track_states]
+    for thread in threads:
+        thread.start()
+    
+    decode_mode = 'ffmpeg 截取字幕区域' if frame_source == 'ffmpeg' else ('跳转定位' if sampler.use_seek else '逐帧grab')
+    print(f"开始处理视频 - FPS: {fps:.2f}，采样间隔: {sampler.step} 帧（{decode_mode}），"
+          f"{len(track_states)} 条字幕轨道共用一次解码")
+    decode_ok = True
+    try:
+        with tqdm(total=total_frames, desc="处理进度") as pbar:
+            decode_start = time.perf_counter()
+            for frame_count, frame in sampler:
+                crop_start = time.perf_counter()
+                metrics.observe('decode', crop_start - decode_start)
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                pbar.update(frame_count - pbar.n)
+                # 取帧器的缓冲区会被下一帧复用，每条轨道拷贝一份自己的字幕区域
+                regions = [frame[y:y + h, x:x + w].copy() for x, y, w, h in (track['rect'] for track in track_states)]
+                metrics.observe('crop', time.perf_counter() - crop_start)
+                with metrics.time('queue_wait'):
+                    active = [track['feed'].put(frame_count, region) for track, region in zip(track_states, regions)]
+                if not any(active):  # 所有轨道都已经停止
+                    break
+                if progress_callback is not None:
+                    progress_callback(frame_count, total_frames,
+                                      sum(track['segmenter'].cue_count for track in track_states))
+                decode_start = time.perf_counter()
+            pbar.update(sampler.frames_read - pbar.n)
+    except Exception as e:
+        print(f"\n解码视频时出错: {str(e)}")
+        metrics.count('decode_errors')
+        decode_ok = False
+    finally:
+        for track in track_states:
+            track['feed'].finish(sampler.frames_read)
+        for thread in threads:
+            thread.join()
+        sampler.close()
+        cap.release()
+        if own_cache:
+            ocr_cache.close()
+    
+    stats = new_pipeline_stats()
+    for track in track_states:
+        data = track['metrics'].to_dict()
+        # 轨道流水线中的 decode 只是等待分发循环的时间，解码耗时已经由分发循环记录
+        data['stages'].pop('decode', None)
+        metrics.merge_dict(data)
+        for key in stats:
+            stats[key] += track['stats'][key]
+        print(f"\n轨道 {track['index'] + 1}（{track['lang']}）: 采样 {track['stats']['sampled_frames']} 帧，"
+              f"OCR 识别 {track['stats']['ocr_calls']} 次，生成 {track['writer'].cue_count} 条字幕")
+    for key, value in stats.items():
+        metrics.count(key, value)
+    print(f"各阶段耗时: {metrics.summary()}")
+    completed = decode_ok and all(track['completed'] for track in track_states)
+    if metrics_path:
+        try:
+            metrics.save(metrics_path, video_path=video_path, fps=fps, total_frames=total_frames,
+                         elapsed=round(time.perf_counter() - run_start, 3), completed=completed,
+                         tracks=[{'subtitle_area': list(track['area']), 'lang': track['lang']}
+                                 for track in track_states])
+        except Exception as e:
+            print(f"保存耗时统计时出错: {str(e)}")
+    
+    if not completed:
+        if cancel_event is not None and cancel_event.is_set():
+            print("\n已取消")
+        return None
+    if progress_callback is not None:
+        progress_callback(sampler.frames_read, total_frames, sum(track['writer'].cue_count for track in track_states))
+    
+    save_paths = []
+    for track in track_states:
+        if track['writer'].cue_count == 0:
+            print(f"轨道 {track['index'] + 1}（{track['lang']}）未能提取到任何字幕")
+            save_paths.append(None)
+        else:
+            print(f"轨道 {track['index'] + 1}（{track['lang']}）已保存到: {track['writer'].save_path}")
+            save_paths.append(track['writer'].save_path)
+    return save_paths
+
+def segment_observation_log(log_path, output_path=None, min_duration=MIN_DURATION, max_duration=MAX_DURATION,
+                            empty_frames_threshold=None, min_confidence=MIN_CONFIDENCE,
+                            min_text_length=MIN_TEXT_LENGTH, max_text_length=MAX_TEXT_LENGTH):
+    """
+    第二阶段：从观测记录生成字幕，不需要解码视频和 OCR，几秒内就能完成，适合反复调整阈值
+    :param log_path: extract_subtitles 保存的观测记录(.npz)
+    :param output_path: 字幕文件路径，不指定时与 extract_subtitles 的命名规则相同
+    :param empty_frames_threshold: 不指定时使用提取时的设置（与采样频率、是否自适应采样有关）
+    :return: 保存的字幕文件路径，没有字幕时返回 None
+    """
+    try:
+        meta, observations = load_observation_log(log_path)
+    except Exception as e:
+        print(f"读取观测记录失败: {str(e)}")
+        return None
+    
+    if empty_frames_threshold is None:
+        empty_frames_threshold = meta.get('empty_frames_threshold', EMPTY_FRAMES_THRESHOLD)
+    writer = SrtWriter(meta['video_path'], output_path)
+    segmenter = SubtitleSegmenter(min_duration, max_duration, empty_frames_threshold,
+                                  on_cue=writer.write, max_text_length=max_text_length,
+                                  end_at_first_empty=meta.get('end_at_first_empty', False))
+    try:
+        for current_time, items in observations:
+            segmenter.feed(current_time, join_text_items(items, min_confidence, min_text_length))
+        segmenter.finish(meta['frames_read'] / meta['fps'])
+    finally:
+        writer.close()
+    
+    if writer.cue_count == 0:
+        print("未能生成任何字幕")
+        return None
+    print(f"共生成 {writer.cue_count} 条字幕，已保存到: {writer.save_path}")
+    return writer.save_path
+
+def preview_subtitle_area(video_path, bottom_ratio, top_ratio, left_ratio=0.0, right_ratio=1.0):
     """
     预览字幕区域的选择效果
     """
@@ -452,16 +2122,17 @@ def preview_subtitle_area(video_path, bottom_ratio, top_ratio):
         print("错误：无法读取视频帧")
         return False
 
-    height = frame.shape[0]
+    height, width = frame.shape[:2]
     
     # 在图像上画出字幕区域
     preview_frame = frame.copy()
     bottom_margin = int(height * bottom_ratio)
     top_margin = int(height * top_ratio)
+    left_margin = int(width * left_ratio)
+    right_margin = int(width * right_ratio)
     
-    # 在选定区域下方画红线
-    cv2.line(preview_frame, (0, bottom_margin), (frame.shape[1], bottom_margin), (0, 0, 255), 2)
-    cv2.line(preview_frame, (0, top_margin), (frame.shape[1], top_margin), (0, 0, 255), 2)
+    # 用红框标出选定区域
+    cv2.rectangle(preview_frame, (left_margin, bottom_margin), (right_margin, top_margin), (0, 0, 255), 2)
     
     # 显示预览图像
     cv2.imshow('字幕区域预览 (按ESC退出，按ENTER确认)', preview_frame)
@@ -475,102 +2146,388 @@ def preview_subtitle_area(video_path, bottom_ratio, top_ratio):
             cv2.destroyAllWindows()
             return True
 
-def process_single_video(args):
+# 进程池中每个工作进程自己的 OCR 实例和缓存，由 init_ocr_worker 在进程启动时创建一次
+_worker_ocr = None
+_worker_lang = None
+_worker_cache = None
+
+def init_ocr_worker(lang, cache_path=None, config=None, budget=None, worker_counter=None):
+    """
+    进程池初始化函数：加载 OCR 模型并做一次预热，之后该进程处理的所有视频都复用这个实例
+    OCR 缓存在该进程处理的所有视频之间共用，指定 cache_path 时还与其他进程共用磁盘缓存
+    config 为父进程的配置，子进程不再重新读取（命令行参数只有父进程知道）
+    budget 为 plan_thread_budget 分配的线程数，在加载模型之前生效；worker_counter 用于领取进程编号以绑定 CPU 核
+    """
+    global _worker_ocr, _worker_lang, _worker_cache
+    if config is not None:
+        set_config(config)
+    if budget is not None:
+        budget.apply(next_worker_index(worker_counter))
+        if get_config()['cpu_threads'] is None:
+            set_config(dict(get_config(), cpu_threads=budget.threads_per_worker))
+    _worker_lang = lang
+    _worker_cache = OcrCache(cache_path)
+    _worker_ocr = create_ocr(lang)
+    if _worker_ocr is not None:
+        warm_up_ocr(_worker_ocr)
+
+def process_single_video(args, metrics=None):
     """
     处理单个视频的函数
+    识别线程数、识别进程数等其余参数取自配置（config.txt、环境变量和命令行），与服务端一致
+    配置了 save_observations 时同时保存观测记录（get_observation_log_path）
+    返回 (是否成功, 字幕文件路径)，没有提取到字幕时路径为 None
     """
     try:
-        video_path, lang, subtitle_area = args
-        output_file = os.path.splitext(os.path.basename(video_path))[0] + ".srt"
-        extract_subtitles(video_path, output_file, lang, subtitle_area)
-        return True
+        video_path, lang, subtitle_area, sample_rate, batch_size = args
+        # 进程池预加载的实例语言一致时直接复用
+        ocr = _worker_ocr if lang == _worker_lang else None
+        options = dict(extract_options(), sample_rate=sample_rate, batch_size=batch_size)
+        if get_config()['save_observations']:
+            options['observation_log_path'] = get_observation_log_path(video_path)
+        save_path = extract_subtitles(video_path, None, lang, subtitle_area, ocr=ocr, ocr_cache=_worker_cache,
+                                      metrics=metrics, **options)
+        return True, save_path
     except Exception as e:
         print(f"处理视频时出错: {str(e)}")
-        return False
+        return False, None
+
+def _process_video_task(args):
+    """
+    进程池任务包装：返回 (视频路径, 是否成功, 各阶段耗时, 字幕文件路径)，便于乱序完成时对应结果
+    """
+    metrics = StageMetrics()
+    ok, save_path = process_single_video(args, metrics)
+    return args[0], ok, metrics.to_dict(), save_path
+
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mkv', '.mov', '.wmv']
+
+def list_video_files(path):
+    """
+    path 为视频文件时返回 [path]，为文件夹时返回其中的所有视频文件
+    """
+    if os.path.isfile(path):
+        return [path] if os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS else []
+    if os.path.isdir(path):
+        return [os.path.join(path, file) for file in sorted(os.listdir(path))
+                if os.path.splitext(file)[1].lower() in VIDEO_EXTENSIONS]
+    return []
+
+def get_manifest_path(path):
+    """
+    处理记录的路径：与字幕文件一样保存在视频所在目录的 output 文件夹中
+    path 可以是视频文件或文件夹
+    """
+    directory = path if os.path.isdir(path) else os.path.dirname(path)
+    return os.path.join(get_output_dir(os.path.join(directory, '')), MANIFEST_FILE)
+
+def manifest_settings(lang, subtitle_area=None, sample_rate=None, config=None):
+    """
+    处理记录中保存的参数：语言、字幕区域、采样率，以及配置中所有影响输出的设置
+    （变化阈值、文字预判、取帧方式、OCR 后端和模型、预处理），任何一项不同都需要重新处理
+    值为 None 的参数不比较
+    """
+    config = config or get_config()
+    change_threshold = config['change_threshold'] if config['change_threshold'] is not None else CHANGE_THRESHOLD
+    settings = {
+        'lang': lang,
+        'subtitle_area': subtitle_area,
+        'sample_rate': sample_rate,
+        'change_threshold': change_threshold,
+        'text_presence': config['text_presence'],
+        'frame_source': config['frame_source'],
+        'ocr_engine': config['ocr_engine'],
+        'ocr_model': engine_cache_suffix(config, lang),  # 模型文件的指纹，替换模型后重新处理
+        'preprocess': create_preprocessor(config).settings(),
+    }
+    return {name: value for name, value in settings.items() if value is not None}
 
-def process_videos_in_groups(video_files, subtitle_areas, lang, group_size=5):
+def get_video_frame_count(video_path):
     """
-    每组5个视频并行处理，一组完成后自动处理下一组
+    读取视频的总帧数，用于估计处理耗时；无法读取时返回0
     """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            return 0
+        return max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    finally:
+        cap.release()
+
+def process_videos_in_groups(video_files, subtitle_areas, lang, workers=None, sample_rate=DEFAULT_SAMPLE_RATE,
+                             cache_path=None, metrics_path=None, batch_size=OCR_BATCH_SIZE, manifest_path=None,
+                             force=False):
+    """
+    并行处理多个视频：按帧数从长到短排序后动态分配给进程池，
+    哪个进程空闲就领取下一个视频，不再等待整组完成
+    进程池的每个工作进程只加载一次 OCR 模型
+    配置了 ocr_processes 时不使用进程池（进程池的工作进程不能再创建识别进程），在当前进程中逐个处理视频，
+    每个视频由 ocr_processes 个识别进程并行识别
+    :param workers: 工作进程数，默认等于可用的 CPU 核数（配置了 cpu_threads 时为 核数 // cpu_threads）
+        CPU 核在进程之间平分，每个进程的 Paddle/OpenMP 线程数不超过分到的核数，避免线程数远超核数
+    :param cache_path: OCR 磁盘缓存(SQLite)路径，所有工作进程共用；重新处理同一批视频时可以跳过 OCR
+    :param metrics_path: 把所有视频合计以及每个视频的各阶段耗时保存为 JSON 文件
+    :param manifest_path: 处理记录(VideoManifest)路径，指定时跳过已经按相同参数处理过且没有变化的视频，
+                          处理完成的视频写入记录；重新处理修改过的视频时替换上次的字幕文件
+    :param force: 忽略处理记录，重新处理所有视频（仍然更新记录）
+    :return: {视频路径: 是否成功}，跳过的视频不包含在内
+    """
+    outcomes = {}
     try:
         # 准备所有需要处理的视频参数
         process_args = []
         for video_path in video_files:
             if video_path in subtitle_areas:
-                process_args.append((video_path, lang, subtitle_areas[video_path]))
+                process_args.append((video_path, lang, subtitle_areas[video_path], sample_rate, batch_size))
+        
+        manifest = VideoManifest(manifest_path) if manifest_path else None
+        fingerprints = {}
+        video_settings = {}
+        previous_outputs = {}
+        if manifest is not None:
+            remaining = []
+            for args in process_args:
+                video_path = args[0]
+                settings = manifest_settings(lang, args[2], sample_rate)
+                if not force and manifest.is_up_to_date(video_path, settings):
+                    continue
+                fingerprints[video_path] = video_fingerprint(video_path)
+                video_settings[video_path] = settings
+                # 上次的字幕文件先改名为 .prev：新文件按第一条字幕的时间重新命名，可能与旧文件同名，
+                # 旧文件还在时会被加上序号。处理成功后记录新文件的路径并删除旧文件，失败时恢复旧文件
+                previous_output = manifest.get_output(video_path)
+                if previous_output and os.path.exists(previous_output):
+                    os.replace(previous_output, previous_output + '.prev')
+                    previous_outputs[video_path] = previous_output
+                remaining.append(args)
+            if len(remaining) < len(process_args):
+                print(f"跳过 {len(process_args) - len(remaining)} 个已处理且没有变化的视频")
+            process_args = remaining
         
         total_videos = len(process_args)
         if total_videos == 0:
             print("没有可处理的视频")
-            return
+            return outcomes
         
-        # 将视频分组
-        video_groups = [process_args[i:i + group_size] 
-                       for i in range(0, len(process_args), group_size)]
+        # 最长的视频最先开始，避免最后只剩一个长视频在跑而其他进程空闲
+        frame_counts = {args[0]: get_video_frame_count(args[0]) for args in process_args}
+        process_args.sort(key=lambda args: frame_counts[args[0]], reverse=True)
         
-        print(f"\n总共 {total_videos} 个视频，分成 {len(video_groups)} 组处理")
-        print(f"每组同时处理 {group_size} 个视频（最后一组可能少于{group_size}个）")
+        config = get_config()
+        budget = plan_thread_budget(workers, config['cpu_threads'], config['pin_cpus'], max_workers=total_videos)
+        workers = budget.workers
         
-        # 处理每一组视频
+        # 进程池的工作进程不能再创建子进程：配置了识别进程时在当前进程中逐个处理视频，
+        # 每个视频由 ocr_processes 个识别进程并行识别
+        sequential = bool(config['ocr_processes'])
+        if sequential:
+            print(f"\n总共 {total_videos} 个视频，逐个处理，每个视频 {config['ocr_processes']} 个识别进程（按时长从长到短）")
+        else:
+            print(f"\n总共 {total_videos} 个视频，{budget.describe()}并行处理（按时长从长到短）")
+        for args in process_args:
+            print(f"- {os.path.basename(args[0])}（{frame_counts[args[0]]} 帧）")
+        
+        # 工作进程启动时各自加载一次 OCR 模型
         total_processed = 0
-        for group_idx, group in enumerate(video_groups, 1):
-            print(f"\n开始处理第 {group_idx}/{len(video_groups)} 组:")
-            for args in group:
-                print(f"- {os.path.basename(args[0])}")
-            
-            try:
-                # 使用进程池处理当前组的视频
-                with Pool(processes=min(len(group), cpu_count())) as pool:
-                    # 使用 map 同步处理视频
-                    results = pool.map(process_single_video, group)
-                    
-                    # 更新处理进度
-                    successful = sum(1 for r in results if r)
-                    total_processed += len(group)
-                    
-                    print(f"\n第 {group_idx} 组处理完成！")
-                    print(f"成功: {successful}/{len(group)}")
-                    print(f"总进度: {total_processed}/{total_videos}")
-                
-                # 自动继续处理下一组
-                if group_idx < len(video_groups):
-                    print(f"\n自动开始处理第 {group_idx + 1} 组...")
-                    
-            except Exception as e:
-                print(f"处理第 {group_idx} 组时出错: {str(e)}")
-                continue
+        successful = 0
+        total_metrics = StageMetrics()
+        video_metrics = {}
+        batch_start = time.perf_counter()
+        pool = None
+        if not sequential:
+            pool = Pool(processes=workers, initializer=init_ocr_worker,
+                        initargs=(lang, cache_path, config, budget, multiprocessing.Value('i', 0)))
+        try:
+            if pool is None:
+                results = map(_process_video_task, process_args)
+            else:
+                results = pool.imap_unordered(_process_video_task, process_args, chunksize=1)
+            for video_path, ok, metrics_data, save_path in results:
+                total_metrics.merge_dict(metrics_data)
+                video_metrics[video_path] = metrics_data
+                total_processed += 1
+                outcomes[video_path] = ok
+                if ok:
+                    successful += 1
+                previous_output = previous_outputs.pop(video_path, None)
+                if manifest is not None and ok and save_path:
+                    manifest.record(video_path, video_settings[video_path], save_path, fingerprints[video_path])
+                    manifest.save()
+                    if previous_output and os.path.exists(previous_output + '.prev'):
+                        os.remove(previous_output + '.prev')
+                elif previous_output and not os.path.exists(previous_output):
+                    os.replace(previous_output + '.prev', previous_output)
+                status = "完成" if ok else "失败"
+                print(f"\n{os.path.basename(video_path)} 处理{status}，总进度: {total_processed}/{total_videos}")
+        finally:
+            if pool is not None:
+                pool.terminate()
         
-        print("\n所有视频处理完成！")
+        print(f"\n所有视频处理完成！成功: {successful}/{total_videos}")
+        if metrics_path:
+            total_metrics.save(metrics_path, elapsed=round(time.perf_counter() - batch_start, 3),
+                               workers=workers, threads_per_worker=budget.threads_per_worker,
+                               videos=video_metrics)
+            print(f"耗时统计已保存到: {metrics_path}")
         
     except Exception as e:
         print(f"处理视频时出错: {str(e)}")
+    return outcomes
+
+WATCH_INTERVAL = 10  # 监视模式下扫描文件夹的间隔(秒)
+WATCH_SETTLE_SECONDS = 5  # 文件大小和修改时间保持不变这么久才认为已经写入完成
+
+def watch_directory(input_dir, subtitle_area, lang, sample_rate=DEFAULT_SAMPLE_RATE, interval=WATCH_INTERVAL,
+                    **batch_kwargs):
+    """
+    监视模式：定期扫描文件夹，新增或修改过的视频写入完成后交给 process_videos_in_groups 处理，按 Ctrl+C 结束
+    已处理的视频记录在处理记录中，重新启动监视也不会重复处理；处理失败或没有字幕的视频在文件再次变化之前不再重试
+    :param subtitle_area: 所有视频使用的字幕区域，通常为 AUTO_SUBTITLE_AREA
+    :param batch_kwargs: 传给 process_videos_in_groups 的其他参数（workers、cache_path 等）
+    """
+    manifest_path = get_manifest_path(input_dir)
+    settings = manifest_settings(lang, subtitle_area, sample_rate)
+    last_seen = {}  # 视频路径 -> 上次扫描时的 (大小, 修改时间)
+    failed = {}  # 处理失败的视频 -> 失败时的 (大小, 修改时间)
+    print(f"开始监视文件夹: {input_dir}，每 {interval} 秒扫描一次（按 Ctrl+C 结束）")
+    try:
+        while True:
+            now = time.time()
+            ready = []
+            for video_path in list_video_files(input_dir):
+                try:
+                    stat = os.stat(video_path)
+                except OSError:
+                    continue
+                state = (stat.st_size, stat.st_mtime)
+                # 两次扫描之间没有变化、并且有一段时间没有写入，才认为复制或下载已经完成
+                if last_seen.get(video_path) == state and now - stat.st_mtime >= WATCH_SETTLE_SECONDS:
+                    if failed.get(video_path) != state:
+                        ready.append(video_path)
+                last_seen[video_path] = state
+            
+            if ready:
+                manifest = VideoManifest(manifest_path)
+                ready = [video_path for video_path in ready if not manifest.is_up_to_date(video_path, settings)]
+            if ready:
+                print(f"\n发现 {len(ready)} 个新的或修改过的视频")
+                process_videos_in_groups(ready, {video_path: subtitle_area for video_path in ready}, lang,
+                                         sample_rate=sample_rate, manifest_path=manifest_path, **batch_kwargs)
+                # 没有写入记录的（失败或没有提取到字幕）在文件再次变化之前不再处理
+                manifest = VideoManifest(manifest_path)
+                for video_path in ready:
+                    if not manifest.is_up_to_date(video_path, settings):
+                        failed[video_path] = last_seen[video_path]
+                print(f"\n继续监视文件夹: {input_dir}")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n已停止监视")
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="从视频中提取硬字幕")
+    parser.add_argument('path', nargs='?', help="视频文件或文件夹路径，不指定时运行后输入")
+    parser.add_argument('--area', nargs='+',
+                        help="所有视频使用的字幕区域：auto（自动检测）、x1 y1 x2 y2 或 bottom_ratio top_ratio，"
+                             "不指定时逐个框选")
+    parser.add_argument('--force', action='store_true', help="忽略处理记录，重新处理所有视频")
+    parser.add_argument('--watch', action='store_true',
+                        help="监视文件夹，新视频写入完成后自动处理（字幕区域默认自动检测）")
+    parser.add_argument('--watch-interval', type=float, default=WATCH_INTERVAL, help="监视模式的扫描间隔(秒)")
+    segment_group = parser.add_argument_group("从观测记录重新生成字幕（不解码视频、不运行 OCR）")
+    segment_group.add_argument('--from-log', nargs='+', metavar='LOG',
+                               help="观测记录(.npz)路径，由 save_observations=true 时的提取过程保存")
+    segment_group.add_argument('--output', help="字幕文件路径（只能配合单个观测记录），默认与提取时的命名规则相同")
+    segment_group.add_argument('--min-duration', type=float, default=MIN_DURATION, help="字幕的最短持续时间(秒)")
+    segment_group.add_argument('--max-duration', type=float, default=MAX_DURATION, help="字幕的最长持续时间(秒)")
+    segment_group.add_argument('--empty-frames', type=int, default=None,
+                               help="连续多少个采样帧没有字幕才结束当前字幕，默认沿用提取时的设置")
+    segment_group.add_argument('--min-confidence', type=float, default=MIN_CONFIDENCE, help="文本项的最低置信度")
+    segment_group.add_argument('--min-text-length', type=int, default=MIN_TEXT_LENGTH, help="文本项的最短长度")
+    segment_group.add_argument('--max-text-length', type=int, default=MAX_TEXT_LENGTH,
+                               help="整行字幕的最大长度，超过时视为误识别")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    try:
+        config = config_from_args(args)
+    except ConfigError as e:
+        print(f"配置错误: {str(e)}")
+        exit(1)
+    
+    if args.from_log:
+        # 第二阶段：只按新的阈值重新生成字幕，几秒内完成
+        if args.output and len(args.from_log) > 1:
+            print("错误：--output 只能配合单个观测记录使用")
+            exit(1)
+        failed = 0
+        for log_path in args.from_log:
+            print(f"\n从观测记录生成字幕: {log_path}")
+            if not segment_observation_log(log_path, args.output, args.min_duration, args.max_duration,
+                                           args.empty_frames, args.min_confidence, args.min_text_length,
+                                           args.max_text_length):
+                failed += 1
+        exit(1 if failed else 0)
+    
+    area_arg = None
+    if args.area:
+        if args.area == [AUTO_SUBTITLE_AREA]:
+            area_arg = AUTO_SUBTITLE_AREA
+        else:
+            try:
+                area_arg = normalize_subtitle_area([float(value) for value in args.area])
+            except ValueError:
+                area_arg = None
+            if area_arg is None:
+                print(f"错误：无效的字幕区域: {' '.join(args.area)}")
+                exit(1)
+    
     try:
         print("程序开始运行...")
-        print("请输入视频文件路径或文件夹路径")
-        print("支持以下格式：")
-        print("1. 单个视频文件路径，如：E:\\video\\test.mp4")
-        print("2. 包含多个视频的文件夹路径，如：E:\\video")
-        path = input("请输入路径: ").strip('"')  # 去除可能的引号
+        path = args.path
+        if not path:
+            print("请输入视频文件路径或文件夹路径")
+            print("支持以下格式：")
+            print("1. 单个视频文件路径，如：E:\\video\\test.mp4")
+            print("2. 包含多个视频的文件夹路径，如：E:\\video")
+            path = input("请输入路径: ").strip('"')  # 去除可能的引号
         
         # 设置默认值
-        lang = "ch"
-        video_extensions = ['.mp4', '.avi', '.mkv', '.mov', '.wmv']
+        lang = config['lang']
+        sample_rate = config['sample_rate'] or DEFAULT_SAMPLE_RATE
+        batch_kwargs = {
+            'workers': config['workers'],
+            'cache_path': config['cache_path'],
+            'batch_size': config['batch_size'] or OCR_BATCH_SIZE,
+        }
+        
+        if args.watch:
+            if not os.path.isdir(path):
+                print("监视模式需要文件夹路径")
+                exit(1)
+            watch_directory(path, area_arg or AUTO_SUBTITLE_AREA, lang, sample_rate, args.watch_interval,
+                            **batch_kwargs)
+            exit(0)
         
         # 获取要处理的视频文件列表
-        video_files = []
-        if os.path.isfile(path):
-            if os.path.splitext(path)[1].lower() in video_extensions:
-                video_files.append(path)
-        elif os.path.isdir(path):
-            for file in os.listdir(path):
-                if os.path.splitext(file)[1].lower() in video_extensions:
-                    video_files.append(os.path.join(path, file))
+        video_files = list_video_files(path)
         
         if not video_files:
             print("未找到任何视频文件！")
             exit(1)
+        
+        # 增量处理：跳过已经处理过且没有变化的视频
+        # 字幕区域要逐个框选或询问是否自动检测时，这里还不知道区域，由 process_videos_in_groups 在确定区域之后比较
+        manifest_path = get_manifest_path(path)
+        if not args.force and area_arg is not None:
+            manifest = VideoManifest(manifest_path)
+            settings = manifest_settings(lang, area_arg, sample_rate)
+            pending = [video_path for video_path in video_files if not manifest.is_up_to_date(video_path, settings)]
+            if len(pending) < len(video_files):
+                print(f"\n{len(video_files) - len(pending)} 个视频已经处理过且没有变化，跳过（使用 --force 重新处理）")
+            video_files = pending
+            if not video_files:
+                print("没有新的或修改过的视频")
+                exit(0)
             
         print(f"\n找到 {len(video_files)} 个视频文件:")
         for i, video in enumerate(video_files, 1):
@@ -579,29 +2536,36 @@ if __name__ == "__main__":
         # 存储每个视频的字幕区域
         subtitle_areas = {}
         
-        # 先进行所有视频的字幕区域框选
-        print("\n开始框选每个视频的字幕区域...")
-        for i, video_path in enumerate(video_files, 1):
-            print(f"\n请框选第 {i}/{len(video_files)} 个视频的字幕区域: {os.path.basename(video_path)}")
-            area = select_subtitle_area(video_path)
-            if area:
-                subtitle_areas[video_path] = area
-                bottom_ratio, top_ratio = area
-                print(f"已记录字幕区域：底部 {bottom_ratio:.3f}，顶部 {top_ratio:.3f}")
-            else:
-                print(f"跳过视频 {os.path.basename(video_path)}")
-                continue
-        
-        if not subtitle_areas:
-            print("没有成功框选任何视频的字幕区域，程序退出")
-            exit(1)
+        if area_arg is not None:
+            subtitle_areas = {video_path: area_arg for video_path in video_files}
+        elif input("是否自动检测字幕区域？(y/N): ").strip().lower() == 'y':
+            # 自动检测在处理每个视频时进行，不需要人工框选
+            subtitle_areas = {video_path: AUTO_SUBTITLE_AREA for video_path in video_files}
+        else:
+            # 先进行所有视频的字幕区域框选
+            print("\n开始框选每个视频的字幕区域...")
+            for i, video_path in enumerate(video_files, 1):
+                print(f"\n请框选第 {i}/{len(video_files)} 个视频的字幕区域: {os.path.basename(video_path)}")
+                area = select_subtitle_area(video_path)
+                if area:
+                    subtitle_areas[video_path] = area
+                    x1, y1, x2, y2 = area
+                    print(f"已记录字幕区域：左 {x1:.3f}，上 {y1:.3f}，右 {x2:.3f}，下 {y2:.3f}")
+                else:
+                    print(f"跳过视频 {os.path.basename(video_path)}")
+                    continue
             
-        # 确认开始处理
-        print(f"\n已完成 {len(subtitle_areas)} 个视频的字幕区域框选")
-        input("按回车键开始处理视频...")
+            if not subtitle_areas:
+                print("没有成功框选任何视频的字幕区域，程序退出")
+                exit(1)
+                
+            # 确认开始处理
+            print(f"\n已完成 {len(subtitle_areas)} 个视频的字幕区域框选")
+            input("按回车键开始处理视频...")
         
-        # 使用分组处理函数
-        process_videos_in_groups(video_files, subtitle_areas, lang, group_size=5)
+        # 多进程并行处理
+        process_videos_in_groups(video_files, subtitle_areas, lang, sample_rate=sample_rate,
+                                 manifest_path=manifest_path, force=args.force, **batch_kwargs)
         
     except Exception as e:
         print(f"程序出错: {str(e)}") 
\ No newline at end of file
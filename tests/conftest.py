@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 被测模块位于项目根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+import api
+
+@pytest.fixture
+def client():
+    return api.app.test_client()
+
+@pytest.mark.parametrize('kwargs', [
+    {'data': 'not json', 'content_type': 'application/json'},
+    {'json': ['video.mp4']},
+    {'json': {}},
+    {'json': {'video_path': 3}},
+    {'json': {'video_path': 'video.mp4', 'tracks': [[0.8, 0.9]]}},
+    {'json': {'video_path': 'video.mp4', 'tracks': [{'subtitle_area': [0.8, 0.9]}], 'output_path': 'a.srt'}},
+], ids=['invalid_json', 'not_object', 'missing_video_path', 'video_path_not_string', 'track_not_object',
+        'tracks_with_output_path'])
+def test_malformed_job_request_returns_400(client, kwargs):
+    response = client.post('/api/jobs', **kwargs)
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['success'] is False and body['error']
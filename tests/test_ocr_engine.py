@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+import ocr_engine
+from metrics import StageMetrics
+from ocr_engine import PaddleEngine, crop_text_box
+from subtitle_extractor import ocr_batch
+
+# 字幕区域中两个并排的文本框，识别结果由截取的文本图像宽度决定
+BOXES = [[[10, 5], [70, 5], [70, 25], [10, 25]], [[100, 5], [190, 5], [190, 25], [100, 25]]]
+EXPECTED_TEXTS = ['text60', 'text90']
+
+def fake_recognize(image):
+    return (f"text{image.shape[1]}", 0.95)
+
+class FakePaddleOCR:
+    """
+    按 PaddleOCR 2.6 及以后版本的返回结构模拟 ocr()：输入的每张图像对应结果中的一项；
+    det=False 时列表中的每个数组都是单独的图像，嵌套的列表才是一批文本图像
+    """
+    def __init__(self, **options):
+        self.options = options
+
+    def ocr(self, img, det=True, rec=True, cls=True):
+        images = img if isinstance(img, list) else [img]
+        results = []
+        for image in images:
+            if det and not rec:
+                results.append([[list(point) for point in box] for box in BOXES])
+            elif not det:
+                crops = image if isinstance(image, list) else [image]
+                results.append([fake_recognize(crop) for crop in crops])
+            else:
+                results.append([[box, fake_recognize(crop_text_box(image, box))] for box in BOXES])
+        return results
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(ocr_engine, '_paddleocr_class', FakePaddleOCR)
+    return PaddleEngine(use_angle_cls=False)
+
+def make_roi():
+    return np.zeros((32, 200, 3), dtype=np.uint8)
+
+def test_recognize_returns_one_result_per_crop(engine):
+    crops = [np.zeros((20, width, 3), dtype=np.uint8) for width in (30, 40, 50)]
+    assert [text for text, _ in engine.recognize(crops)] == ['text30', 'text40', 'text50']
+
+def test_ocr_batch_keeps_every_text_box(engine):
+    results = ocr_batch(engine, [make_roi(), make_roi()])
+    assert [[item.text for item in items] for items in results] == [EXPECTED_TEXTS, EXPECTED_TEXTS]
+    assert results == [engine.ocr(make_roi())] * 2
+
+def test_ocr_batch_falls_back_when_recognizer_drops_results(engine, monkeypatch):
+    recognize = engine.recognize
+    monkeypatch.setattr(engine, 'recognize', lambda images: recognize(images)[:1])
+    metrics = StageMetrics()
+    results = ocr_batch(engine, [make_roi(), make_roi()], metrics)
+    assert [[item.text for item in items] for items in results] == [EXPECTED_TEXTS, EXPECTED_TEXTS]
+    assert metrics.counters['ocr_batch_errors'] == 1
+
+class OldPaddleOCR(FakePaddleOCR):
+    """
+    PaddleOCR 2.6 之前的 det=False：每张图像单独识别，返回 [(文本, 置信度)]，不支持嵌套的列表
+    """
+    def ocr(self, img, det=True, rec=True, cls=True):
+        if det:
+            return super().ocr(img, det, rec, cls)
+        if isinstance(img, list):
+            raise TypeError("img must be an image")
+        return [fake_recognize(img)]
+
+class DroppingPaddleOCR(FakePaddleOCR):
+    """
+    版本号在范围内、批量识别却只返回第一张图像的结果
+    """
+    def ocr(self, img, det=True, rec=True, cls=True):
+        result = super().ocr(img, det, rec, cls)
+        if not det and isinstance(img, list) and isinstance(img[0], list):
+            return [result[0][:1]]
+        return result
+
+def make_engine(monkeypatch, paddle_class, version):
+    monkeypatch.setattr(ocr_engine, '_paddleocr_class', paddle_class)
+    monkeypatch.setattr(ocr_engine, 'paddleocr_version', lambda _: version)
+    return PaddleEngine(use_angle_cls=False)
+
+@pytest.mark.parametrize('paddle_class, version', [
+    (OldPaddleOCR, None),
+    (OldPaddleOCR, (2, 5)),
+    (DroppingPaddleOCR, (2, 7)),
+    (FakePaddleOCR, None),
+])
+def test_recognize_falls_back_to_single_images(monkeypatch, paddle_class, version):
+    engine = make_engine(monkeypatch, paddle_class, version)
+    crops = [np.zeros((20, width, 3), dtype=np.uint8) for width in (30, 40, 50)]
+    for _ in range(2):
+        assert engine.recognize(crops) == [('text30', 0.95), ('text40', 0.95), ('text50', 0.95)]
+    assert engine.batch_recognize == (paddle_class is FakePaddleOCR)
@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+
+from extractor_config import load_config
+from subtitle_extractor import (OCR_TEXT_HEIGHT, RoiPreprocessor, create_preprocessor, crop_area,
+                                estimate_text_height)
+from shm_transport import RoiRing
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+def make_frame(width, height, busy=False):
+    """
+    画面背景：平滑的彩色噪声，busy 为 True 时为逐像素的噪声（边缘密集）
+    """
+    rng = np.random.default_rng(0)
+    if busy:
+        return rng.integers(0, 200, (height, width, 3), dtype=np.uint8)
+    noise = rng.integers(0, 160, (height // 16 + 1, width // 16 + 1, 3), dtype=np.uint8)
+    return cv2.resize(noise, (width, height), interpolation=cv2.INTER_LINEAR)
+
+def draw_line(frame, text, font_height, center_y):
+    """
+    居中画一行带黑色描边的白字，返回字母的像素高度
+    """
+    scale = cv2.getFontScaleFromHeight(FONT, font_height, 2)
+    thickness = max(2, font_height // 12)
+    (width, height), _ = cv2.getTextSize(text, FONT, scale, thickness)
+    origin = ((frame.shape[1] - width) // 2, center_y + height // 2)
+    cv2.putText(frame, text, origin, FONT, scale, (0, 0, 0), thickness + max(2, font_height // 10), cv2.LINE_AA)
+    cv2.putText(frame, text, origin, FONT, scale, (255, 255, 255), thickness, cv2.LINE_AA)
+    return height
+
+def two_line_roi(width, height, busy=False):
+    """
+    底部 30% 的字幕区域(0.7-1.0)，其中有两行字幕，返回 (字幕区域, 字母高度)
+    """
+    frame = make_frame(width, height, busy)
+    font_height = int(height * 0.045)
+    draw_line(frame, "Where were you last night", font_height, int(height * 0.86))
+    letter_height = draw_line(frame, "I told you not to wait", font_height, int(height * 0.93))
+    return crop_area(frame, (0.0, 0.7, 1.0, 1.0)), letter_height
+
+def test_tall_multiline_roi_keeps_text_readable():
+    roi, letter_height = two_line_roi(3840, 2160)
+    preprocess = RoiPreprocessor()
+    scale = preprocess.scale_for(roi)
+    processed = preprocess(roi)
+    # 4K 的字幕区域依然被缩小，但两行文字都不会被缩到 OCR_TEXT_HEIGHT 以下
+    assert scale < 1.0
+    assert processed.shape[0] < roi.shape[0]
+    assert letter_height * scale >= OCR_TEXT_HEIGHT
+    height, width = (int(round(size * scale)) for size in roi.shape[:2])
+    assert estimate_text_height(processed[:height, :width]) >= OCR_TEXT_HEIGHT * 0.9
+    # 按整个区域的高度缩小时，同样的文字只剩十几个像素
+    assert letter_height * 96 / roi.shape[0] < OCR_TEXT_HEIGHT / 2
+
+def test_small_text_is_not_downscaled():
+    roi, _ = two_line_roi(1280, 720)
+    assert RoiPreprocessor().scale_for(roi) == 1.0
+    assert RoiPreprocessor()(roi).shape[0] >= roi.shape[0]
+
+def test_busy_background_is_not_downscaled():
+    roi, _ = two_line_roi(3840, 2160, busy=True)
+    assert estimate_text_height(roi) is None
+    assert RoiPreprocessor().scale_for(roi) == 1.0
+
+def test_preprocessor_from_config():
+    preprocess = create_preprocessor(load_config(env={}))
+    assert (preprocess.text_height, preprocess.target_height) == (OCR_TEXT_HEIGHT, None)
+    preprocess = create_preprocessor(load_config(env={}, overrides={
+        'roi_text_height': '0', 'roi_target_height': '96', 'roi_grayscale': 'true', 'roi_binarize': 'true'}))
+    assert preprocess.settings() == {'text_height': 0, 'target_height': 96, 'grayscale': True, 'binarize': True,
+                                     'pad_multiple': 32}
+
+def test_preprocess_writes_into_ring_slot():
+    roi, _ = two_line_roi(3840, 2160)
+    ring = RoiRing(2, roi.nbytes)
+    try:
+        for preprocess in (RoiPreprocessor(), RoiPreprocessor(grayscale=True), RoiPreprocessor(binarize=True)):
+            handles = []
+
+            def allocate(shape):
+                handles.append(ring.acquire(shape))
+                return ring.view(handles[-1])
+
+            out = preprocess(roi, allocate)
+            assert np.shares_memory(out, np.ndarray((ring.slots * ring.slot_bytes,), np.uint8, ring.shm.buf))
+            assert np.array_equal(out, preprocess(roi))
+            del out
+            ring.release(handles)
+    finally:
+        ring.close()
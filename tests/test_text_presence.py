@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+import pytest
+
+from subtitle_extractor import roi_changed, roi_has_text, roi_signature
+
+def dark_background(width=854, height=81):
+    """
+    深色的平滑背景：亮度在 15 到 60 之间缓慢变化
+    """
+    ramp = np.linspace(15, 60, width, dtype=np.float32)
+    gray = np.tile(ramp, (height, 1)).astype(np.uint8)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+def draw_text(roi, text, color):
+    roi = roi.copy()
+    cv2.putText(roi, text, (40, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.6, color, 3, cv2.LINE_AA)
+    return roi
+
+# BGR 颜色，灰度值都低于原来的亮色阈值 180
+NON_WHITE_COLORS = {
+    'grey': (130, 130, 130),
+    'red': (40, 40, 200),
+    'blue': (200, 80, 30),
+    'dim_yellow': (0, 150, 160),
+}
+
+@pytest.mark.parametrize('color', NON_WHITE_COLORS.values(), ids=NON_WHITE_COLORS.keys())
+def test_non_white_text_on_dark_background_is_detected(color):
+    roi = draw_text(dark_background(), "Where are you going", color)
+    assert roi_has_text(roi_signature(roi))
+
+def test_empty_dark_background_has_no_text():
+    assert not roi_has_text(roi_signature(dark_background()))
+
+def test_uniform_bright_background_has_no_text():
+    roi = np.full((81, 854, 3), 235, dtype=np.uint8)
+    assert not roi_has_text(roi_signature(roi))
+
+@pytest.mark.parametrize('color', NON_WHITE_COLORS.values(), ids=NON_WHITE_COLORS.keys())
+def test_non_white_subtitle_changes_are_detected(color):
+    empty = roi_signature(dark_background())
+    first = roi_signature(draw_text(dark_background(), "Where are you going", color))
+    second = roi_signature(draw_text(dark_background(), "I told you already", color))
+    assert roi_changed(empty, first)
+    assert roi_changed(first, second)
+    assert not roi_changed(first, roi_signature(draw_text(dark_background(), "Where are you going", color)))
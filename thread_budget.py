@@ -0,0 +1,100 @@
+import os
+import sys
+from multiprocessing import cpu_count
+
+# 这些环境变量决定 OpenMP/MKL/OpenBLAS 线程池的大小，必须在 paddle 导入之前设置
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS')
+# OpenCV 在第一次使用并行时读取该变量，已经导入的 cv2 需要调用 setNumThreads
+OPENCV_THREADS_ENV = 'OPENCV_FOR_THREADS_NUM'
+# 工作进程中 OpenCV 只处理截图、缩放等很小的图像，多线程的开销比收益大
+OPENCV_THREADS_PER_WORKER = 1
+
+def available_cpus():
+    """
+    当前进程可以使用的 CPU 编号列表（考虑 CPU 亲和性限制）
+    """
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return list(range(cpu_count()))
+
+def available_cpu_count():
+    """
+    当前进程可用的 CPU 核数（考虑 CPU 亲和性限制）
+    """
+    return len(available_cpus())
+
+class ThreadBudget:
+    """
+    把 CPU 核分配给各个工作进程：每个进程的 Paddle 推理线程数、OpenMP 线程数和 OpenCV 线程数，
+    以及可选的 CPU 亲和性绑定
+    不做分配时每个进程的 MKLDNN、OpenCV 都会按全部核数创建线程池，进程一多线程数就远超核数
+    """
+    def __init__(self, workers, threads_per_worker, cpu_sets=None):
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.cpu_sets = cpu_sets  # 每个工作进程绑定的 CPU 编号列表，None 表示不绑定
+
+    def describe(self):
+        text = f"{self.workers} 个进程 x 每进程 {self.threads_per_worker} 个推理线程"
+        if self.cpu_sets:
+            text += "，绑定 CPU 核"
+        return text
+
+    def apply(self, worker_index=None):
+        """
+        在工作进程中调用（加载 OCR 模型之前）：设置线程数环境变量、OpenCV 线程数，
+        指定 worker_index 且启用了绑定时把当前进程绑定到对应的 CPU 核
+        """
+        threads = str(self.threads_per_worker)
+        for name in THREAD_ENV_VARS:
+            os.environ[name] = threads
+        os.environ[OPENCV_THREADS_ENV] = str(OPENCV_THREADS_PER_WORKER)
+        if 'cv2' in sys.modules:
+            sys.modules['cv2'].setNumThreads(OPENCV_THREADS_PER_WORKER)
+        if self.cpu_sets and worker_index is not None:
+            cpus = self.cpu_sets[worker_index % len(self.cpu_sets)]
+            try:
+                os.sched_setaffinity(0, cpus)
+            except (AttributeError, OSError) as e:
+                print(f"警告：无法绑定 CPU 核 {cpus}: {str(e)}")
+
+def plan_thread_budget(workers=None, threads_per_worker=None, pin=False, max_workers=None):
+    """
+    按可用核数分配进程数和每个进程的线程数
+    :param workers: 进程数，不指定时为 可用核数 // threads_per_worker（threads_per_worker 也未指定时等于核数）
+    :param threads_per_worker: 每个进程的推理线程数，不指定时为 可用核数 // workers
+    :param pin: 是否把每个进程绑定到互不重叠的一组 CPU 核（仅 Linux 支持）
+    :param max_workers: 进程数上限（例如视频个数），在分配线程之前生效，空出的核分给剩下的进程
+    :return: ThreadBudget
+    """
+    cpus = available_cpus()
+    if workers is None:
+        workers = max(1, len(cpus) // (threads_per_worker or 1))
+    if max_workers is not None:
+        workers = min(workers, max_workers)
+    workers = max(1, workers)
+    if threads_per_worker is None:
+        threads_per_worker = max(1, len(cpus) // workers)
+    if workers * threads_per_worker > len(cpus):
+        print(f"警告：{workers} 个进程 x {threads_per_worker} 个线程超过了可用的 {len(cpus)} 个 CPU 核")
+
+    cpu_sets = None
+    if pin and hasattr(os, 'sched_setaffinity'):
+        # 依次切出连续的核，核数不够时循环使用
+        cpu_sets = [sorted({cpus[(i * threads_per_worker + j) % len(cpus)] for j in range(threads_per_worker)})
+                    for i in range(workers)]
+    elif pin:
+        print("警告：当前系统不支持绑定 CPU 核，已忽略")
+    return ThreadBudget(workers, threads_per_worker, cpu_sets)
+
+def next_worker_index(counter):
+    """
+    从进程间共享的计数器（multiprocessing.Value）领取工作进程编号，用于决定绑定哪组 CPU 核
+    """
+    if counter is None:
+        return None
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    return index
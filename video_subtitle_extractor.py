@@ -1,8 +1,32 @@
-from paddleocr import PaddleOCR
+import argparse
 import cv2
 import os
 import time
 
+from extractor_config import ConfigError, add_config_arguments, config_from_args, get_config
+from frame_source import FfmpegFrameSampler, find_ffmpeg
+from manifest import VideoManifest, video_fingerprint
+from ocr_engine import create_engine, engine_cache_suffix
+
+SUBTITLE_AREA = (0.0, 0.7, 1.0, 1.0)  # 截取底部 30%（通常是字幕区域），格式为 (x1, y1, x2, y2) 比例
+MANIFEST_FILE = 'processed_videos_text.json'  # 处理记录，与 subtitle_extractor 的记录分开保存
+
+def iter_subtitle_regions(cap, frame_interval):
+    """
+    用 OpenCV 取帧：跳过的帧只 grab 不解码，迭代得到 (帧序号, 字幕区域)
+    帧序号从0开始，采样第 0、frame_interval、2*frame_interval... 帧
+    """
+    frame_count = -1
+    while cap.grab():
+        frame_count += 1
+        if frame_count % frame_interval != 0:
+            continue
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
+        height = frame.shape[0]
+        yield frame_count, frame[int(height * SUBTITLE_AREA[1]):, :]
+
 def extract_subtitles(video_path, output_dir='output'):
     # 创建输出目录
     if not os.path.exists(output_dir):
@@ -12,8 +36,10 @@ def extract_subtitles(video_path, output_dir='output'):
     video_name = os.path.splitext(os.path.basename(video_path))[0]
     output_file = os.path.join(output_dir, f"{video_name}_subtitles.txt")
     
-    # 初始化PaddleOCR
-    ocr = PaddleOCR(use_angle_cls=True, lang='ch')  # 中文模型
+    # 按配置初始化 OCR 引擎（paddle 或 onnx），Paddle 的模型目录不存在时使用 PaddleOCR 的默认模型
+    ocr = create_engine(allow_default_models=True)
+    if ocr is None:
+        return False
     
     print(f"正在处理视频: {video_path}")
     
@@ -25,45 +51,45 @@ def extract_subtitles(video_path, output_dir='output'):
     
     # 获取视频信息
     fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_count = 0
+    # 每隔多少帧处理一帧，默认每秒一帧
+    frame_interval = max(1, int(fps / (get_config()['sample_rate'] or 1)))
+    
+    # 取帧方式为 ffmpeg 时由 ffmpeg 只输出采样帧的字幕区域，帧序号同样从0开始
+    config = get_config()
+    sampler = None
+    if config['frame_source'] == 'ffmpeg' and find_ffmpeg(config['ffmpeg_path']):
+        sampler = FfmpegFrameSampler(video_path, fps, frame_interval, int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                                     int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), SUBTITLE_AREA,
+                                     int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), ffmpeg_path=config['ffmpeg_path'],
+                                     first_index=0)
+        frames = sampler
+    else:
+        frames = iter_subtitle_regions(cap, frame_interval)
     
     # 用于存储已识别的文本，避免重复
     previous_text = set()
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            # 每秒处理一帧
-            if frame_count % int(fps) == 0:
-                # 截取底部区域（通常是字幕区域）
-                height = frame.shape[0]
-                subtitle_region = frame[int(height*0.7):, :]
-                
-                # OCR识别
-                result = ocr.ocr(subtitle_region, cls=True)
-                
-                # 提取文字
-                if result:
-                    for line in result:
-                        text = line[1][0]  # 获取识别的文字
-                        confidence = line[1][1]  # 获取置信度
-                        if confidence > 0.9 and text not in previous_text:  # 只输出高置信度且非重复的结果
-                            timestamp = frame_count/fps
-                            f.write(f"[{timestamp:.1f}秒] {text}\n")
-                            print(f"[{timestamp:.1f}秒] {text}")
-                            previous_text.add(text)
-            
-            frame_count += 1
+    try:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            for frame_count, subtitle_region in frames:
+                # OCR识别，得到 [TextItem(文字, 置信度, 文本框), ...]
+                for item in ocr.ocr(subtitle_region):
+                    if item.confidence > 0.9 and item.text not in previous_text:  # 只输出高置信度且非重复的结果
+                        timestamp = frame_count/fps
+                        f.write(f"[{timestamp:.1f}秒] {item.text}\n")
+                        print(f"[{timestamp:.1f}秒] {item.text}")
+                        previous_text.add(item.text)
+    finally:
+        # OCR 出错或被中断时也要结束 ffmpeg 子进程、释放视频
+        if sampler is not None:
+            sampler.close()
+        cap.release()
     
-    cap.release()
     print(f"字幕已保存到: {output_file}\n")
     return True
 
-def batch_process_videos(input_dir, output_dir='output'):
-    """批量处理指定目录下的所有视频文件"""
+def batch_process_videos(input_dir, output_dir='output', force=False):
+    """批量处理指定目录下的所有视频文件，已经处理过且没有变化的视频跳过（force 为 True 时全部重新处理）"""
     # 支持的视频格式
     video_extensions = ('.mp4', '.avi', '.mkv', '.mov', '.flv')
     
@@ -77,15 +103,43 @@ def batch_process_videos(input_dir, output_dir='output'):
     
     print(f"找到 {len(video_files)} 个视频文件")
     
+    # 处理记录：跳过按相同参数（包括取帧方式、OCR 后端和模型）处理过、文件没有变化的视频
+    config = get_config()
+    manifest = VideoManifest(os.path.join(output_dir, MANIFEST_FILE))
+    settings = {'lang': config['lang'], 'sample_rate': config['sample_rate'] or 1, 'subtitle_area': SUBTITLE_AREA,
+                'frame_source': config['frame_source'], 'ocr_engine': config['ocr_engine'],
+                'ocr_model': engine_cache_suffix(config)}
+    if not force:
+        pending = [f for f in video_files
+                   if not manifest.is_up_to_date(os.path.join(input_dir, f), settings)]
+        if len(pending) < len(video_files):
+            print(f"跳过 {len(video_files) - len(pending)} 个已处理且没有变化的视频")
+        video_files = pending
+    
     # 处理每个视频
     for i, video_file in enumerate(video_files, 1):
         print(f"\n处理第 {i}/{len(video_files)} 个视频")
         video_path = os.path.join(input_dir, video_file)
-        extract_subtitles(video_path, output_dir)
+        fingerprint = video_fingerprint(video_path)
+        if extract_subtitles(video_path, output_dir):
+            video_name = os.path.splitext(os.path.basename(video_path))[0]
+            manifest.record(video_path, settings, os.path.join(output_dir, f"{video_name}_subtitles.txt"),
+                            fingerprint)
+            manifest.save()
         
     print("\n所有视频处理完成！")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从视频中提取字幕文本")
+    parser.add_argument('--force', action='store_true', help="批量处理时忽略处理记录，重新处理所有视频")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    try:
+        config_from_args(args)
+    except ConfigError as e:
+        print(f"配置错误: {str(e)}")
+        exit(1)
+
     print("请选择操作模式：")
     print("1. 处理单个视频")
     print("2. 批量处理文件夹中的视频")
@@ -97,6 +151,6 @@ if __name__ == "__main__":
         extract_subtitles(video_path)
     elif choice == '2':
         input_dir = input("请输入视频文件夹路径: ")
-        batch_process_videos(input_dir)
+        batch_process_videos(input_dir, force=args.force)
     else:
         print("无效的选择")